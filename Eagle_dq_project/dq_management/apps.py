@@ -1,6 +1,25 @@
+import os
+import sys
 from django.apps import AppConfig
 
 
+def _is_management_command() -> bool:
+    # manage.py/django-admin commands other than runserver don't serve runs; they neither
+    # need the drainer nor should start one (run_job_workers children start their own lazily).
+    if len(sys.argv) < 2 or sys.argv[1] == 'runserver':
+        return False
+    program = sys.argv[0]
+    return (os.path.basename(program) in ('manage.py', 'django-admin', 'django-admin.py')
+            or program.endswith(os.path.join('django', '__main__.py')))  # python -m django
+
+
 class DqManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dq_management'
+
+    def ready(self):
+        # Replay results journaled before a restart or during a Snowflake outage.
+        if _is_management_command():
+            return
+        from dq_management.result_journal import start_journal_drainer
+        start_journal_drainer()
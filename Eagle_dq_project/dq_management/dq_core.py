@@ -1,13 +1,17 @@
 import os
 import json
 from datetime import datetime
+from decimal import Decimal
 import pandas as pd
 import warnings
 import uuid
+import time
 from django.db import connections # Import Django's connection handler
 from django.conf import settings
 warnings.filterwarnings('ignore')
 import logging
+from dq_management.log_utils import truncate_for_log
+from dq_management.query_cache import get_active_query_cache, normalize_query_text
 
 logger = logging.getLogger(__name__)
 
@@ -16,27 +20,151 @@ logger = logging.getLogger(__name__)
 # def get_db_connection(...): ...
 
 # --- Helper to execute a query and return results as a Pandas DataFrame ---
-def execute_query_to_dataframe(connection_name: str, query: str, params: tuple = None):
+def execute_query_to_dataframe(connection_name: str, query: str, params: tuple = None, max_rows: int = None):
     """
     Executes a query and returns results as a Pandas DataFrame using Django's connection.
     Supports parameterized queries to prevent SQL Injection.
+    At most max_rows rows are loaded (default EAGLE_MAX_RESULT_ROWS); when the query
+    returned more, df.attrs["truncated"] is True and the extra rows are never fetched.
     """
+    columns, rows, truncated, error = execute_query_rows(connection_name, query, params, max_rows)
+    if error:
+        return pd.DataFrame(), error
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df.attrs["truncated"] = truncated
+    return df, None
+
+def _get_max_result_rows(max_rows=None) -> int:
+    if max_rows is None:
+        max_rows = getattr(settings, "EAGLE_MAX_RESULT_ROWS", 100000)
+    return max(1, int(max_rows))
+
+def execute_query_rows(connection_name: str, query: str, params: tuple = None, max_rows: int = None):
+    """
+    Bounded fetch: executes a query and streams at most max_rows rows off the cursor in
+    batches of EAGLE_FETCH_BATCH_SIZE, so a runaway custom query can't exhaust memory.
+
+    Returns (columns, rows, truncated, error). `truncated` is True when the query had
+    more rows than max_rows. Decimals are returned as floats, matching pandas.read_sql.
+    Inside a group or project run, identical queries are served from the run's query cache.
+    """
+    max_rows = _get_max_result_rows(max_rows)
+    query_cache = get_active_query_cache()
+    if query_cache is None:
+        return _execute_query_rows(connection_name, query, params, max_rows)
+    key = ("sql", connection_name, normalize_query_text(query), tuple(params) if params else None, max_rows)
+    return query_cache.get_or_execute(
+        key,
+        lambda: _execute_query_rows(connection_name, query, params, max_rows),
+        is_cacheable=lambda outcome: outcome[3] is None,
+    )
+
+def _execute_query_rows(connection_name: str, query: str, params: tuple, max_rows: int):
+    started = time.perf_counter()
+    try:
+        if not query.upper().strip().startswith("SELECT"):
+            return [], [], False, "Only SELECT queries are allowed for data retrieval."
+
+        batch_size = max(1, int(getattr(settings, "EAGLE_FETCH_BATCH_SIZE", 10000)))
+        rows = []
+        truncated = False
+        with connections[connection_name].cursor() as cursor:
+            cursor.execute(query, params)
+            columns = [col[0] for col in cursor.description or []]
+            while len(rows) < max_rows:
+                batch = cursor.fetchmany(min(batch_size, max_rows - len(rows)))
+                if not batch:
+                    break
+                rows.extend(batch)
+            if len(rows) == max_rows:
+                # One probe row tells us whether the result was cut; the rest is never fetched.
+                truncated = cursor.fetchone() is not None
+
+        rows = [tuple(float(value) if isinstance(value, Decimal) else value for value in row) for row in rows]
+        if truncated:
+            logger.warning(
+                f"Query on '{connection_name}' returned more than {max_rows} rows; result truncated. "
+                f"Query: {truncate_for_log(query)}"
+            )
+        logger.debug(
+            "Query on %s returned rows=%d truncated=%s elapsed_ms=%.1f: %s",
+            connection_name, len(rows), truncated, (time.perf_counter() - started) * 1000, truncate_for_log(query)
+        )
+        return columns, rows, truncated, None
+    except Exception as e:
+        logger.error(
+            f"Error executing query for connection '{connection_name}' "
+            f"after {(time.perf_counter() - started) * 1000:.1f} ms: {truncate_for_log(e)} "
+            f"Query: {truncate_for_log(query)}"
+        )
+        return [], [], False, f"SQL execution error: {e}"
+
+# --- Scalar fast path: first row straight from the DB-API cursor, no pandas ---
+def execute_query_first_row(connection_name: str, query: str, params: tuple = None):
+    """
+    Executes a query and returns (first_row, error), where first_row is a tuple or None
+    when the query returned no rows. Only one row is fetched from the cursor.
+    Decimals are returned as floats, matching what pandas.read_sql produces.
+    Inside a group or project run, identical queries are served from the run's query cache.
+    """
+    query_cache = get_active_query_cache()
+    if query_cache is None:
+        return _execute_query_first_row(connection_name, query, params)
+    key = ("sql_first_row", connection_name, normalize_query_text(query), tuple(params) if params else None)
+    return query_cache.get_or_execute(
+        key,
+        lambda: _execute_query_first_row(connection_name, query, params),
+        is_cacheable=lambda outcome: outcome[1] is None,
+    )
+
+def _execute_query_first_row(connection_name: str, query: str, params: tuple = None):
+    started = time.perf_counter()
     try:
         if not query.upper().strip().startswith("SELECT"):
-            return pd.DataFrame(), "Only SELECT queries are allowed for data retrieval."
-        
-        # Use Django's connections object to get a live connection
+            return None, "Only SELECT queries are allowed for data retrieval."
+
         with connections[connection_name].cursor() as cursor:
-            # Use pandas.read_sql, which handles parameterization
-            df = pd.read_sql(query, connections[connection_name], params=params)
+            cursor.execute(query, params)
+            row = cursor.fetchone()
 
-        if df.empty:
-            return df, None
-        
-        return df, None
+        if row is not None:
+            row = tuple(float(value) if isinstance(value, Decimal) else value for value in row)
+        logger.debug(
+            "Scalar query on %s returned row=%s elapsed_ms=%.1f: %s",
+            connection_name, row is not None, (time.perf_counter() - started) * 1000, truncate_for_log(query)
+        )
+        return row, None
     except Exception as e:
-        logger.error(f"Error executing query to DataFrame for connection '{connection_name}': {e}")
-        return pd.DataFrame(), f"SQL execution error: {e}"
+        logger.error(
+            f"Error executing scalar query for connection '{connection_name}' "
+            f"after {(time.perf_counter() - started) * 1000:.1f} ms: {truncate_for_log(e)} "
+            f"Query: {truncate_for_log(query)}"
+        )
+        return None, f"SQL execution error: {e}"
+
+def first_row_value(row, index=0):
+    """
+    Returns column `index` of a first row, or 0 when the query returned no row,
+    the same default the processor used for empty DataFrames.
+    """
+    if row is None or len(row) <= index:
+        return 0
+    return row[index]
+
+def _build_aggregation_clause(aggregation_type, aggregation_column):
+    agg_type_upper = aggregation_type.strip().upper()
+    if agg_type_upper == 'COUNT(*)':
+        return 'COUNT(*)'
+    if agg_type_upper in ['COUNT','SUM', 'AVG', 'MIN', 'MAX'] and aggregation_column:
+        return f"{agg_type_upper}({aggregation_column})"
+    raise ValueError(f"Invalid aggregation_type '{aggregation_type}' or missing aggregation_column for type '{aggregation_type}'.")
+
+def _build_date_filter(date_column, date_value):
+    if not date_value:
+        return ""
+    if date_value.strip().upper() == 'CURRENT_DATE()':
+        return f"TO_DATE({date_column}) = CURRENT_DATE()"
+    return f"TO_DATE({date_column}) = TO_DATE('{date_value}', 'YYYY-MM-DD')"
 
 # --- The dynamic query builder remains largely unchanged ---
 def build_dynamic_aggregation_query(db_config, table, date_column, date_value,
@@ -58,23 +186,10 @@ def build_dynamic_aggregation_query(db_config, table, date_column, date_value,
     # Always use Snowflake table reference
     table_ref = f"{database}.{schema}.{table}"
 
-    agg_type_upper = aggregation_type.strip().upper()
-
-    if agg_type_upper == 'COUNT(*)':
-        agg_clause = 'COUNT(*)'
-    elif agg_type_upper in ['COUNT','SUM', 'AVG', 'MIN', 'MAX'] and aggregation_column:
-        agg_clause = f"{agg_type_upper}({aggregation_column})"
-    else:
-        raise ValueError(f"Invalid aggregation_type '{aggregation_type}' or missing aggregation_column for type '{aggregation_type}'.")
+    agg_clause = _build_aggregation_clause(aggregation_type, aggregation_column)
 
     # Always use Snowflake date filter logic
-    if date_value:
-        if date_value.strip().upper() == 'CURRENT_DATE()':
-            date_filter = f"TO_DATE({date_column}) = CURRENT_DATE()"
-        else:
-            date_filter = f"TO_DATE({date_column}) = TO_DATE('{date_value}', 'YYYY-MM-DD')"
-    else:
-        date_filter = ""
+    date_filter = _build_date_filter(date_column, date_value)
 
     group_by_clause = ""
     if group_by_column:
@@ -101,17 +216,89 @@ def build_dynamic_aggregation_query(db_config, table, date_column, date_value,
 
     return query
 
-def build_dynamic_dax_query_powerbi(table, date_column=None, date_value=None,
-                                   aggregation_type="COUNT", aggregation_column=None,
-                                   group_by_column=None, additional_filters=None, custom_dax_query=None):
+def build_fused_aggregation_query(db_config, table, date_column, date_value,
+                                  aggregations, additional_filters=None):
     """
-    Builds a dynamic DAX query string for Power BI based on user input.
-    If custom_dax_query is provided, returns it directly.
-    If no group_by_column is provided, returns a scalar value using CALCULATE/ROW.
+    Builds one SQL query that computes several aggregates over the same table and filters.
+    `aggregations` is a list of (aggregation_type, aggregation_column) pairs; the aggregate
+    at position i is returned in column AGG_i, in the same order.
     """
-    if custom_dax_query and custom_dax_query.strip():
-        return custom_dax_query.strip()
+    database = db_config.get('db') or db_config.get('NAME')
+    schema = db_config.get('schema')
+    if not database or not schema:
+        raise ValueError("Database config must include both 'db'/'NAME' and 'schema'.")
+    if not aggregations:
+        raise ValueError("At least one aggregation is required to build a fused query.")
+
+    table_ref = f"{database}.{schema}.{table}"
+    select_list = ", ".join(
+        f"{_build_aggregation_clause(agg_type, agg_column)} AS AGG_{index}"
+        for index, (agg_type, agg_column) in enumerate(aggregations)
+    )
+
+    where_clauses = []
+    date_filter = _build_date_filter(date_column, date_value)
+    if date_filter:
+        where_clauses.append(date_filter)
+    if additional_filters:
+        where_clauses.append(f"({additional_filters})")
+    full_where_clause = ("WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+
+    return f"SELECT {select_list} FROM {table_ref} {full_where_clause};"
 
+def build_drift_aggregation_query(db_config, table, date_column, current_date_value,
+                                  previous_date_value, aggregation_type, aggregation_column,
+                                  additional_filters=None):
+    """
+    Builds a single SQL query that scans the two drift days once and returns both
+    aggregates side by side as CURRENT_VALUE and PREVIOUS_VALUE.
+    Each aggregate is computed over its own day with a CASE expression, so empty days
+    yield the same values (0 for COUNT, NULL otherwise) as two separate queries would.
+    """
+    database = db_config.get('db') or db_config.get('NAME')
+    schema = db_config.get('schema')
+    if not database or not schema:
+        raise ValueError("Database config must include both 'db'/'NAME' and 'schema'.")
+    if not date_column:
+        raise ValueError("A date column is required to build a drift query.")
+
+    table_ref = f"{database}.{schema}.{table}"
+
+    def date_expr(date_value):
+        if date_value.strip().upper() == 'CURRENT_DATE()':
+            return "CURRENT_DATE()"
+        return f"TO_DATE('{date_value}', 'YYYY-MM-DD')"
+
+    current_date_expr = date_expr(current_date_value)
+    previous_date_expr = date_expr(previous_date_value)
+
+    agg_type_upper = aggregation_type.strip().upper()
+
+    def agg_clause(day_expr):
+        condition = f"TO_DATE({date_column}) = {day_expr}"
+        if agg_type_upper == 'COUNT(*)':
+            return f"COUNT(CASE WHEN {condition} THEN 1 END)"
+        if agg_type_upper in ['COUNT', 'SUM', 'AVG', 'MIN', 'MAX'] and aggregation_column:
+            return f"{agg_type_upper}(CASE WHEN {condition} THEN {aggregation_column} END)"
+        raise ValueError(f"Invalid aggregation_type '{aggregation_type}' or missing aggregation_column for type '{aggregation_type}'.")
+
+    where_clauses = [f"TO_DATE({date_column}) IN ({current_date_expr}, {previous_date_expr})"]
+    if additional_filters:
+        where_clauses.append(f"({additional_filters})")
+
+    query = (
+        f"SELECT {agg_clause(current_date_expr)} AS CURRENT_VALUE, "
+        f"{agg_clause(previous_date_expr)} AS PREVIOUS_VALUE "
+        f"FROM {table_ref} WHERE {' AND '.join(where_clauses)};"
+    )
+
+    return query
+
+def _build_dax_components(table, date_column, date_value, aggregation_type,
+                          aggregation_column, additional_filters):
+    """
+    Returns (table_quoted, filter_str, agg_clause) shared by the DAX query builders.
+    """
     # Quote table name if it contains spaces
     table_quoted = f"'{table}'" if ' ' in table else table
 
@@ -123,8 +310,6 @@ def build_dynamic_dax_query_powerbi(table, date_column=None, date_value=None,
     aggregation_column_quoted = quote_column(aggregation_column)
 
     agg_type_upper = aggregation_type.strip().upper()
-    group_by_cols = [col.strip() for col in (group_by_column or '').split(',') if col.strip()]
-    group_by_clause = ", ".join([f'"{col}"' for col in group_by_cols]) if group_by_cols else ""
 
     # Date filter for DAX
     date_filter = ""
@@ -150,6 +335,26 @@ def build_dynamic_dax_query_powerbi(table, date_column=None, date_value=None,
     else:
         agg_clause = f'COUNTROWS({table_quoted})'
 
+    return table_quoted, filter_str, agg_clause
+
+def build_dynamic_dax_query_powerbi(table, date_column=None, date_value=None,
+                                   aggregation_type="COUNT", aggregation_column=None,
+                                   group_by_column=None, additional_filters=None, custom_dax_query=None):
+    """
+    Builds a dynamic DAX query string for Power BI based on user input.
+    If custom_dax_query is provided, returns it directly.
+    If no group_by_column is provided, returns a scalar value using CALCULATE/ROW.
+    """
+    if custom_dax_query and custom_dax_query.strip():
+        return custom_dax_query.strip()
+
+    group_by_cols = [col.strip() for col in (group_by_column or '').split(',') if col.strip()]
+    group_by_clause = ", ".join([f'"{col}"' for col in group_by_cols]) if group_by_cols else ""
+
+    table_quoted, filter_str, agg_clause = _build_dax_components(
+        table, date_column, date_value, aggregation_type, aggregation_column, additional_filters
+    )
+
     # Build DAX query
     if group_by_clause:
         # Use SUMMARIZECOLUMNS for group by
@@ -172,18 +377,38 @@ def build_dynamic_dax_query_powerbi(table, date_column=None, date_value=None,
             """
     else:
         # Always use CALCULATE/ROW for scalar value
-        if filter_str:
-            dax_query = f"""
+        value_expr = _build_dax_scalar_expression(agg_clause, table_quoted, filter_str)
+        dax_query = f"""
                 EVALUATE
-                VAR __value = CALCULATE({agg_clause}, FILTER({table_quoted}, {filter_str}))
-                RETURN
-                ROW("Value", __value)
-            """
-        else:
-            dax_query = f"""
-                EVALUATE
-                VAR __value = {agg_clause}
+                VAR __value = {value_expr}
                 RETURN
                 ROW("Value", __value)
             """
     return dax_query.strip()
+
+def _build_dax_scalar_expression(agg_clause, table_quoted, filter_str):
+    if filter_str:
+        return f"CALCULATE({agg_clause}, FILTER({table_quoted}, {filter_str}))"
+    return agg_clause
+
+def build_dax_scalar_expression_powerbi(table, date_column=None, date_value=None,
+                                        aggregation_type="COUNT", aggregation_column=None,
+                                        additional_filters=None):
+    """
+    Returns the scalar DAX expression that build_dynamic_dax_query_powerbi wraps in
+    ROW("Value", ...) when no group_by_column is given.
+    """
+    table_quoted, filter_str, agg_clause = _build_dax_components(
+        table, date_column, date_value, aggregation_type, aggregation_column, additional_filters
+    )
+    return _build_dax_scalar_expression(agg_clause, table_quoted, filter_str)
+
+def build_fused_dax_query_powerbi(expressions):
+    """
+    Builds one DAX query returning several scalar expressions as a single row.
+    The expression at position i is returned in column [V{i}], in the same order.
+    """
+    if not expressions:
+        raise ValueError("At least one expression is required to build a fused DAX query.")
+    columns = ",\n    ".join(f'"V{index}", {expr}' for index, expr in enumerate(expressions))
+    return f"EVALUATE\nROW(\n    {columns}\n)"
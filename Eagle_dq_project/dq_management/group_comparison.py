@@ -0,0 +1,265 @@
+# dq_management/group_comparison.py
+
+import math
+import logging
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def split_group_by_columns(group_by_column):
+    return [col.strip() for col in (group_by_column or '').split(',') if col.strip()]
+
+
+def _normalize_column_name(name) -> str:
+    """
+    Reduces SQL and DAX result column names to a comparable form:
+    'region', '"REGION"' and 'Sales[Region]' all become 'REGION'.
+    """
+    name = str(name).strip()
+    if name.endswith(']') and '[' in name:
+        name = name[name.rindex('[') + 1:-1]
+    return name.strip().strip('"').strip().upper()
+
+
+# Canonical form of a NULL (or blank) group-by key; NULL groups match each other.
+NULL_KEY = '<NULL>'
+
+
+def _is_null_key(value) -> bool:
+    if value is None or value is pd.NaT:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _as_number(value):
+    if isinstance(value, (datetime, date, np.datetime64)):
+        return None
+    try:
+        number = float(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _as_timestamp(value):
+    # Only real dates and strings: numbers must never be read as epoch offsets.
+    if not isinstance(value, (str, date, datetime, np.datetime64)):
+        return None
+    try:
+        timestamp = pd.Timestamp(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if timestamp is pd.NaT:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return timestamp
+
+
+def _number_key(number) -> str:
+    # 1, 1.0, '1' and Decimal('1.00') all become '1'.
+    if number.is_integer() and abs(number) < 2 ** 53:
+        return str(int(number))
+    return repr(number)
+
+
+def _timestamp_key(timestamp) -> str:
+    # A midnight timestamp is the same key as its date: 2024-01-01 == 2024-01-01 00:00:00.
+    if timestamp == timestamp.normalize():
+        return timestamp.date().isoformat()
+    return timestamp.isoformat()
+
+
+def _canonical_keys(source_values, destination_values):
+    """
+    Converts one group-by column of both sides to comparable strings. The column is
+    compared as numbers when every non-null key on both sides is numeric, as dates or
+    timestamps when every one is a date, and as trimmed strings otherwise. NULL and blank
+    keys become NULL_KEY on either side.
+    """
+    values = [value for value in list(source_values) + list(destination_values) if not _is_null_key(value)]
+    if all(_as_number(value) is not None for value in values):
+        convert = lambda value: _number_key(_as_number(value))
+    elif all(_as_timestamp(value) is not None for value in values):
+        convert = lambda value: _timestamp_key(_as_timestamp(value))
+    else:
+        convert = lambda value: str(value).strip()
+
+    def canonical(series):
+        return series.map(lambda value: NULL_KEY if _is_null_key(value) else convert(value)).astype(object)
+    return canonical(source_values), canonical(destination_values)
+
+
+def _find_key_columns(df, key_columns, side):
+    by_name = {_normalize_column_name(col): col for col in df.columns}
+    found = []
+    for key in key_columns:
+        column = by_name.get(_normalize_column_name(key))
+        if column is None:
+            raise ValueError(
+                f"Group-by column '{key}' not found in {side} result columns: {', '.join(map(str, df.columns))}."
+            )
+        found.append(column)
+    return found
+
+
+def _keyed_frame(df, found, keys, side):
+    """
+    Returns a frame with canonical columns KEY_0..KEY_n (the already normalized `keys`)
+    and VALUE, the first column that is not a group-by column.
+    """
+    value_columns = [col for col in df.columns if col not in found]
+    if not value_columns:
+        raise ValueError(f"{side.capitalize()} result has no aggregate column besides the group-by columns.")
+
+    keyed = pd.DataFrame({f"KEY_{i}": key for i, key in enumerate(keys)}, index=df.index)
+    keyed["VALUE"] = pd.to_numeric(df[value_columns[0]], errors='coerce')
+    return keyed.reset_index(drop=True)
+
+
+def _key_label(row, key_names):
+    return ", ".join(f"{name}={row[f'KEY_{i}']}" for i, name in enumerate(key_names))
+
+
+def compare_keyed_results(source_df, destination_df, source_keys, destination_keys,
+                          threshold=None, threshold_type=None, max_offenders=None):
+    """
+    Compares per-group aggregates from both sides. Rows are aligned on the group-by keys
+    with an outer merge, and differences and threshold breaches are computed for all keys
+    at once. Source and destination keys are paired by position and normalized pairwise
+    first (see _canonical_keys), so e.g. 1 matches 1.0, a date matches its midnight
+    timestamp, and NULL groups match each other. A group key returned more than once by
+    either side fails the test, since it can't be told which row to compare.
+
+    Returns (status, message, summary). summary holds the counts, the largest difference,
+    the worst offenders and samples of the keys missing on either side.
+    """
+    if threshold is None:
+        threshold = 0
+    if threshold_type is None:
+        threshold_type = 'ABSOLUTE'
+    if threshold_type not in ('ABSOLUTE', 'PERCENTAGE'):
+        return "ERROR", "Invalid threshold type configured.", {}
+    if max_offenders is None:
+        max_offenders = int(getattr(settings, "EAGLE_GROUP_COMPARISON_MAX_OFFENDERS", 10))
+    if len(source_keys) != len(destination_keys):
+        return "ERROR", (
+            f"Source groups by {len(source_keys)} column(s) but destination by {len(destination_keys)}."
+        ), {}
+
+    source_found = _find_key_columns(source_df, source_keys, 'source')
+    destination_found = _find_key_columns(destination_df, destination_keys, 'destination')
+    source_key_values, destination_key_values = [], []
+    for source_column, destination_column in zip(source_found, destination_found):
+        source_key, destination_key = _canonical_keys(source_df[source_column], destination_df[destination_column])
+        source_key_values.append(source_key)
+        destination_key_values.append(destination_key)
+    source = _keyed_frame(source_df, source_found, source_key_values, 'source')
+    destination = _keyed_frame(destination_df, destination_found, destination_key_values, 'destination')
+    key_columns = [f"KEY_{i}" for i in range(len(source_keys))]
+
+    # A key that appears more than once makes the comparison ambiguous; the first row is
+    # compared and the test fails, naming the repeated keys.
+    duplicates = {
+        "source": int(source.duplicated(key_columns).sum()),
+        "destination": int(destination.duplicated(key_columns).sum()),
+    }
+    duplicate_samples = {
+        side: [
+            _key_label(row, source_keys)
+            for _, row in frame[frame.duplicated(key_columns)].drop_duplicates(key_columns).head(max_offenders).iterrows()
+        ]
+        for side, frame in (("source", source), ("destination", destination))
+    }
+    source = source.drop_duplicates(key_columns)
+    destination = destination.drop_duplicates(key_columns)
+
+    merged = source.merge(
+        destination, on=key_columns, how='outer', suffixes=('_SOURCE', '_DESTINATION'), indicator=True
+    )
+    matched = (merged['_merge'] == 'both').to_numpy()
+    source_values = merged['VALUE_SOURCE'].to_numpy(dtype=float)
+    destination_values = merged['VALUE_DESTINATION'].to_numpy(dtype=float)
+
+    abs_difference = np.abs(source_values - destination_values)
+    if threshold_type == 'PERCENTAGE':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            difference = np.where(
+                source_values == 0,
+                np.where(destination_values == 0, 0.0, np.inf),
+                abs_difference / np.abs(source_values) * 100,
+            )
+    else:
+        difference = abs_difference
+    # Non-numeric or NULL aggregates on a matched key count as breaches.
+    breached = matched & (np.isnan(difference) | (difference > float(threshold)))
+
+    merged['DIFFERENCE'] = difference
+    missing_in_destination = merged[merged['_merge'] == 'left_only']
+    missing_in_source = merged[merged['_merge'] == 'right_only']
+    offenders = merged[breached].sort_values('DIFFERENCE', ascending=False, na_position='first').head(max_offenders)
+
+    compared_differences = difference[matched & ~np.isnan(difference)]
+    max_difference = float(compared_differences.max()) if compared_differences.size else None
+
+    summary = {
+        "group_by": list(source_keys),
+        "keys_compared": int(matched.sum()),
+        "keys_over_threshold": int(breached.sum()),
+        "missing_in_destination": int(len(missing_in_destination)),
+        "missing_in_source": int(len(missing_in_source)),
+        "duplicate_keys": duplicates,
+        "duplicate_keys_sample": duplicate_samples,
+        "max_difference": max_difference,
+        "source_total": float(np.nansum(source['VALUE'].to_numpy(dtype=float))),
+        "destination_total": float(np.nansum(destination['VALUE'].to_numpy(dtype=float))),
+        "worst_offenders": [
+            {
+                "key": _key_label(row, source_keys),
+                "source_value": None if np.isnan(row['VALUE_SOURCE']) else float(row['VALUE_SOURCE']),
+                "destination_value": None if np.isnan(row['VALUE_DESTINATION']) else float(row['VALUE_DESTINATION']),
+                "difference": None if np.isnan(row['DIFFERENCE']) else float(row['DIFFERENCE']),
+            }
+            for _, row in offenders.iterrows()
+        ],
+        "missing_in_destination_sample": [
+            _key_label(row, source_keys) for _, row in missing_in_destination.head(max_offenders).iterrows()
+        ],
+        "missing_in_source_sample": [
+            _key_label(row, source_keys) for _, row in missing_in_source.head(max_offenders).iterrows()
+        ],
+    }
+
+    unit = "%" if threshold_type == 'PERCENTAGE' else ""
+    message = (
+        f"Keyed comparison on {summary['keys_compared']} group(s) by {', '.join(source_keys)}: "
+        f"{summary['keys_over_threshold']} over threshold ({float(threshold):.2f}{unit}), "
+        f"{summary['missing_in_destination']} missing in destination, "
+        f"{summary['missing_in_source']} missing in source."
+    )
+    for side, count in duplicates.items():
+        if count:
+            message += (
+                f" {side.capitalize()} returned {count} duplicate row(s) for the same group "
+                f"({'; '.join(duplicate_samples[side])}); only the first was compared."
+            )
+    failed = (summary['keys_over_threshold'] or summary['missing_in_destination'] or summary['missing_in_source']
+              or duplicates['source'] or duplicates['destination'])
+    if failed:
+        if summary['worst_offenders']:
+            worst = ", ".join(
+                f"[{item['key']}] {item['source_value']} vs {item['destination_value']}"
+                for item in summary['worst_offenders'][:3]
+            )
+            message += f" Worst: {worst}."
+        return "FAIL", f"Test Failed. {message}", summary
+    return "PASS", f"Test Passed. {message}", summary
@@ -0,0 +1,231 @@
+# dq_management/job_queue.py
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import logging
+from django.conf import settings
+from dq_management.run_admission import decide_admission
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+DONE = 'DONE'
+FAILED = 'FAILED'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    run_id TEXT NOT NULL UNIQUE,
+    options TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS run_job_state ON run_job (state, id);
+CREATE INDEX IF NOT EXISTS run_job_target ON run_job (kind, target_id, state);
+"""
+
+_init_lock = threading.Lock()
+_initialized_path = None
+
+
+def run_execution_mode() -> str:
+    """'queue' (default): the web tier enqueues and worker processes run the jobs.
+    'thread': runs start on a thread of the web process, as before the queue existed."""
+    return getattr(settings, "EAGLE_RUN_EXECUTION", 'queue')
+
+
+def _queue_path() -> str:
+    default_dir = getattr(settings, "BASE_DIR", None) or os.getcwd()
+    return str(getattr(settings, "EAGLE_JOB_QUEUE_PATH", os.path.join(default_dir, "eagle_job_queue.sqlite3")))
+
+
+def _stale_seconds() -> float:
+    return float(getattr(settings, "EAGLE_JOB_STALE_SECONDS", 120))
+
+
+def _max_attempts() -> int:
+    return max(1, int(getattr(settings, "EAGLE_JOB_MAX_ATTEMPTS", 2)))
+
+
+def _connect():
+    global _initialized_path
+    path = _queue_path()
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if _initialized_path != path:
+        with _init_lock:
+            if _initialized_path != path:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized_path = path
+    return conn
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def enqueue_run(kind, target_id, run_id, options=None, policy=None):
+    """
+    Adds a group or project run (kind GROUP_RUNS or PROJECT_RUNS) to the durable queue.
+    The run is picked up by a `manage.py run_job_workers` process.
+
+    With an admission `policy` (see run_admission) the queued and running jobs of the same
+    target are checked in the same transaction, so two concurrent starts can't both be
+    admitted. Returns the run_id of an in-flight run to attach to, or None when `run_id`
+    was queued. Raises RunAlreadyActive under the 'reject' policy.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if policy is not None:
+                active = conn.execute(
+                    "SELECT run_id, state FROM run_job WHERE kind = ? AND target_id = ? AND state IN (?, ?) ORDER BY id",
+                    (kind, str(target_id), QUEUED, RUNNING)
+                ).fetchall()
+                existing = decide_admission(kind, target_id, policy, [
+                    (row['run_id'], row['state'] == RUNNING) for row in active
+                ])
+                if existing is not None:
+                    return existing
+            conn.execute(
+                "INSERT INTO run_job (kind, target_id, run_id, options, state, enqueued_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, str(target_id), run_id, json.dumps(options or {}), QUEUED, time.time())
+            )
+            return None
+        finally:
+            conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically moves the oldest queued job to RUNNING for `worker_id` and returns it as
+    a dict, or None when nothing can start. Jobs of a group or project that another
+    worker is already running wait until that run finishes.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM run_job AS job WHERE state = ? AND NOT EXISTS ("
+                "SELECT 1 FROM run_job AS other WHERE other.kind = job.kind AND other.target_id = job.target_id "
+                "AND other.state = ?) ORDER BY id LIMIT 1",
+                (QUEUED, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE run_job SET state = ?, worker_id = ?, attempts = attempts + 1, started_at = ?, "
+                "heartbeat_at = ?, last_error = NULL WHERE id = ?",
+                (RUNNING, worker_id, now, now, row['id'])
+            )
+        finally:
+            conn.execute("COMMIT")
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['attempts'] += 1
+        return job
+    finally:
+        conn.close()
+
+
+def heartbeat(job_id, worker_id):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE run_job SET heartbeat_at = ? WHERE id = ? AND worker_id = ? AND state = ?",
+            (time.time(), job_id, worker_id, RUNNING)
+        )
+    finally:
+        conn.close()
+
+
+def finish_job(job_id, worker_id, error=None):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE run_job SET state = ?, finished_at = ?, last_error = ? WHERE id = ? AND worker_id = ?",
+            (FAILED if error else DONE, time.time(), error, job_id, worker_id)
+        )
+    finally:
+        conn.close()
+
+
+def recover_stale_jobs():
+    """
+    Finds RUNNING jobs whose worker stopped sending heartbeats (it crashed or was
+    restarted) for EAGLE_JOB_STALE_SECONDS. They are requeued while they have attempts
+    left (EAGLE_JOB_MAX_ATTEMPTS) and failed otherwise.
+
+    Returns (requeued, failed), each a list of job dicts.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stale = [dict(row) for row in conn.execute(
+                "SELECT * FROM run_job WHERE state = ? AND heartbeat_at < ?",
+                (RUNNING, time.time() - _stale_seconds())
+            ).fetchall()]
+            requeued = [job for job in stale if job['attempts'] < _max_attempts()]
+            failed = [job for job in stale if job['attempts'] >= _max_attempts()]
+            conn.executemany(
+                "UPDATE run_job SET state = ?, worker_id = NULL, last_error = ? WHERE id = ?",
+                [(QUEUED, f"Worker {job['worker_id']} stopped responding; requeued.", job['id']) for job in requeued]
+            )
+            conn.executemany(
+                "UPDATE run_job SET state = ?, finished_at = ?, last_error = ? WHERE id = ?",
+                [(FAILED, time.time(), f"Worker {job['worker_id']} stopped responding; out of attempts.", job['id'])
+                 for job in failed]
+            )
+        finally:
+            conn.execute("COMMIT")
+    finally:
+        conn.close()
+    for job in requeued + failed:
+        job['options'] = json.loads(job['options'])
+    return requeued, failed
+
+
+def prune_finished_jobs() -> int:
+    """Deletes finished jobs older than EAGLE_JOB_RETENTION_SECONDS (default one week)."""
+    retention = float(getattr(settings, "EAGLE_JOB_RETENTION_SECONDS", 7 * 86400))
+    conn = _connect()
+    try:
+        return conn.execute(
+            "DELETE FROM run_job WHERE state IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - retention)
+        ).rowcount
+    finally:
+        conn.close()
+
+
+def queue_counts() -> dict:
+    conn = _connect()
+    try:
+        return {row['state']: row['count'] for row in conn.execute(
+            "SELECT state, COUNT(*) AS count FROM run_job GROUP BY state"
+        )}
+    finally:
+        conn.close()
+
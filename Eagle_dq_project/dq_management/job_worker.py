@@ -0,0 +1,108 @@
+# dq_management/job_worker.py
+
+import time
+import threading
+import logging
+from django.conf import settings
+from django.db import close_old_connections, connections
+from dq_management.job_queue import (
+    new_worker_id, claim_next_job, heartbeat, finish_job, recover_stale_jobs, prune_finished_jobs,
+)
+from dq_management.run_status_store import get_run_status_store, GROUP_RUNS, PROJECT_RUNS
+
+logger = logging.getLogger(__name__)
+
+
+def _execute_job(job):
+    # Imported here: services enqueues jobs, and workers are the only callers of this.
+    from dq_management.services import (
+        _execute_group_in_background, _execute_project_in_background, _get_group_max_workers,
+    )
+    if job['kind'] == GROUP_RUNS:
+        max_workers = _get_group_max_workers(job['target_id'], job['options'].get('max_workers'))
+        _execute_group_in_background(job['run_id'], job['target_id'], max_workers)
+    elif job['kind'] == PROJECT_RUNS:
+        _execute_project_in_background(job['run_id'], job['target_id'])
+    else:
+        raise ValueError(f"Unknown job kind '{job['kind']}'.")
+
+
+def _fail_run(job, message):
+    store = get_run_status_store()
+    store.update(job['kind'], job['run_id'], status="ERROR", final_status="ERROR", message=message)
+    store.append_event(job['kind'], job['run_id'], "completed", {"status": "ERROR", "message": message})
+
+
+def _recover():
+    requeued, failed = recover_stale_jobs()
+    store = get_run_status_store()
+    for job in requeued:
+        logger.warning(f"Requeued {job['kind']} run {job['run_id']} abandoned by worker {job['worker_id']}.")
+        store.update(job['kind'], job['run_id'], status="PENDING", executed_count=0, results=[])
+        store.append_event(job['kind'], job['run_id'], "requeued", {"attempt": job['attempts'] + 1})
+    for job in failed:
+        logger.error(f"Giving up on {job['kind']} run {job['run_id']} after {job['attempts']} attempt(s).")
+        _fail_run(job, "The worker running this job stopped and it has no attempts left.")
+    prune_finished_jobs()
+
+
+def _heartbeat_until(stop, job_id, worker_id):
+    interval = float(getattr(settings, "EAGLE_JOB_HEARTBEAT_SECONDS", 10))
+    while not stop.wait(interval):
+        try:
+            heartbeat(job_id, worker_id)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+
+def run_job(job, worker_id):
+    """Runs one claimed job to completion while heartbeating it, then records the outcome."""
+    logger.info(f"Worker {worker_id} starting {job['kind']} run {job['run_id']} (attempt {job['attempts']}).")
+    stop_heartbeat = threading.Event()
+    heartbeat_thread = threading.Thread(
+        target=_heartbeat_until, args=(stop_heartbeat, job['id'], worker_id),
+        name=f"job-heartbeat-{job['id']}", daemon=True
+    )
+    heartbeat_thread.start()
+    error = None
+    close_old_connections()
+    try:
+        _execute_job(job)
+    except Exception as e:
+        logger.exception(f"{job['kind'].capitalize()} run {job['run_id']} failed: {e}")
+        error = str(e)
+        _fail_run(job, f"Run failed: {e}")
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+        finish_job(job['id'], worker_id, error)
+        connections.close_all()
+    logger.info(f"Worker {worker_id} finished {job['kind']} run {job['run_id']}.")
+
+
+def run_worker(stop_event):
+    """
+    Worker loop of one `run_job_workers` process: claims queued runs one at a time, so the
+    number of concurrent runs equals the number of worker processes. Every worker also
+    requeues jobs abandoned by crashed workers. Returns once `stop_event` is set and the
+    current job has finished.
+    """
+    worker_id = new_worker_id()
+    poll_seconds = float(getattr(settings, "EAGLE_JOB_POLL_SECONDS", 1))
+    recover_interval = float(getattr(settings, "EAGLE_JOB_STALE_SECONDS", 120)) / 2
+    last_recovery = None
+    logger.info(f"Job worker {worker_id} started.")
+    while not stop_event.is_set():
+        try:
+            if last_recovery is None or time.monotonic() - last_recovery >= recover_interval:
+                _recover()
+                last_recovery = time.monotonic()
+            job = claim_next_job(worker_id)
+        except Exception as e:
+            logger.exception(f"Job worker {worker_id} could not read the queue: {e}")
+            job = None
+        if job is None:
+            stop_event.wait(poll_seconds)
+            continue
+        run_job(job, worker_id)
+    logger.info(f"Job worker {worker_id} stopped.")
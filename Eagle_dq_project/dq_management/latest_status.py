@@ -0,0 +1,266 @@
+# dq_management/latest_status.py
+
+import time
+import logging
+from django.conf import settings
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from dq_management.models import TestCaseLog, TestGroupLog, TestCaseLatestStatus, TestGroupLatestStatus
+
+logger = logging.getLogger(__name__)
+
+LOG_DB_ALIAS = 'snowflake_dev'
+
+CASE_STATUS_FIELDS = [
+    'project_id', 'test_name', 'criticality', 'run_id', 'parent_run_id', 'run_status', 'run_message',
+    'possible_resolution', 'source_query', 'destination_query', 'run_timestamp',
+]
+GROUP_STATUS_FIELDS = [
+    'project_id', 'group_name', 'criticality', 'run_id', 'status', 'message', 'start_timestamp', 'end_timestamp',
+]
+
+# The latest-status tables are not managed by migrations; `manage.py setup_latest_status`
+# runs these statements on Snowflake. The backfills only add entities missing from the
+# table, so they can be re-run safely; writes keep existing rows current.
+LATEST_STATUS_DDL = [
+    """CREATE TABLE IF NOT EXISTS TEST_GROUP_LATEST_STATUS (
+    TEST_GROUP_ID VARCHAR(36) NOT NULL PRIMARY KEY,
+    PROJECT_ID VARCHAR(36),
+    GROUP_NAME VARCHAR(255),
+    CRITICALITY VARCHAR(50),
+    RUN_ID VARCHAR(255),
+    STATUS VARCHAR(50),
+    MESSAGE TEXT,
+    START_TIMESTAMP TIMESTAMP_NTZ,
+    END_TIMESTAMP TIMESTAMP_NTZ,
+    UPDATED_AT TIMESTAMP_NTZ NOT NULL
+)""",
+    """CREATE TABLE IF NOT EXISTS TEST_CASE_LATEST_STATUS (
+    TEST_CASE_ID VARCHAR(36) NOT NULL PRIMARY KEY,
+    PROJECT_ID VARCHAR(36),
+    TEST_NAME VARCHAR(255),
+    CRITICALITY VARCHAR(50),
+    RUN_ID VARCHAR(255),
+    PARENT_RUN_ID VARCHAR(255),
+    RUN_STATUS VARCHAR(50),
+    RUN_MESSAGE TEXT,
+    POSSIBLE_RESOLUTION TEXT,
+    SOURCE_QUERY TEXT,
+    DESTINATION_QUERY TEXT,
+    RUN_TIMESTAMP TIMESTAMP_NTZ,
+    UPDATED_AT TIMESTAMP_NTZ NOT NULL
+)""",
+]
+
+LATEST_STATUS_BACKFILL = [
+    """INSERT INTO TEST_GROUP_LATEST_STATUS (
+    TEST_GROUP_ID, PROJECT_ID, GROUP_NAME, CRITICALITY, RUN_ID, STATUS, MESSAGE,
+    START_TIMESTAMP, END_TIMESTAMP, UPDATED_AT
+)
+SELECT TEST_GROUP_ID, PROJECT_ID, GROUP_NAME, CRITICALITY, RUN_ID, STATUS, MESSAGE,
+    START_TIMESTAMP, END_TIMESTAMP, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+FROM TEST_GROUP_LOGS
+WHERE TEST_GROUP_ID IS NOT NULL
+    AND TEST_GROUP_ID NOT IN (SELECT TEST_GROUP_ID FROM TEST_GROUP_LATEST_STATUS)
+QUALIFY ROW_NUMBER() OVER (PARTITION BY TEST_GROUP_ID ORDER BY START_TIMESTAMP DESC NULLS LAST) = 1""",
+    """INSERT INTO TEST_CASE_LATEST_STATUS (
+    TEST_CASE_ID, PROJECT_ID, TEST_NAME, CRITICALITY, RUN_ID, PARENT_RUN_ID, RUN_STATUS, RUN_MESSAGE,
+    POSSIBLE_RESOLUTION, SOURCE_QUERY, DESTINATION_QUERY, RUN_TIMESTAMP, UPDATED_AT
+)
+SELECT TEST_CASE_ID, PROJECT_ID, TEST_NAME, CRITICALITY, RUN_ID, PARENT_RUN_ID, RUN_STATUS, RUN_MESSAGE,
+    POSSIBLE_RESOLUTION, SOURCE_QUERY, DESTINATION_QUERY, RUN_TIMESTAMP, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+FROM TEST_CASE_LOGS
+WHERE TEST_CASE_ID IS NOT NULL
+    AND TEST_CASE_ID NOT IN (SELECT TEST_CASE_ID FROM TEST_CASE_LATEST_STATUS)
+QUALIFY ROW_NUMBER() OVER (PARTITION BY TEST_CASE_ID ORDER BY RUN_TIMESTAMP DESC NULLS LAST) = 1""",
+]
+
+# model -> monotonic time until which its table is treated as unavailable.
+_unavailable_until = {}
+
+
+def _table_available(model) -> bool:
+    return time.monotonic() >= _unavailable_until.get(model, 0)
+
+
+def _mark_available(model):
+    _unavailable_until.pop(model, None)
+
+
+def _mark_unavailable(model, error):
+    """
+    Skips the table for EAGLE_LATEST_STATUS_RETRY_SECONDS so requests go straight to the
+    fallback instead of failing a query first, and warns only when it becomes unavailable.
+    """
+    first = model not in _unavailable_until
+    _unavailable_until[model] = time.monotonic() + float(getattr(settings, "EAGLE_LATEST_STATUS_RETRY_SECONDS", 300))
+    if first:
+        logger.warning(
+            f"{model._meta.db_table} is unavailable, reading the log tables instead until it is back; "
+            f"create and backfill it with `manage.py setup_latest_status`. Error: {error}"
+        )
+
+
+def _aware(value):
+    # Rows journaled before run timestamps were made timezone-aware carry naive values.
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _is_older(candidate, current):
+    """True when timestamp `candidate` is strictly older than `current`."""
+    if candidate is None or current is None:
+        return False
+    return _aware(candidate) < _aware(current)
+
+
+def refresh_latest_test_case_statuses(log_rows):
+    """
+    Folds freshly written TestCaseLog rows (dicts of TestCaseLog fields) into
+    TEST_CASE_LATEST_STATUS with one read and at most one bulk insert and one bulk update.
+    A row only replaces the stored one when it is not older. Never raises: the log row
+    itself is already stored, and the views fall back to the logs if this table is behind.
+    """
+    try:
+        latest = {}
+        for row in log_rows:
+            test_case_id = row.get('test_case_id')
+            if not test_case_id:
+                continue
+            if test_case_id in latest and _is_older(row.get('run_timestamp'), latest[test_case_id].get('run_timestamp')):
+                continue
+            latest[test_case_id] = row
+        if not latest:
+            return
+        existing = TestCaseLatestStatus.objects.using(LOG_DB_ALIAS).in_bulk(list(latest))
+        to_create, to_update = [], []
+        for test_case_id, row in latest.items():
+            values = {field: row.get(field) for field in CASE_STATUS_FIELDS}
+            current = existing.get(test_case_id)
+            if current is None:
+                to_create.append(TestCaseLatestStatus(test_case_id=test_case_id, **values))
+            elif current.run_id == values['run_id'] or not _is_older(values['run_timestamp'], current.run_timestamp):
+                for field, value in values.items():
+                    setattr(current, field, value)
+                # bulk_update skips auto_now, so stamp it here.
+                current.updated_at = timezone.now()
+                to_update.append(current)
+        if to_create:
+            TestCaseLatestStatus.objects.using(LOG_DB_ALIAS).bulk_create(to_create)
+        if to_update:
+            TestCaseLatestStatus.objects.using(LOG_DB_ALIAS).bulk_update(to_update, CASE_STATUS_FIELDS + ['updated_at'])
+    except Exception as e:
+        if _table_available(TestCaseLatestStatus):
+            logger.exception(f"Failed to refresh latest test case statuses: {e}")
+        _mark_unavailable(TestCaseLatestStatus, e)
+
+
+def refresh_latest_group_status(fields):
+    """
+    Folds a TestGroupLog write (a dict with run_id, test_group_id and the log fields) into
+    TEST_GROUP_LATEST_STATUS. An older run finishing after a newer one started is ignored.
+    Never raises.
+    """
+    try:
+        test_group_id = fields.get('test_group_id')
+        if not test_group_id:
+            return
+        values = {field: fields.get(field) for field in GROUP_STATUS_FIELDS}
+        current = TestGroupLatestStatus.objects.using(LOG_DB_ALIAS).filter(test_group_id=test_group_id).first()
+        if (current is not None and current.run_id != values['run_id']
+                and _is_older(values['start_timestamp'], current.start_timestamp)):
+            return
+        TestGroupLatestStatus.objects.using(LOG_DB_ALIAS).update_or_create(test_group_id=test_group_id, defaults=values)
+    except Exception as e:
+        if _table_available(TestGroupLatestStatus):
+            logger.exception(f"Failed to refresh latest status for test group {fields.get('test_group_id')}: {e}")
+        _mark_unavailable(TestGroupLatestStatus, e)
+
+
+def _row_to_dict(obj):
+    row = obj.__dict__.copy()
+    row.pop('_state', None)
+    return row
+
+
+def get_latest_group_statuses(group_ids=None, project_ids=None):
+    """
+    Returns {test_group_id: latest status dict} for the given groups or projects (all groups
+    when neither is given). Falls back to scanning TEST_GROUP_LOGS when the latest-status
+    table can't be read.
+    """
+    if _table_available(TestGroupLatestStatus):
+        try:
+            qs = TestGroupLatestStatus.objects.using(LOG_DB_ALIAS).all()
+            if group_ids is not None:
+                qs = qs.filter(test_group_id__in=list(group_ids))
+            if project_ids is not None:
+                qs = qs.filter(project_id__in=list(project_ids))
+            statuses = {row.test_group_id: _row_to_dict(row) for row in qs}
+            _mark_available(TestGroupLatestStatus)
+            return statuses
+        except Exception as e:
+            _mark_unavailable(TestGroupLatestStatus, e)
+    qs = TestGroupLog.objects.using(LOG_DB_ALIAS).exclude(test_group_id__isnull=True)
+    if group_ids is not None:
+        qs = qs.filter(test_group_id__in=list(group_ids))
+    if project_ids is not None:
+        qs = qs.filter(project_id__in=list(project_ids))
+    latest = {}
+    for row in qs.order_by('-start_timestamp').values('test_group_id', *GROUP_STATUS_FIELDS):
+        latest.setdefault(row['test_group_id'], row)
+    return latest
+
+
+def get_latest_test_case_statuses(test_case_ids):
+    """
+    Returns {test_case_id: latest status dict} for the given test cases. Falls back to
+    scanning TEST_CASE_LOGS when the latest-status table can't be read.
+    """
+    test_case_ids = [tc_id for tc_id in test_case_ids if tc_id]
+    if not test_case_ids:
+        return {}
+    if _table_available(TestCaseLatestStatus):
+        try:
+            qs = TestCaseLatestStatus.objects.using(LOG_DB_ALIAS).filter(test_case_id__in=test_case_ids)
+            statuses = {row.test_case_id: _row_to_dict(row) for row in qs}
+            _mark_available(TestCaseLatestStatus)
+            return statuses
+        except Exception as e:
+            _mark_unavailable(TestCaseLatestStatus, e)
+    latest = {}
+    qs = TestCaseLog.objects.using(LOG_DB_ALIAS).filter(test_case_id__in=test_case_ids).order_by('-run_timestamp')
+    for row in qs.values('test_case_id', *CASE_STATUS_FIELDS):
+        latest.setdefault(row['test_case_id'], row)
+    return latest
+
+
+def count_latest_group_statuses():
+    """
+    Returns [{"criticality", "status", "count"}, ...]: the number of groups whose latest run
+    has each status, per criticality, aggregated in the database. Falls back to a windowed
+    latest-per-group query over TEST_GROUP_LOGS when the latest-status table can't be read.
+    """
+    if _table_available(TestGroupLatestStatus):
+        try:
+            counts = list(
+                TestGroupLatestStatus.objects.using(LOG_DB_ALIAS)
+                .values('criticality', 'status').annotate(count=Count('test_group_id')).order_by()
+            )
+            _mark_available(TestGroupLatestStatus)
+            return counts
+        except Exception as e:
+            _mark_unavailable(TestGroupLatestStatus, e)
+    latest_rows = (
+        TestGroupLog.objects.using(LOG_DB_ALIAS).exclude(test_group_id__isnull=True)
+        .annotate(rank=Window(
+            RowNumber(), partition_by=[F('test_group_id')],
+            order_by=F('start_timestamp').desc(nulls_last=True)
+        ))
+        .filter(rank=1).values('criticality', 'status')
+    )
+    counts = {}
+    for row in latest_rows:
+        key = (row['criticality'], row['status'])
+        counts[key] = counts.get(key, 0) + 1
+    return [{"criticality": crit, "status": status, "count": count} for (crit, status), count in counts.items()]
@@ -0,0 +1,153 @@
+# dq_management/log_queries.py
+
+import json
+import base64
+import logging
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from dq_management.models import TestCaseLog, TestGroupLog, ProjectLogs
+
+logger = logging.getLogger(__name__)
+
+LOG_DB_ALIAS = 'snowflake_dev'
+
+# Per log kind: the model, its ordering timestamp, its status column, the JSON columns that
+# may come back as strings, and which request filters apply (filter name -> lookup).
+LOG_KINDS = {
+    'case': {
+        'model': TestCaseLog,
+        'timestamp': 'run_timestamp',
+        'status': 'run_status',
+        'json_fields': ['source_value', 'destination_value', 'difference'],
+        'filters': {
+            'project_id': 'project_id', 'test_case_id': 'test_case_id', 'run_id': 'run_id',
+            'parent_run_id': 'parent_run_id', 'criticality': 'criticality__iexact',
+            'test_type': 'test_type__icontains',
+        },
+    },
+    'group': {
+        'model': TestGroupLog,
+        'timestamp': 'start_timestamp',
+        'status': 'status',
+        'json_fields': ['results_details'],
+        'filters': {
+            'project_id': 'project_id', 'test_group_id': 'test_group_id', 'run_id': 'run_id',
+            'criticality': 'criticality__iexact',
+        },
+    },
+    'project': {
+        'model': ProjectLogs,
+        'timestamp': 'start_timestamp',
+        'status': 'status',
+        'json_fields': ['results_details'],
+        'filters': {
+            'project_id': 'project_id', 'run_id': 'run_id', 'criticality': 'criticality__iexact',
+        },
+    },
+}
+
+FILTER_NAMES = [
+    'project_id', 'test_group_id', 'test_case_id', 'status', 'criticality', 'test_type',
+    'parent_run_id', 'run_id', 'date_from', 'date_to',
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_logs_page_size(requested=None) -> int:
+    default = int(getattr(settings, "EAGLE_LOGS_PAGE_SIZE", 50))
+    maximum = int(getattr(settings, "EAGLE_LOGS_MAX_PAGE_SIZE", 500))
+    try:
+        size = int(requested) if requested not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def filters_from_params(params) -> dict:
+    """Picks the supported, non-empty log filters out of a QueryDict (or plain dict)."""
+    return {name: params.get(name).strip() for name in FILTER_NAMES if (params.get(name) or '').strip()}
+
+
+def encode_cursor(timestamp, run_id) -> str:
+    raw = json.dumps([timestamp.isoformat(), run_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, run_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(run_id)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _parse_date(value, name):
+    try:
+        parsed = datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), time.min)
+    except ValueError as e:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format.") from e
+    if settings.USE_TZ:
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _apply_filters(qs, spec, filters):
+    ts_field = spec['timestamp']
+    for name, lookup in spec['filters'].items():
+        if filters.get(name):
+            qs = qs.filter(**{lookup: filters[name]})
+    if filters.get('status'):
+        qs = qs.filter(**{spec['status']: filters['status'].upper()})
+    if filters.get('date_from'):
+        qs = qs.filter(**{f"{ts_field}__gte": _parse_date(filters['date_from'], 'date_from')})
+    if filters.get('date_to'):
+        # date_to is inclusive: everything before the start of the following day.
+        qs = qs.filter(**{f"{ts_field}__lt": _parse_date(filters['date_to'], 'date_to') + timedelta(days=1)})
+    return qs
+
+
+def _row_to_dict(values, json_fields):
+    for key in json_fields:
+        if isinstance(values.get(key), str):
+            try:
+                values[key] = json.loads(values[key])
+            except json.JSONDecodeError:
+                pass
+    return values
+
+
+def get_logs_page(kind, filters=None, cursor=None, limit=None):
+    """
+    Returns (rows, next_cursor) for one page of the given log kind ('case', 'group' or
+    'project'), newest first. Paging is keyset-based on (timestamp, run_id), so each page
+    is one indexed range read no matter how deep it is. next_cursor is None on the last
+    page. Rows without a timestamp can't be placed in the keyset order and are skipped.
+
+    Raises KeyError for an unknown kind, InvalidCursor for a malformed cursor and
+    ValueError for a malformed date filter.
+    """
+    spec = LOG_KINDS[kind]
+    ts_field = spec['timestamp']
+    limit = get_logs_page_size(limit)
+
+    qs = spec['model'].objects.using(LOG_DB_ALIAS).filter(**{f"{ts_field}__isnull": False})
+    qs = _apply_filters(qs, spec, filters or {})
+    if cursor:
+        cursor_ts, cursor_run_id = decode_cursor(cursor)
+        qs = qs.filter(
+            Q(**{f"{ts_field}__lt": cursor_ts}) | Q(**{ts_field: cursor_ts, 'run_id__lt': cursor_run_id})
+        )
+    qs = qs.order_by(F(ts_field).desc(), F('run_id').desc())
+
+    rows = [_row_to_dict(values, spec['json_fields']) for values in qs.values()[:limit + 1]]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][ts_field], rows[-1]['run_id'])
+    return rows, next_cursor
@@ -0,0 +1,31 @@
+# dq_management/log_utils.py
+
+import random
+import logging
+from django.conf import settings
+
+
+def truncate_for_log(text, max_chars=None) -> str:
+    """
+    Returns `text` cut to EAGLE_LOG_BODY_MAX_CHARS characters (default 500), with a
+    marker giving the original length, so large queries and payloads stay cheap to log.
+    """
+    if text is None:
+        return ""
+    text = str(text)
+    if max_chars is None:
+        max_chars = int(getattr(settings, "EAGLE_LOG_BODY_MAX_CHARS", 500))
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [truncated, {len(text)} chars]"
+
+
+def should_log_full_payload(logger: logging.Logger) -> bool:
+    """
+    True when this call should capture complete request/response payloads: DEBUG must be
+    enabled on `logger` and the call must fall within EAGLE_LOG_PAYLOAD_SAMPLE_RATE (0.0-1.0).
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    sample_rate = float(getattr(settings, "EAGLE_LOG_PAYLOAD_SAMPLE_RATE", 0.0))
+    return sample_rate > 0 and random.random() < sample_rate
@@ -0,0 +1,140 @@
+# dq_management/log_writer.py
+
+import time
+import threading
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from dq_management.models import TestCase, TestCaseLog
+from dq_management.latest_status import refresh_latest_test_case_statuses
+from dq_management.metadata_cache import invalidate_metadata
+
+logger = logging.getLogger(__name__)
+
+LOG_DB_ALIAS = 'snowflake_dev'
+
+
+def write_test_case_logs(logs):
+    """
+    Inserts TestCaseLog instances with one bulk_create and folds them into the
+    latest-status table. Raises when the insert fails. This is the batched write path for
+    test case logs: the result journal drainer uses it for every batch it drains, and
+    BufferedLogWriter for the rows it buffers.
+    """
+    with transaction.atomic(using=LOG_DB_ALIAS):
+        TestCaseLog.objects.using(LOG_DB_ALIAS).bulk_create(logs)
+    refresh_latest_test_case_statuses([log_entry.__dict__ for log_entry in logs])
+
+
+class BufferedLogWriter:
+    """
+    Write-behind buffer for the TestCase status updates of one group or project run, and
+    for its TestCaseLog rows when they can't go to the result journal. With the journal
+    enabled (the default) log rows are journaled instead and the journal drainer inserts
+    them in batches through write_test_case_logs.
+
+    Rows are flushed with one bulk_create and one set-based UPDATE per status once
+    EAGLE_LOG_FLUSH_MAX_ROWS rows are buffered or EAGLE_LOG_FLUSH_INTERVAL_SECONDS have
+    passed since the last flush (checked on each write). Callers must call flush() at run
+    end. A failed bulk flush falls back to per-row writes so no result is lost.
+    """
+
+    def __init__(self, max_rows=None, flush_interval=None):
+        if max_rows is None:
+            max_rows = getattr(settings, "EAGLE_LOG_FLUSH_MAX_ROWS", 50)
+        if flush_interval is None:
+            flush_interval = getattr(settings, "EAGLE_LOG_FLUSH_INTERVAL_SECONDS", 5)
+        self.max_rows = max(1, int(max_rows))
+        self.flush_interval = float(flush_interval)
+        self._logs = []
+        self._statuses = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+        self.flushes = 0
+        self.fallbacks = 0
+
+    def add_test_case_log(self, **fields):
+        # Stamp the row now: auto_now_add/defaults would only fire at the bulk_create,
+        # giving every row of a flush the flush time instead of its own run time.
+        fields.setdefault('run_timestamp', timezone.now())
+        with self._lock:
+            self._logs.append(TestCaseLog(**fields))
+        self._flush_if_due()
+
+    def set_test_case_status(self, test_case_id, status):
+        with self._lock:
+            self._statuses[test_case_id] = status
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        with self._lock:
+            due = (len(self._logs) >= self.max_rows
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything buffered so far. Flushes are serialized; writes that arrive
+        during a flush are picked up by the next one.
+        """
+        with self._flush_lock:
+            with self._lock:
+                logs, self._logs = self._logs, []
+                statuses, self._statuses = self._statuses, {}
+                self._last_flush = time.monotonic()
+            if not logs and not statuses:
+                return
+            started = time.perf_counter()
+            self._write_logs(logs)
+            self._write_statuses(statuses)
+            self.flushes += 1
+            logger.info(
+                f"Flushed {len(logs)} test case log(s) and {len(statuses)} status update(s) "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms."
+            )
+
+    def _write_logs(self, logs):
+        if not logs:
+            return
+        try:
+            write_test_case_logs(logs)
+            self.rows_written += len(logs)
+            return
+        except Exception as e:
+            logger.exception(f"Bulk insert of {len(logs)} test case logs failed; writing rows one by one: {e}")
+            self.fallbacks += 1
+        written = []
+        for log_entry in logs:
+            try:
+                log_entry.save(using=LOG_DB_ALIAS, force_insert=True)
+                written.append(log_entry.__dict__)
+            except Exception as e:
+                logger.exception(f"Error creating TestCaseLog for run {log_entry.run_id}: {e}")
+        self.rows_written += len(written)
+        refresh_latest_test_case_statuses(written)
+
+    def _write_statuses(self, statuses):
+        by_status = {}
+        for test_case_id, status in statuses.items():
+            by_status.setdefault(status, []).append(test_case_id)
+            # The UPDATEs below send no signals; drop the rows from the run's snapshot.
+            invalidate_metadata(TestCase, test_case_id)
+        for status, test_case_ids in by_status.items():
+            try:
+                TestCase.objects.using(LOG_DB_ALIAS).filter(test_case_id__in=test_case_ids).update(status=status)
+                continue
+            except Exception as e:
+                logger.exception(f"Set-based status update to {status} failed; updating test cases one by one: {e}")
+                self.fallbacks += 1
+            for test_case_id in test_case_ids:
+                try:
+                    TestCase.objects.using(LOG_DB_ALIAS).filter(test_case_id=test_case_id).update(status=status)
+                except Exception as e:
+                    logger.error(f"Failed to update status for test case {test_case_id}: {e}")
+
+    def stats(self):
+        return {"rows_written": self.rows_written, "flushes": self.flushes, "fallbacks": self.fallbacks}
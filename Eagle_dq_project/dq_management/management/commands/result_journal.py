@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from dq_management.result_journal import (
+    pending_journal_count, quarantined_journal_entries, requeue_failed_journal_entries,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the local result journal: how many results wait to be written to Snowflake "
+        "and which ones were quarantined after failing EAGLE_RESULT_JOURNAL_MAX_ATTEMPTS times."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requeue', action='store_true',
+            help="Reset quarantined entries so the drainer tries them again."
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = requeue_failed_journal_entries()
+            self.stdout.write(f"Requeued {requeued} quarantined journal entries.")
+        quarantined = quarantined_journal_entries()
+        self.stdout.write(f"{pending_journal_count()} journaled result(s) pending, {len(quarantined)} quarantined.")
+        for entry in quarantined:
+            self.stdout.write(
+                f"  #{entry['id']} {entry['kind']} run {entry['run_id']} "
+                f"({entry['attempts']} attempts): {entry['last_error']}"
+            )
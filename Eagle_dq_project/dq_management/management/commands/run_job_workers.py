@@ -0,0 +1,76 @@
+import signal
+import logging
+import threading
+import multiprocessing
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_process_main():
+    from dq_management.job_worker import run_worker
+    stop_event = threading.Event()
+    # SIGTERM lets the current run finish; the parent forwards it on shutdown.
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    run_worker(stop_event)
+
+
+def _spawned_worker_main():
+    # A spawned child starts from a fresh interpreter: no inherited threads, locks,
+    # database connections or journal drainer identity from the parent.
+    django.setup()
+    _worker_process_main()
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the worker processes that execute queued group and project runs. Each process "
+        "runs one job at a time, so --processes bounds how many runs execute at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help="Number of worker processes (default: EAGLE_JOB_WORKER_PROCESSES, 2)."
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes'] or int(getattr(settings, "EAGLE_JOB_WORKER_PROCESSES", 2))
+        processes = max(1, processes)
+        if processes == 1:
+            self.stdout.write("Starting 1 job worker.")
+            _worker_process_main()
+            return
+
+        context = multiprocessing.get_context('spawn')
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        def start_worker(slot):
+            process = context.Process(target=_spawned_worker_main, name=f"eagle-job-worker-{slot}")
+            process.start()
+            return process
+
+        workers = [start_worker(slot) for slot in range(processes)]
+        self.stdout.write(f"Started {processes} job workers.")
+        while not stopping.wait(5):
+            for slot, process in enumerate(workers):
+                if not process.is_alive():
+                    # Its job, if any, is requeued by the stale-job recovery of the other workers.
+                    logger.warning(f"Job worker {process.name} exited with code {process.exitcode}; restarting it.")
+                    workers[slot] = start_worker(slot)
+
+        self.stdout.write("Stopping job workers; waiting for running jobs to finish.")
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        for process in workers:
+            process.join()
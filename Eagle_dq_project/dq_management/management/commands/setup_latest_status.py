@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from dq_management.latest_status import LOG_DB_ALIAS, LATEST_STATUS_DDL, LATEST_STATUS_BACKFILL
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates TEST_GROUP_LATEST_STATUS and TEST_CASE_LATEST_STATUS on Snowflake if they are "
+        "missing and backfills them from TEST_GROUP_LOGS and TEST_CASE_LOGS. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-backfill', action='store_true', help="Only create the tables.")
+        parser.add_argument('--print-sql', action='store_true', help="Print the statements instead of running them.")
+
+    def handle(self, *args, **options):
+        statements = LATEST_STATUS_DDL + ([] if options['skip_backfill'] else LATEST_STATUS_BACKFILL)
+        if options['print_sql']:
+            for statement in statements:
+                self.stdout.write(f"{statement};\n")
+            return
+        with connections[LOG_DB_ALIAS].cursor() as cursor:
+            for statement in statements:
+                self.stdout.write(statement.splitlines()[0])
+                cursor.execute(statement)
+                if cursor.rowcount is not None and cursor.rowcount >= 0:
+                    self.stdout.write(f"  -> {cursor.rowcount} row(s)")
+        self.stdout.write("Latest-status tables are ready.")
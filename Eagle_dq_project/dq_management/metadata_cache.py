@@ -0,0 +1,178 @@
+# dq_management/metadata_cache.py
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dq_management.models import Project, TestGroup, TestCase
+
+logger = logging.getLogger(__name__)
+
+_active = threading.local()
+
+
+class _TTLCache:
+    """
+    Small thread-safe map whose entries expire after EAGLE_METADATA_CACHE_TTL_SECONDS
+    (0 disables it). Misses (rows that don't exist) are cached too.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            return True, value
+
+    def set(self, key, value):
+        ttl = float(getattr(settings, "EAGLE_METADATA_CACHE_TTL_SECONDS", 60))
+        if ttl <= 0:
+            return
+        max_entries = int(getattr(settings, "EAGLE_METADATA_CACHE_MAX_ENTRIES", 5000))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache for reads made outside a run (log helpers, ad-hoc runs). Only the
+# project and group rows whose names and criticality are copied into the logs are kept:
+# an edit made in another process reaches them within the TTL. Test case definitions are
+# what a test executes, so outside a run they are always read from the database.
+_shared = {Project: _TTLCache(), TestGroup: _TTLCache()}
+
+
+class MetadataSnapshot:
+    """
+    Project, group and test case rows read during one group run. Each row is read from
+    the database the first time the run asks for it and reused for the rest of the run,
+    so a run sees fresh definitions when it starts (whichever process the edit was made
+    in) without re-reading them for every test. Misses (rows that don't exist) are kept
+    too, so a missing project isn't re-queried for every test.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def get(self, model, pk):
+        key = (model, pk)
+        with self._lock:
+            if key in self._rows:
+                return self._rows[key]
+        value = _read(model, pk)
+        if model in _shared:
+            _shared[model].set(pk, value)
+        with self._lock:
+            return self._rows.setdefault(key, value)
+
+    def invalidate(self, model, pk):
+        with self._lock:
+            self._rows.pop((model, pk), None)
+
+
+def get_active_metadata_snapshot():
+    """Returns the snapshot activated on the current thread, or None outside a run."""
+    return getattr(_active, "snapshot", None)
+
+
+@contextmanager
+def activate_metadata_snapshot(snapshot):
+    """Makes `snapshot` the active metadata snapshot on the current thread for the block."""
+    previous = getattr(_active, "snapshot", None)
+    _active.snapshot = snapshot
+    try:
+        yield snapshot
+    finally:
+        _active.snapshot = previous
+
+
+def _read(model, pk):
+    try:
+        return model.objects.using('snowflake_dev').get(pk=pk)
+    except model.DoesNotExist:
+        return None
+
+
+def _get(model, pk):
+    if not pk:
+        return None
+    snapshot = get_active_metadata_snapshot()
+    if snapshot is not None:
+        return snapshot.get(model, pk)
+    cache = _shared.get(model)
+    if cache is None:
+        return _read(model, pk)
+    hit, value = cache.get(pk)
+    if hit:
+        return value
+    value = _read(model, pk)
+    cache.set(pk, value)
+    return value
+
+
+def get_project(project_id):
+    """
+    Returns the Project row (or None): from the active run's snapshot, or from the
+    process-wide TTL cache outside a run. Returned instances are shared between threads
+    and must not be modified.
+    """
+    return _get(Project, project_id)
+
+
+def get_test_group(group_id):
+    """Returns the TestGroup row (or None); see get_project."""
+    return _get(TestGroup, group_id)
+
+
+def get_test_case(test_case_id):
+    """
+    Returns the TestCase row (or None): from the active run's snapshot, or read from the
+    database outside a run.
+    """
+    return _get(TestCase, test_case_id)
+
+
+def invalidate_metadata(model, pk):
+    """
+    Drops one row from the active snapshot and the process-wide cache, so it is re-read.
+    Needed after queryset .update() calls, which send no signals.
+    """
+    snapshot = get_active_metadata_snapshot()
+    if snapshot is not None:
+        snapshot.invalidate(model, pk)
+    if model in _shared:
+        _shared[model].invalidate(pk)
+
+
+def clear_metadata_cache():
+    for cache in _shared.values():
+        cache.clear()
+
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=TestGroup)
+@receiver([post_save, post_delete], sender=TestCase)
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_metadata(sender, instance.pk)
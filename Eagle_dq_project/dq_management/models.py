@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # --- 1. PROJECTS Table ---
 class Project(models.Model):
@@ -179,7 +180,8 @@ class TestCaseLog(models.Model):
     threshold_value = models.CharField(max_length=16777216, blank=True, null=True) # Changed
     source_query = models.TextField(blank=True, null=True)
     destination_query = models.TextField(blank=True, null=True)
-    run_timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the test ran, not when the row is inserted; journaled rows can be written later.
+    run_timestamp = models.DateTimeField(default=timezone.now, editable=False)
     source_connection_used = models.CharField(max_length=255, blank=True, null=True)
     destination_connection_used = models.CharField(max_length=255, blank=True, null=True)
     parent_run_id = models.CharField(max_length=255, blank=True, null=True)
@@ -218,3 +220,54 @@ class ProjectLogs(models.Model):
 
     def __str__(self):
         return F"Log { self.run_id } - { self.project_name or 'N/A' } - { self.run_status or 'N/A' }"
+
+
+# --- 8. TEST_GROUP_LATEST_STATUS Table ---
+# One row per test group holding its most recent run, kept current on every group log write.
+class TestGroupLatestStatus(models.Model):
+    test_group_id = models.CharField(max_length=36, primary_key=True, db_column='TEST_GROUP_ID')
+    project_id = models.CharField(max_length=36, blank=True, null=True, db_column='PROJECT_ID')
+    group_name = models.CharField(max_length=255, blank=True, null=True)
+    criticality = models.CharField(max_length=50, blank=True, null=True)
+    run_id = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=50, blank=True, null=True)
+    message = models.TextField(blank=True, null=True)
+    start_timestamp = models.DateTimeField(blank=True, null=True)
+    end_timestamp = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = False
+        db_table = 'TEST_GROUP_LATEST_STATUS'
+        verbose_name = 'Test Group Latest Status'
+        verbose_name_plural = 'Test Group Latest Statuses'
+
+    def __str__(self):
+        return f"{self.group_name or self.test_group_id} - {self.status or 'N/A'}"
+
+
+# --- 9. TEST_CASE_LATEST_STATUS Table ---
+# One row per test case holding its most recent run, kept current on every test case log write.
+class TestCaseLatestStatus(models.Model):
+    test_case_id = models.CharField(max_length=36, primary_key=True, db_column='TEST_CASE_ID')
+    project_id = models.CharField(max_length=36, blank=True, null=True, db_column='PROJECT_ID')
+    test_name = models.CharField(max_length=255, blank=True, null=True)
+    criticality = models.CharField(max_length=50, blank=True, null=True)
+    run_id = models.CharField(max_length=255, blank=True, null=True)
+    parent_run_id = models.CharField(max_length=255, blank=True, null=True)
+    run_status = models.CharField(max_length=50, blank=True, null=True)
+    run_message = models.TextField(blank=True, null=True)
+    possible_resolution = models.TextField(blank=True, null=True)
+    source_query = models.TextField(blank=True, null=True)
+    destination_query = models.TextField(blank=True, null=True)
+    run_timestamp = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = False
+        db_table = 'TEST_CASE_LATEST_STATUS'
+        verbose_name = 'Test Case Latest Status'
+        verbose_name_plural = 'Test Case Latest Statuses'
+
+    def __str__(self):
+        return f"{self.test_name or self.test_case_id} - {self.run_status or 'N/A'}"
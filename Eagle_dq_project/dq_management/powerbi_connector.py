@@ -1,61 +1,249 @@
 import msal
 import requests
 import logging
+import threading
+import time
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from dq_management.log_utils import truncate_for_log, should_log_full_payload
+from dq_management.query_cache import get_active_query_cache, normalize_query_text
 import pandas as pd
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+POWERBI_SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
+
+
+class PowerBITokenProvider:
+    """
+    Process-wide, thread-safe cache of the Power BI client-credentials token.
+    The token is reused until it is within POWERBI_TOKEN_REFRESH_MARGIN_SECONDS of expiry.
+    Refresh is single-flight: one thread calls Azure AD while the others wait for its token.
+    """
+
+    def __init__(self, client_id, tenant_id, client_secret):
+        self.client_id = client_id
+        self.tenant_id = tenant_id
+        self.client_secret = client_secret
+        self._client = None
+        self._access_token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        margin = getattr(settings, "POWERBI_TOKEN_REFRESH_MARGIN_SECONDS", 300)
+        return self._access_token is not None and time.monotonic() < self._expires_at - margin
+
+    def get_token(self) -> str:
+        if self._is_fresh():
+            return self._access_token
+        with self._lock:
+            # Another thread may have refreshed while this one waited for the lock.
+            if self._is_fresh():
+                return self._access_token
+            self._refresh()
+            return self._access_token
+
+    def invalidate(self):
+        with self._lock:
+            self._access_token = None
+            self._expires_at = 0.0
+
+    def _refresh(self):
+        authority = f"https://login.microsoftonline.com/{self.tenant_id}"
+        try:
+            if self._client is None:
+                self._client = msal.ConfidentialClientApplication(
+                    client_id=self.client_id, authority=authority, client_credential=self.client_secret
+                )
+            requested_at = time.monotonic()
+            response = self._client.acquire_token_for_client(scopes=POWERBI_SCOPE)
+
+            if 'access_token' not in response:
+                error_msg = f"Failed to acquire Power BI access token: {response.get('error_description', 'Unknown error')}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+            self._access_token = response['access_token']
+            self._expires_at = requested_at + int(response.get('expires_in', 3600))
+            logger.info("Power BI access token acquired successfully.")
+        except Exception as e:
+            error_msg = f"Error during Power BI token acquisition: {str(e)}"
+            logger.error(error_msg)
+            raise ConnectionError(error_msg)
+
+
+_token_providers = {}
+_token_providers_lock = threading.Lock()
+
+
+def get_powerbi_token_provider(credentials) -> PowerBITokenProvider:
+    """
+    Returns the shared token provider for a set of Power BI credentials.
+    """
+    client_id = credentials.get("client_id")
+    tenant_id = credentials.get("tenant_id")
+    client_secret = credentials.get("client_secret")
+
+    if not all([client_id, tenant_id, client_secret]):
+        raise ValueError("Power BI credentials are not complete. Please check Django settings.")
+
+    key = (tenant_id, client_id, client_secret)
+    with _token_providers_lock:
+        provider = _token_providers.get(key)
+        if provider is None:
+            provider = PowerBITokenProvider(client_id, tenant_id, client_secret)
+            _token_providers[key] = provider
+        return provider
+
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_dataset_semaphores = {}
+_dataset_semaphores_lock = threading.Lock()
+
+
+def get_powerbi_session() -> requests.Session:
+    """
+    Returns the process-wide keep-alive session used for Power BI REST calls, so
+    repeated queries reuse pooled TLS connections instead of handshaking every time.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = int(getattr(settings, "POWERBI_HTTP_POOL_SIZE", 20))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _get_dataset_semaphore(dataset_id) -> threading.BoundedSemaphore:
+    """
+    Caps in-flight executeQueries calls per dataset at POWERBI_MAX_CONCURRENT_QUERIES_PER_DATASET.
+    """
+    with _dataset_semaphores_lock:
+        semaphore = _dataset_semaphores.get(dataset_id)
+        if semaphore is None:
+            limit = max(1, int(getattr(settings, "POWERBI_MAX_CONCURRENT_QUERIES_PER_DATASET", 4)))
+            semaphore = threading.BoundedSemaphore(limit)
+            _dataset_semaphores[dataset_id] = semaphore
+        return semaphore
+
+
+def _retry_after_seconds(response):
+    """
+    Parses a Retry-After header given either in seconds or as an HTTP date.
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_seconds(attempt, response=None):
+    base = float(getattr(settings, "POWERBI_BACKOFF_BASE_SECONDS", 1.0))
+    cap = float(getattr(settings, "POWERBI_BACKOFF_MAX_SECONDS", 30.0))
+    retry_after = _retry_after_seconds(response)
+    if retry_after is not None:
+        return min(retry_after, cap)
+    # Exponential backoff with full jitter.
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
 class PowerBIConnector:
     def __init__(self):
         """
         Initializes the Power BI connector and authenticates with Azure AD.
-        Credentials are fetched from Django's POWERBI_CREDENTIALS.
+        Credentials are fetched from Django's POWERBI_CREDENTIALS; the token comes
+        from the process-wide provider, so constructing a connector is cheap.
         """
         self.credentials = settings.POWERBI_CREDENTIALS
+        self.token_provider = get_powerbi_token_provider(self.credentials)
+        self.access_token = self._get_access_token()
+        self.base_url = "https://api.powerbi.com/v1.0/myorg/groups"
+
+    @property
+    def headers(self):
+        # Read the token on every use so a long-lived connector picks up refreshed tokens.
         self.access_token = self._get_access_token()
-        self.headers = {
+        return {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
-        self.base_url = "https://api.powerbi.com/v1.0/myorg/groups"
 
     def _get_access_token(self) -> str:
         """
-        Acquires an access token for the Power BI API using client credentials flow.
+        Returns a valid access token for the Power BI API using client credentials flow.
         """
-        client_id = self.credentials.get("client_id")
-        tenant_id = self.credentials.get("tenant_id")
-        client_secret = self.credentials.get("client_secret")
-
-        if not all([client_id, tenant_id, client_secret]):
-            raise ValueError("Power BI credentials are not complete. Please check Django settings.")
-
-        authority = f"https://login.microsoftonline.com/{tenant_id}"
-        scope = ["https://analysis.windows.net/powerbi/api/.default"]
-        
-        try:
-            client = msal.ConfidentialClientApplication(
-                client_id=client_id, authority=authority, client_credential=client_secret
-            )
-            response = client.acquire_token_for_client(scopes=scope)
+        return self.token_provider.get_token()
 
-            if 'access_token' not in response:
-                error_msg = f"Failed to acquire Power BI access token: {response.get('error_description', 'Unknown error')}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
+    def _post_with_retries(self, api_url: str, dataset_id: str, payload: dict) -> requests.Response:
+        """
+        POSTs to the Power BI API over the shared session, retrying throttling (429),
+        transient 5xx responses and connection errors with exponential backoff that
+        honours Retry-After. A 401 refreshes the token once. Returns the last response.
+        """
+        max_retries = int(getattr(settings, "POWERBI_MAX_RETRIES", 4))
+        timeout = float(getattr(settings, "POWERBI_REQUEST_TIMEOUT_SECONDS", 120))
+        session = get_powerbi_session()
+        token_refreshed = False
+        attempt = 0
+        while True:
+            try:
+                with _get_dataset_semaphore(dataset_id):
+                    response = session.post(api_url, headers=self.headers, json=payload, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = _backoff_seconds(attempt)
+                logger.warning(f"Power BI request failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s.")
+                time.sleep(delay)
+                attempt += 1
+                continue
 
-            logger.info("Power BI access token acquired successfully.")
-            return response['access_token']
-        except Exception as e:
-            error_msg = f"Error during Power BI token acquisition: {str(e)}"
-            logger.error(error_msg)
-            raise ConnectionError(error_msg)
+            if response.status_code == 401 and not token_refreshed:
+                token_refreshed = True
+                self.token_provider.invalidate()
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                delay = _backoff_seconds(attempt, response)
+                logger.warning(
+                    f"Power BI API returned {response.status_code}; retry {attempt + 1}/{max_retries} in {delay:.1f}s."
+                )
+                time.sleep(delay)
+                attempt += 1
+                continue
+            return response
 
     def _execute_dax_query(self, workspace_id: str, dataset_id: str, dax_query: str) -> pd.DataFrame:
         """
         Executes a DAX query against a Power BI dataset and returns results as a DataFrame.
+        Inside a group or project run, identical queries are served from the run's query cache.
         """
+        query_cache = get_active_query_cache()
+        if query_cache is None:
+            return self._execute_dax_query_uncached(workspace_id, dataset_id, dax_query)
+        key = ("dax", workspace_id, dataset_id, normalize_query_text(dax_query))
+        return query_cache.get_or_execute(
+            key, lambda: self._execute_dax_query_uncached(workspace_id, dataset_id, dax_query)
+        )
+
+    def _execute_dax_query_uncached(self, workspace_id: str, dataset_id: str, dax_query: str) -> pd.DataFrame:
         api_url = f"{self.base_url}/{workspace_id}/datasets/{dataset_id}/executeQueries"
         
         payload = {
@@ -70,30 +258,41 @@ class PowerBIConnector:
             }
         }
         
+        started = time.perf_counter()
+        capture_payload = should_log_full_payload(logger)
         try:
-            logger.info(f"Sending DAX query to Power BI: {dax_query}")
-            response = requests.post(api_url, headers=self.headers, json=payload)
-            logger.info(f"Power BI API response status: {response.status_code}")
-            logger.info(f"Power BI API response content: {response.text}")
+            if capture_payload:
+                logger.debug(f"Power BI DAX query (dataset={dataset_id}): {dax_query}")
+            else:
+                logger.debug(f"Power BI DAX query (dataset={dataset_id}): {truncate_for_log(dax_query)}")
+            response = self._post_with_retries(api_url, dataset_id, payload)
+            body_bytes = len(response.content or b"")
+            if capture_payload:
+                logger.debug(f"Power BI response body (dataset={dataset_id}): {response.text}")
             response.raise_for_status()
             result = response.json()
 
             if not result.get('results') or not result['results'][0].get('tables') or not result['results'][0]['tables'][0].get('rows'):
-                logger.warning("No rows found in Power BI query result.")
+                logger.warning(
+                    "Power BI executeQueries dataset=%s status=%s bytes=%d rows=0 elapsed_ms=%.1f (no rows)",
+                    dataset_id, response.status_code, body_bytes, (time.perf_counter() - started) * 1000
+                )
                 return pd.DataFrame()
 
             rows = result['results'][0]['tables'][0]['rows']
             df = pd.DataFrame(rows)
-            logger.info("DAX query successful and data converted to DataFrame.")
+            logger.info(
+                "Power BI executeQueries dataset=%s status=%s bytes=%d rows=%d elapsed_ms=%.1f",
+                dataset_id, response.status_code, body_bytes, len(rows), (time.perf_counter() - started) * 1000
+            )
             return df
         except requests.exceptions.RequestException as e:
             error_msg = f"Power BI API Request Error: {str(e)}"
-            logger.error(error_msg)
             if e.response is not None:
-                logger.error(f"Power BI Response content: {e.response.text}")
-                error_msg += f" Response: {e.response.text}"
+                error_msg += f" Response: {truncate_for_log(e.response.text)}"
+            logger.error(f"{error_msg} (dataset={dataset_id}, elapsed_ms={(time.perf_counter() - started) * 1000:.1f})")
             raise RuntimeError(error_msg)
         except Exception as e:
             error_msg = f"Error processing Power BI query result: {str(e)}"
             logger.error(error_msg)
-            raise RuntimeError(error_msg)
\ No newline at end of file
+            raise RuntimeError(error_msg)
@@ -0,0 +1,105 @@
+# dq_management/query_cache.py
+
+import re
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_active = threading.local()
+
+
+def normalize_query_text(query) -> str:
+    """
+    Collapses whitespace and drops a trailing semicolon so formatting differences
+    don't defeat the cache. Case is kept, since literals are case-sensitive.
+    """
+    return re.sub(r"\s+", " ", str(query or "")).strip().rstrip(";").strip()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RunQueryCache:
+    """
+    Query result cache that lives for one group or project run.
+
+    get_or_execute() is single-flight: when several threads ask for the same key at once,
+    one executes and the others wait for its result. Successful results are kept for the
+    rest of the run (up to max_entries); failures are handed to the waiting callers but
+    never stored, so a later caller retries.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._results = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_execute(self, key, execute, is_cacheable=None):
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        try:
+            value = execute()
+            in_flight.value = value
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if (in_flight.error is None and len(self._results) < self.max_entries
+                        and (is_cacheable is None or is_cacheable(in_flight.value))):
+                    self._results[key] = in_flight.value
+            in_flight.done.set()
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "coalesced": self.coalesced, "misses": self.misses}
+
+
+def get_active_query_cache():
+    """
+    Returns the run cache activated on the current thread, or None outside a run.
+    """
+    return getattr(_active, "cache", None)
+
+
+@contextmanager
+def activate_query_cache(cache):
+    """
+    Makes `cache` the active run cache on the current thread for the duration of the block.
+    """
+    previous = getattr(_active, "cache", None)
+    _active.cache = cache
+    try:
+        yield cache
+    finally:
+        _active.cache = previous
@@ -0,0 +1,211 @@
+# dq_management/query_fusion.py
+
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from dq_management.dq_core import (
+    build_fused_aggregation_query,
+    build_dax_scalar_expression_powerbi,
+    build_fused_dax_query_powerbi,
+    execute_query_first_row,
+    first_row_value
+)
+from dq_management.powerbi_connector import PowerBIConnector
+from dq_management.test_case_manager import TestCaseProcessor
+
+logger = logging.getLogger(__name__)
+
+FUSIBLE_TEST_TYPES = ('aggregationcomparison',)
+
+
+def _fusion_key(config, prefix, conn_name):
+    """
+    Returns the key under which a SQL side of a test can share a scan, or None when the
+    side is not a plain SQL aggregation (custom SQL and GROUP BY sides are never fused).
+    """
+    if conn_name == "Power BI" or conn_name not in settings.DATABASES:
+        return None
+    if (config.get(f'{prefix}_custom_sql') or '').strip():
+        return None
+    if (config.get(f'{prefix}_group_by_column') or '').strip():
+        return None
+    if not config.get(f'{prefix}_table') or not config.get(f'{prefix}_aggregation_type'):
+        return None
+    schema = config.get(f'{prefix}_schema') or settings.DATABASES[conn_name].get('schema') or 'PUBLIC'
+    return (
+        conn_name,
+        schema,
+        config.get(f'{prefix}_table').strip(),
+        (config.get(f'{prefix}_date_column') or '').strip(),
+        (config.get(f'{prefix}_date_value') or '').strip(),
+        (config.get(f'{prefix}_additional_filters') or '').strip(),
+    )
+
+
+def _dax_fusion_key(config, prefix):
+    """
+    Returns the (workspace, dataset) a Power BI side can share a query on, or None for
+    custom DAX and grouped sides.
+    """
+    if (config.get(f'{prefix}_dax_query') or '').strip():
+        return None
+    if (config.get(f'{prefix}_group_by_column') or '').strip():
+        return None
+    workspace_id = (config.get(f'{prefix}_workspace_id') or '').strip()
+    dataset_id = (config.get(f'{prefix}_dataset_id') or '').strip()
+    if not workspace_id or not dataset_id or not config.get(f'{prefix}_table'):
+        return None
+    return (workspace_id, dataset_id)
+
+
+def _plan_fused_dax_queries(configs_by_test_case_id, processor):
+    """
+    Groups scalar Power BI sides by dataset and evaluates their expressions in one ROW(...)
+    query per dataset, since executeQueries accepts a single query per request.
+    """
+    max_expressions = max(1, int(getattr(settings, "EAGLE_POWERBI_MAX_FUSED_EXPRESSIONS", 50)))
+    buckets = OrderedDict()
+    for test_case_id, config in configs_by_test_case_id.items():
+        test_type = (config.get('test_type') or '').lower().replace(' ', '')
+        if test_type not in FUSIBLE_TEST_TYPES:
+            continue
+        for prefix in ('source', 'destination'):
+            if processor._map_user_connection(config.get(f'{prefix}_connection_source')) != "Power BI":
+                continue
+            key = _dax_fusion_key(config, prefix)
+            if key is None:
+                continue
+            expression = build_dax_scalar_expression_powerbi(
+                table=config.get(f'{prefix}_table'), date_column=config.get(f'{prefix}_date_column'),
+                date_value=config.get(f'{prefix}_date_value'),
+                aggregation_type=config.get(f'{prefix}_aggregation_type') or 'COUNT',
+                aggregation_column=config.get(f'{prefix}_aggregation_column'),
+                additional_filters=config.get(f'{prefix}_additional_filters')
+            )
+            buckets.setdefault(key, []).append((test_case_id, prefix, expression, config))
+
+    plan = []
+    for (workspace_id, dataset_id), sides in buckets.items():
+        if len(sides) < 2:
+            continue
+        expressions = []
+        members = []
+        member_queries = {}
+        for test_case_id, prefix, expression, config in sides:
+            if expression not in expressions:
+                if len(expressions) == max_expressions:
+                    plan.append(_dax_plan_entry(workspace_id, dataset_id, expressions, members, member_queries))
+                    expressions, members, member_queries = [], [], {}
+                expressions.append(expression)
+            members.append((test_case_id, prefix, expressions.index(expression)))
+            member_queries[(test_case_id, prefix)] = processor.build_aggregation_side_query(config, prefix, "Power BI")
+        if len(members) > 1:
+            plan.append(_dax_plan_entry(workspace_id, dataset_id, expressions, members, member_queries))
+    return plan
+
+
+def _dax_plan_entry(workspace_id, dataset_id, expressions, members, member_queries):
+    return {
+        "connection": "Power BI", "workspace_id": workspace_id, "dataset_id": dataset_id,
+        "query": build_fused_dax_query_powerbi(expressions), "members": members,
+        "member_queries": member_queries, "column_prefix": "V",
+    }
+
+
+def plan_fused_aggregation_queries(configs_by_test_case_id):
+    """
+    Groups the sides of aggregation tests that can share one query and builds it:
+    SQL sides sharing connection, table, date filter and additional filters get one
+    multi-aggregate SELECT; scalar Power BI sides on the same dataset get one ROW(...) query.
+
+    Returns a list of plan entries:
+        {"connection": str, "query": str,
+         "members": [(test_case_id, prefix, column_index), ...],
+         "member_queries": {(test_case_id, prefix): str}, "column_prefix": "AGG_" or "V"}
+    member_queries holds the query each side would run on its own, which is what its
+    log records. Power BI entries also carry "workspace_id" and "dataset_id".
+    """
+    processor = TestCaseProcessor()
+    buckets = OrderedDict()
+    for test_case_id, config in configs_by_test_case_id.items():
+        test_type = (config.get('test_type') or '').lower().replace(' ', '')
+        if test_type not in FUSIBLE_TEST_TYPES:
+            continue
+        for prefix in ('source', 'destination'):
+            conn_name = processor._map_user_connection(config.get(f'{prefix}_connection_source'))
+            key = _fusion_key(config, prefix, conn_name)
+            if key is None:
+                continue
+            aggregation = (
+                config[f'{prefix}_aggregation_type'].strip().upper(),
+                (config.get(f'{prefix}_aggregation_column') or '').strip() or None,
+            )
+            buckets.setdefault(key, []).append((test_case_id, prefix, aggregation, config, conn_name))
+
+    plan = []
+    for key, sides in buckets.items():
+        if len(sides) < 2:
+            continue
+        conn_name, schema, table, date_column, date_value, additional_filters = key
+        aggregations = []
+        members = []
+        db_config = dict(settings.DATABASES[conn_name])
+        db_config['schema'] = schema
+        try:
+            member_queries = {}
+            for test_case_id, prefix, aggregation, config, side_conn_name in sides:
+                # Identical aggregates share one column of the fused SELECT.
+                if aggregation not in aggregations:
+                    aggregations.append(aggregation)
+                members.append((test_case_id, prefix, aggregations.index(aggregation)))
+                member_queries[(test_case_id, prefix)] = processor.build_aggregation_side_query(
+                    config, prefix, side_conn_name
+                )
+            query = build_fused_aggregation_query(
+                db_config, table, date_column, date_value, aggregations, additional_filters or None
+            )
+        except ValueError as e:
+            logger.warning(f"Skipping query fusion for {table} on {conn_name}: {e}")
+            continue
+        plan.append({
+            "connection": conn_name, "query": query, "members": members,
+            "member_queries": member_queries, "column_prefix": "AGG_",
+        })
+    plan.extend(_plan_fused_dax_queries(configs_by_test_case_id, processor))
+    return plan
+
+
+def execute_fused_aggregation_plan(plan):
+    """
+    Runs each fused query once and fans the aggregate columns back out per test side.
+
+    Returns {test_case_id: {prefix: {"value": ..., "query": str, "connection": str,
+    "column": str}}}, where "query" is the side's own single-aggregate query (what its log
+    shows) and "column" the fused query column its value came from, e.g. AGG_2.
+    Sides of a fused query that fails are left out, so those tests run their own query.
+    """
+    prefetched = {}
+    for entry in plan:
+        if entry["connection"] == "Power BI":
+            try:
+                df = PowerBIConnector()._execute_dax_query(entry["workspace_id"], entry["dataset_id"], entry["query"])
+                row = tuple(df.iloc[0]) if not df.empty else None
+                exec_error = None
+            except Exception as e:
+                exec_error = str(e)
+        else:
+            row, exec_error = execute_query_first_row(entry["connection"], entry["query"])
+        if exec_error:
+            logger.warning(f"Fused query on {entry['connection']} failed; falling back to per-test queries: {exec_error}")
+            continue
+        for test_case_id, prefix, column_index in entry["members"]:
+            prefetched.setdefault(test_case_id, {})[prefix] = {
+                "value": first_row_value(row, column_index),
+                "query": entry["member_queries"][(test_case_id, prefix)],
+                "connection": entry["connection"],
+                "column": f"{entry['column_prefix']}{column_index}",
+            }
+    if plan:
+        fused_sides = sum(len(entry["members"]) for entry in plan)
+        logger.info(f"Query fusion: {fused_sides} test sides served by {len(plan)} fused queries.")
+    return prefetched
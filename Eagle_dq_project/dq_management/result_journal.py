@@ -0,0 +1,373 @@
+# dq_management/result_journal.py
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from django.conf import settings
+from django.db import close_old_connections, InterfaceError, OperationalError
+from dq_management.models import TestCaseLog, TestGroupLog, ProjectLogs
+from dq_management.latest_status import refresh_latest_test_case_statuses, refresh_latest_group_status
+from dq_management.log_writer import write_test_case_logs
+
+logger = logging.getLogger(__name__)
+
+LOG_DB_ALIAS = 'snowflake_dev'
+
+TEST_CASE_LOG = 'test_case_log'
+TEST_GROUP_LOG = 'test_group_log'
+PROJECT_LOG = 'project_log'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    run_id TEXT,
+    payload TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS drain_lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+_LEASE_SECONDS = 60
+_owner_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_init_lock = threading.Lock()
+_initialized_path = None
+_drainer_thread = None
+_drain_wakeup = threading.Event()
+
+
+def _reset_after_fork():
+    # A forked child inherits the parent's owner id (which holds the drain lease), a dead
+    # drainer thread and possibly held locks; give it its own identity and fresh state.
+    global _owner_id, _init_lock, _initialized_path, _drainer_thread, _drain_wakeup
+    _owner_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    _init_lock = threading.Lock()
+    _initialized_path = None
+    _drainer_thread = None
+    _drain_wakeup = threading.Event()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def journal_enabled() -> bool:
+    return bool(getattr(settings, "EAGLE_RESULT_JOURNAL_ENABLED", True))
+
+
+def _journal_path() -> str:
+    default_dir = getattr(settings, "BASE_DIR", None) or os.getcwd()
+    return str(getattr(settings, "EAGLE_RESULT_JOURNAL_PATH", os.path.join(default_dir, "eagle_result_journal.sqlite3")))
+
+
+def _connect():
+    global _initialized_path
+    path = _journal_path()
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if _initialized_path != path:
+        with _init_lock:
+            if _initialized_path != path:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized_path = path
+    return conn
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj):
+    if set(obj) == {"__datetime__"}:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def record_result(kind, fields) -> bool:
+    """
+    Appends a log row to the local journal; the drainer writes it to Snowflake later.
+    Returns False when journaling is disabled or failed, so the caller writes directly.
+    """
+    if not journal_enabled():
+        return False
+    try:
+        payload = json.dumps(fields, default=_encode)
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT INTO result_journal (kind, run_id, payload, recorded_at) VALUES (?, ?, ?, ?)",
+                (kind, fields.get('run_id'), payload, time.time())
+            )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.exception(f"Could not journal {kind} for run {fields.get('run_id')}; writing it directly: {e}")
+        return False
+    start_journal_drainer()
+    _drain_wakeup.set()
+    return True
+
+
+def _acquire_lease(conn) -> bool:
+    # Only one process drains at a time, so RUNNING and final rows of a run land in order.
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT owner, expires_at FROM drain_lease WHERE name = 'drain'").fetchone()
+        if row and row[0] != _owner_id and row[1] > now:
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO drain_lease (name, owner, expires_at) VALUES ('drain', ?, ?)",
+            (_owner_id, now + _LEASE_SECONDS)
+        )
+        return True
+    finally:
+        conn.execute("COMMIT")
+
+
+def _write_test_case_logs(entries):
+    run_ids = [fields['run_id'] for fields in entries]
+    # Rows from a batch that was cut short may already be in Snowflake; never insert them twice.
+    existing = set(TestCaseLog.objects.using(LOG_DB_ALIAS).filter(run_id__in=run_ids).values_list('run_id', flat=True))
+    new_logs = [TestCaseLog(**fields) for fields in entries if fields['run_id'] not in existing]
+    if new_logs:
+        write_test_case_logs(new_logs)
+    already_written = [fields for fields in entries if fields['run_id'] in existing]
+    if already_written:
+        refresh_latest_test_case_statuses(already_written)
+
+
+def _write_status_logs(model, entries):
+    # Later entries for a run supersede earlier ones (RUNNING, then the final status).
+    latest = {}
+    for fields in entries:
+        latest[fields['run_id']] = fields
+    for run_id, fields in latest.items():
+        defaults = {key: value for key, value in fields.items() if key != 'run_id'}
+        model.objects.using(LOG_DB_ALIAS).update_or_create(run_id=run_id, defaults=defaults)
+        if model is TestGroupLog:
+            refresh_latest_group_status(fields)
+
+
+def _write_entries(kind, entries):
+    if kind == TEST_CASE_LOG:
+        _write_test_case_logs(entries)
+    elif kind == TEST_GROUP_LOG:
+        _write_status_logs(TestGroupLog, entries)
+    elif kind == PROJECT_LOG:
+        _write_status_logs(ProjectLogs, entries)
+    else:
+        raise ValueError(f"Unknown journal entry kind '{kind}'.")
+
+
+def _max_attempts() -> int:
+    return int(getattr(settings, "EAGLE_RESULT_JOURNAL_MAX_ATTEMPTS", 10))
+
+
+def _is_outage(error) -> bool:
+    # Connection-level failures say nothing about the rows; every row would fail the same way.
+    return isinstance(error, (OperationalError, InterfaceError))
+
+
+def _drain_units(rows):
+    """
+    Groups journal rows into units that are written together, oldest first. A test case
+    log row is its own unit. All status rows of one group or project run form one unit
+    that writes only the newest of them, since it supersedes the older ones.
+    Each unit is (kind, run_id, row_ids, fields).
+    """
+    units = []
+    status_units = {}
+    for row_id, kind, run_id, fields in rows:
+        if kind == TEST_CASE_LOG:
+            units.append((kind, run_id, [row_id], fields))
+            continue
+        unit = status_units.get((kind, run_id))
+        if unit is None:
+            unit = status_units[(kind, run_id)] = [kind, run_id, [], None]
+            units.append(unit)
+        unit[2].append(row_id)
+        unit[3] = fields
+    return [tuple(unit) for unit in units]
+
+
+def _mark_written(conn, units):
+    for kind, run_id, row_ids, _ in units:
+        if kind == TEST_CASE_LOG:
+            conn.execute("DELETE FROM result_journal WHERE id = ?", (row_ids[0],))
+        else:
+            # Also drops older entries of the run left outside this batch (e.g. quarantined ones).
+            conn.execute(
+                "DELETE FROM result_journal WHERE kind = ? AND run_id = ? AND id <= ?",
+                (kind, run_id, max(row_ids))
+            )
+
+
+def _mark_failed(conn, failed):
+    conn.executemany(
+        "UPDATE result_journal SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+        [(error, row_id) for (_, _, row_ids, _), error in failed for row_id in row_ids]
+    )
+
+
+def drain_journal_once(batch_size=None) -> int:
+    """
+    Writes the oldest journaled rows to Snowflake in one batch and removes them from the
+    journal. Returns the number of rows drained.
+
+    Connection errors are raised without touching the rows, so the drainer backs off and
+    retries them for as long as Snowflake is down. When the batch fails for another reason,
+    rows are retried one unit at a time (see _drain_units) and only rows that fail on their
+    own data count an attempt. After EAGLE_RESULT_JOURNAL_MAX_ATTEMPTS they are quarantined
+    until requeue_failed_journal_entries() is called.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "EAGLE_RESULT_JOURNAL_BATCH_SIZE", 200)
+    max_attempts = _max_attempts()
+    conn = _connect()
+    try:
+        if not _acquire_lease(conn):
+            return 0
+        rows = conn.execute(
+            "SELECT id, kind, run_id, payload FROM result_journal WHERE attempts < ? ORDER BY id LIMIT ?",
+            (max_attempts, int(batch_size))
+        ).fetchall()
+        if not rows:
+            return 0
+        units = _drain_units([
+            (row_id, kind, run_id, json.loads(payload, object_hook=_decode)) for row_id, kind, run_id, payload in rows
+        ])
+
+        try:
+            for kind in (TEST_CASE_LOG, TEST_GROUP_LOG, PROJECT_LOG):
+                batch = [fields for unit_kind, _, _, fields in units if unit_kind == kind]
+                if batch:
+                    _write_entries(kind, batch)
+        except Exception as e:
+            if _is_outage(e):
+                raise
+            logger.warning(f"Batch drain of {len(rows)} journaled results failed; retrying one by one: {e}")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            _mark_written(conn, units)
+            conn.execute("COMMIT")
+            return len(rows)
+
+        done, failed = [], []
+        try:
+            for unit in units:
+                try:
+                    _write_entries(unit[0], [unit[3]])
+                    done.append(unit)
+                except Exception as row_error:
+                    if _is_outage(row_error):
+                        raise
+                    failed.append((unit, str(row_error)))
+        finally:
+            # Record what was settled before an outage interrupted the retries.
+            conn.execute("BEGIN IMMEDIATE")
+            _mark_written(conn, done)
+            _mark_failed(conn, failed)
+            conn.execute("COMMIT")
+            if failed:
+                logger.error(f"{len(failed)} journaled result(s) could not be written; first error: {failed[0][1]}")
+                _report_quarantined(conn, [row_id for (_, _, row_ids, _), _ in failed for row_id in row_ids])
+        return sum(len(row_ids) for _, _, row_ids, _ in done)
+    finally:
+        conn.close()
+
+
+def _report_quarantined(conn, row_ids):
+    placeholders = ", ".join("?" for _ in row_ids)
+    quarantined = conn.execute(
+        f"SELECT id, kind, run_id, last_error FROM result_journal WHERE id IN ({placeholders}) AND attempts >= ?",
+        (*row_ids, _max_attempts())
+    ).fetchall()
+    for row_id, kind, run_id, error in quarantined:
+        logger.error(
+            f"Journaled {kind} for run {run_id} (entry {row_id}) failed {_max_attempts()} times and is quarantined; "
+            f"fix the cause and run `manage.py result_journal --requeue`. Last error: {error}"
+        )
+
+
+def pending_journal_count() -> int:
+    conn = _connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM result_journal").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def quarantined_journal_entries():
+    """Returns the entries that reached EAGLE_RESULT_JOURNAL_MAX_ATTEMPTS, oldest first, as dicts."""
+    conn = _connect()
+    try:
+        return [
+            {"id": row_id, "kind": kind, "run_id": run_id, "attempts": attempts, "last_error": error}
+            for row_id, kind, run_id, attempts, error in conn.execute(
+                "SELECT id, kind, run_id, attempts, last_error FROM result_journal WHERE attempts >= ? ORDER BY id",
+                (_max_attempts(),)
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def requeue_failed_journal_entries() -> int:
+    """Resets the attempts of quarantined entries so the drainer tries them again."""
+    conn = _connect()
+    try:
+        requeued = conn.execute(
+            "UPDATE result_journal SET attempts = 0 WHERE attempts >= ?", (_max_attempts(),)
+        ).rowcount
+    finally:
+        conn.close()
+    if requeued:
+        _drain_wakeup.set()
+    return requeued
+
+
+def _drain_forever():
+    interval = float(getattr(settings, "EAGLE_RESULT_JOURNAL_DRAIN_INTERVAL_SECONDS", 2))
+    backoff = interval
+    while True:
+        _drain_wakeup.wait(timeout=backoff)
+        _drain_wakeup.clear()
+        close_old_connections()
+        try:
+            while drain_journal_once():
+                pass
+            backoff = interval
+        except Exception as e:
+            # Snowflake is unreachable; results stay journaled until it is back.
+            backoff = min(backoff * 2, 60.0)
+            logger.warning(f"Result journal drain failed, retrying in {backoff:.0f}s: {e}")
+
+
+def start_journal_drainer():
+    """
+    Starts this process's drainer thread once. Called at app startup so results journaled
+    before a restart or during an outage are replayed.
+    """
+    global _drainer_thread
+    if not journal_enabled():
+        return
+    with _init_lock:
+        if _drainer_thread is not None and _drainer_thread.is_alive():
+            return
+        _drainer_thread = threading.Thread(target=_drain_forever, name="result-journal-drainer", daemon=True)
+        _drainer_thread.start()
+    _drain_wakeup.set()
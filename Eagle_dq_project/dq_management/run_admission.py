@@ -0,0 +1,90 @@
+# dq_management/run_admission.py
+
+import threading
+from django.conf import settings
+
+# What happens when a group or project is started while a run of it is still in flight:
+#   'attach' - no new run; the caller gets the in-flight run_id and follows that run.
+#   'queue'  - a new run is admitted and starts once the in-flight one finishes. Starting
+#              it again while that run is still waiting attaches to the waiting run.
+#   'reject' - RunAlreadyActive is raised, carrying the in-flight run_id.
+ATTACH = 'attach'
+QUEUE = 'queue'
+REJECT = 'reject'
+ADMISSION_POLICIES = (ATTACH, QUEUE, REJECT)
+
+
+class RunAlreadyActive(Exception):
+    def __init__(self, kind, target_id, run_id):
+        self.kind = kind
+        self.target_id = target_id
+        self.run_id = run_id
+        super().__init__(f"The {kind} {target_id} already has a run in progress ({run_id}).")
+
+
+def admission_policy(requested=None) -> str:
+    """
+    Returns the requested policy, or EAGLE_RUN_ADMISSION_POLICY ('attach' by default)
+    when none is given. Raises ValueError for an unknown policy.
+    """
+    policy = (requested or getattr(settings, "EAGLE_RUN_ADMISSION_POLICY", ATTACH)).strip().lower()
+    if policy not in ADMISSION_POLICIES:
+        raise ValueError(f"Unknown run admission policy '{policy}'; expected one of {', '.join(ADMISSION_POLICIES)}.")
+    return policy
+
+
+def decide_admission(kind, target_id, policy, active):
+    """
+    Applies `policy` to the in-flight runs of one target, given oldest first as
+    [(run_id, is_running), ...]. Returns the run_id to attach to, or None when a new run
+    should be admitted. Raises RunAlreadyActive under the 'reject' policy.
+    """
+    if not active:
+        return None
+    if policy == REJECT:
+        raise RunAlreadyActive(kind, target_id, active[0][0])
+    if policy == QUEUE:
+        waiting = [run_id for run_id, is_running in active if not is_running]
+        return waiting[-1] if waiting else None
+    return active[0][0]
+
+
+# Admission for runs started on threads of this process (EAGLE_RUN_EXECUTION='thread').
+# The queue keeps the equivalent state in its run_job table (see job_queue.enqueue_run).
+_thread_runs_lock = threading.Lock()
+_thread_runs = {}
+_target_locks = {}
+
+
+def admit_thread_run(kind, target_id, run_id, policy):
+    """Registers `run_id` as in flight for the target, or returns the run_id to attach to."""
+    key = (kind, str(target_id))
+    with _thread_runs_lock:
+        active = _thread_runs.get(key, [])
+        # The oldest registered run holds the target lock; the rest are waiting for it.
+        existing = decide_admission(kind, target_id, policy, [
+            (active_run_id, index == 0) for index, active_run_id in enumerate(active)
+        ])
+        if existing is not None:
+            return existing
+        _thread_runs.setdefault(key, []).append(run_id)
+        _target_locks.setdefault(key, threading.Lock())
+        return None
+
+
+def run_admitted_thread(kind, target_id, run_id, target, args):
+    """
+    Thread body for a run admitted by admit_thread_run: waits until no other run of the
+    same target is executing, runs `target(*args)`, then releases the target.
+    """
+    key = (kind, str(target_id))
+    try:
+        with _target_locks[key]:
+            target(*args)
+    finally:
+        with _thread_runs_lock:
+            active = _thread_runs.get(key, [])
+            if run_id in active:
+                active.remove(run_id)
+            if not active:
+                _thread_runs.pop(key, None)
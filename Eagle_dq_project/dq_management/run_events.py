@@ -0,0 +1,118 @@
+# dq_management/run_events.py
+
+import json
+import time
+import asyncio
+import logging
+from django.conf import settings
+from dq_management.run_status_store import get_run_status_store, GROUP_RUNS, PROJECT_RUNS
+
+logger = logging.getLogger(__name__)
+
+RUN_KINDS = (GROUP_RUNS, PROJECT_RUNS)
+
+# Sent last for every run; the stream closes after it.
+TERMINAL_EVENT = 'completed'
+
+_HEARTBEAT_SECONDS = 15
+
+# Fields of the status dict left out of deltas; their content arrives as events instead.
+_DELTA_EXCLUDED_FIELDS = ('results',)
+
+
+def _format_event(event, data, seq=None) -> str:
+    lines = []
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(value) -> int:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def stream_run_events(kind, run_id, after=0):
+    """
+    Async generator of Server-Sent Events for one group or project run. Replays the
+    events after sequence number `after` (the browser's Last-Event-ID on reconnect), then
+    follows the run's event log in the run-status store until the 'completed' event.
+
+    The store is read every EAGLE_RUN_EVENTS_POLL_SECONDS on a worker thread, so one
+    process can serve many watchers without holding a thread per connection. Streams
+    close after EAGLE_RUN_EVENTS_MAX_STREAM_SECONDS; EventSource reconnects and resumes.
+    """
+    store = get_run_status_store()
+    poll_seconds = float(getattr(settings, "EAGLE_RUN_EVENTS_POLL_SECONDS", 0.5))
+    max_stream_seconds = float(getattr(settings, "EAGLE_RUN_EVENTS_MAX_STREAM_SECONDS", 600))
+    started = last_sent = time.monotonic()
+
+    yield "retry: 3000\n\n"
+    while time.monotonic() - started < max_stream_seconds:
+        events = await asyncio.to_thread(store.get_events, kind, run_id, after)
+        if events is None:
+            yield _format_event("not_found", {"run_id": run_id, "message": "Run ID not found."})
+            return
+        for seq, event, data in events:
+            after = seq
+            yield _format_event(event, data, seq)
+            if event == TERMINAL_EVENT:
+                return
+        if events:
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= _HEARTBEAT_SECONDS:
+            # Comment line; keeps proxies from closing an idle connection.
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_seconds)
+
+
+def get_run_delta(kind, run_id, since=0, limit=None):
+    """
+    Returns what changed in a run since cursor `since`: the current status counters
+    (without the accumulated results) and the events appended after `since`, or None
+    for an unknown run. Pass the returned `cursor` as `since` on the next call;
+    `has_more` means the event limit was hit and the caller should ask again right away;
+    `done` means this delta delivered the run's final 'completed' event.
+    """
+    if limit is None:
+        limit = int(getattr(settings, "EAGLE_RUN_DELTA_MAX_EVENTS", 500))
+    store = get_run_status_store()
+    status = store.get(kind, run_id)
+    if status is None:
+        return None
+    events = store.get_events(kind, run_id, after=since, limit=limit) or []
+    for field in _DELTA_EXCLUDED_FIELDS:
+        status.pop(field, None)
+    return {
+        "run_id": run_id,
+        "kind": kind,
+        "status": status,
+        "events": [{"seq": seq, "event": event, "data": data} for seq, event, data in events],
+        "cursor": events[-1][0] if events else since,
+        "has_more": len(events) >= limit,
+        "done": any(event == TERMINAL_EVENT for _, event, _ in events),
+    }
+
+
+def parse_batch_runs(value):
+    """
+    Parses the batch status `runs` parameter, a comma-separated list of
+    kind:run_id[:since] items, into [(kind, run_id, since), ...].
+    Raises ValueError for a malformed item or an unknown kind.
+    """
+    runs = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split(':')
+        if len(parts) not in (2, 3) or parts[0] not in RUN_KINDS or not parts[1]:
+            raise ValueError(f"Invalid run '{item}'; expected kind:run_id[:since] with kind group or project.")
+        runs.append((parts[0], parts[1], parse_last_event_id(parts[2]) if len(parts) == 3 else 0))
+    return runs
@@ -0,0 +1,419 @@
+# dq_management/run_status_store.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from dq_management.job_queue import run_execution_mode
+
+logger = logging.getLogger(__name__)
+
+GROUP_RUNS = 'group'
+PROJECT_RUNS = 'project'
+
+# A run whose status reaches one of these is finished and becomes eligible for eviction.
+TERMINAL_STATUSES = ('COMPLETED', 'ERROR')
+
+_EVICT_INTERVAL_SECONDS = 60
+
+
+def _finished_ttl() -> float:
+    return float(getattr(settings, "EAGLE_RUN_STATUS_TTL_SECONDS", 3600))
+
+
+def _stale_ttl() -> float:
+    # Runs that never finish (the worker died) are dropped after this long without an update.
+    return float(getattr(settings, "EAGLE_RUN_STATUS_STALE_SECONDS", 86400))
+
+
+class BaseRunStatusStore:
+    """
+    Progress of in-flight and recently finished group and project runs, keyed by
+    (kind, run_id) where kind is GROUP_RUNS or PROJECT_RUNS. Statuses are plain dicts.
+
+    Finished runs are evicted EAGLE_RUN_STATUS_TTL_SECONDS after they finish and runs that
+    stop updating after EAGLE_RUN_STATUS_STALE_SECONDS, so the store stays bounded.
+    Implementations must be safe to call from many threads.
+    """
+
+    def create(self, kind, run_id, status):
+        raise NotImplementedError
+
+    def get(self, kind, run_id):
+        """Returns a copy of the status dict, or None for an unknown or evicted run."""
+        raise NotImplementedError
+
+    def update(self, kind, run_id, **fields):
+        """Merges `fields` into the run's status. Unknown runs are ignored."""
+        raise NotImplementedError
+
+    def increment(self, kind, run_id, field, amount=1, **fields) -> int:
+        """Atomically adds `amount` to a counter, merges `fields`, and returns the new count."""
+        raise NotImplementedError
+
+    def append_event(self, kind, run_id, event, data=None) -> int:
+        """
+        Appends a progress event (e.g. 'test_finished') to the run's event log and returns
+        its sequence number. Sequence numbers increase within a run. Unknown runs are ignored
+        and get 0.
+        """
+        raise NotImplementedError
+
+    def get_events(self, kind, run_id, after=0, limit=500):
+        """
+        Returns [(seq, event, data), ...] appended after sequence number `after`, oldest
+        first, or None when the run is unknown or has been evicted.
+        """
+        raise NotImplementedError
+
+    def discard(self, kind, run_id):
+        """Removes a run and its events, e.g. one that was never admitted."""
+        raise NotImplementedError
+
+    def evict_expired(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryRunStatusStore(BaseRunStatusStore):
+    """
+    Keeps statuses in this process only. Suitable for a single web process running its
+    runs on threads (EAGLE_RUN_EXECUTION='thread'); with several web processes, a poll that
+    lands on another one won't find the run, and with queue execution the job workers'
+    progress never reaches the web process, so it is refused there. Also capped at
+    EAGLE_RUN_STATUS_MAX_ENTRIES, dropping the least recently updated runs first.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+    def _touch(self, key, entry, now):
+        entry['updated_at'] = now
+        if entry['status'].get('status') in TERMINAL_STATUSES and entry['finished_at'] is None:
+            entry['finished_at'] = now
+        self._entries.move_to_end(key)
+
+    def create(self, kind, run_id, status):
+        now = time.time()
+        with self._lock:
+            self._entries[(kind, run_id)] = {
+                'status': dict(status), 'updated_at': now, 'finished_at': None, 'events': [],
+            }
+            self._entries.move_to_end((kind, run_id))
+        if now - self._last_eviction >= _EVICT_INTERVAL_SECONDS:
+            self.evict_expired()
+
+    def get(self, kind, run_id):
+        with self._lock:
+            entry = self._entries.get((kind, run_id))
+            return json.loads(json.dumps(entry['status'], cls=DjangoJSONEncoder)) if entry else None
+
+    def update(self, kind, run_id, **fields):
+        with self._lock:
+            entry = self._entries.get((kind, run_id))
+            if entry is None:
+                return
+            entry['status'].update(fields)
+            self._touch((kind, run_id), entry, time.time())
+
+    def increment(self, kind, run_id, field, amount=1, **fields) -> int:
+        with self._lock:
+            entry = self._entries.get((kind, run_id))
+            if entry is None:
+                return 0
+            entry['status'][field] = entry['status'].get(field, 0) + amount
+            entry['status'].update(fields)
+            self._touch((kind, run_id), entry, time.time())
+            return entry['status'][field]
+
+    def append_event(self, kind, run_id, event, data=None) -> int:
+        payload = json.loads(json.dumps(data or {}, cls=DjangoJSONEncoder))
+        with self._lock:
+            entry = self._entries.get((kind, run_id))
+            if entry is None:
+                return 0
+            seq = len(entry['events']) + 1
+            entry['events'].append((seq, event, payload))
+            self._touch((kind, run_id), entry, time.time())
+            return seq
+
+    def get_events(self, kind, run_id, after=0, limit=500):
+        with self._lock:
+            entry = self._entries.get((kind, run_id))
+            if entry is None:
+                return None
+            # Sequence numbers are list positions + 1, so the tail can be sliced directly.
+            return list(entry['events'][max(0, int(after)):max(0, int(after)) + limit])
+
+    def discard(self, kind, run_id):
+        with self._lock:
+            self._entries.pop((kind, run_id), None)
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        max_entries = int(getattr(settings, "EAGLE_RUN_STATUS_MAX_ENTRIES", 10000))
+        with self._lock:
+            self._last_eviction = now
+            expired = [
+                key for key, entry in self._entries.items()
+                if (entry['finished_at'] is not None and now - entry['finished_at'] > _finished_ttl())
+                or now - entry['updated_at'] > _stale_ttl()
+            ]
+            for key in expired:
+                del self._entries[key]
+            evicted = len(expired)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_status (
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    PRIMARY KEY (kind, run_id)
+);
+CREATE INDEX IF NOT EXISTS run_status_updated_at ON run_status (updated_at);
+CREATE INDEX IF NOT EXISTS run_status_finished_at ON run_status (finished_at);
+CREATE TABLE IF NOT EXISTS run_event (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_event_run ON run_event (kind, run_id, seq);
+"""
+
+
+class SQLiteRunStatusStore(BaseRunStatusStore):
+    """
+    Keeps statuses in a local SQLite file (EAGLE_RUN_STATUS_PATH) in WAL mode, so every
+    worker process on the host reads the same progress. Read-modify-write updates run in
+    an IMMEDIATE transaction so concurrent increments are not lost. Storage errors are
+    logged and never interrupt a run.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            default_dir = getattr(settings, "BASE_DIR", None) or os.getcwd()
+            path = getattr(settings, "EAGLE_RUN_STATUS_PATH", os.path.join(default_dir, "eagle_run_status.sqlite3"))
+        self.path = str(path)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._last_eviction = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    def create(self, kind, run_id, status):
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO run_status (kind, run_id, status, updated_at, finished_at) "
+                    "VALUES (?, ?, ?, ?, NULL)",
+                    (kind, run_id, json.dumps(status, cls=DjangoJSONEncoder), now)
+                )
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not record status for {kind} run {run_id}: {e}")
+        if now - self._last_eviction >= _EVICT_INTERVAL_SECONDS:
+            self.evict_expired()
+
+    def get(self, kind, run_id):
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT status FROM run_status WHERE kind = ? AND run_id = ?", (kind, run_id)
+                ).fetchone()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not read status for {kind} run {run_id}: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _modify(self, kind, run_id, change):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT status FROM run_status WHERE kind = ? AND run_id = ?", (kind, run_id)
+                ).fetchone()
+                if row is None:
+                    return None
+                status = json.loads(row[0])
+                result = change(status)
+                now = time.time()
+                finished_at = now if status.get('status') in TERMINAL_STATUSES else None
+                conn.execute(
+                    "UPDATE run_status SET status = ?, updated_at = ?, finished_at = COALESCE(finished_at, ?) "
+                    "WHERE kind = ? AND run_id = ?",
+                    (json.dumps(status, cls=DjangoJSONEncoder), now, finished_at, kind, run_id)
+                )
+                return result
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def update(self, kind, run_id, **fields):
+        try:
+            self._modify(kind, run_id, lambda status: status.update(fields))
+        except Exception as e:
+            logger.exception(f"Could not update status for {kind} run {run_id}: {e}")
+
+    def increment(self, kind, run_id, field, amount=1, **fields) -> int:
+        def change(status):
+            status[field] = status.get(field, 0) + amount
+            status.update(fields)
+            return status[field]
+        try:
+            return self._modify(kind, run_id, change) or 0
+        except Exception as e:
+            logger.exception(f"Could not update status for {kind} run {run_id}: {e}")
+            return 0
+
+    def append_event(self, kind, run_id, event, data=None) -> int:
+        try:
+            payload = json.dumps(data or {}, cls=DjangoJSONEncoder)
+            conn = self._connect()
+            try:
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    touched = conn.execute(
+                        "UPDATE run_status SET updated_at = ? WHERE kind = ? AND run_id = ?", (now, kind, run_id)
+                    ).rowcount
+                    if not touched:
+                        return 0
+                    # seq is global, which keeps it increasing within every run as well.
+                    return conn.execute(
+                        "INSERT INTO run_event (kind, run_id, event, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (kind, run_id, event, payload, now)
+                    ).lastrowid
+                finally:
+                    conn.execute("COMMIT")
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not record '{event}' event for {kind} run {run_id}: {e}")
+            return 0
+
+    def get_events(self, kind, run_id, after=0, limit=500):
+        try:
+            conn = self._connect()
+            try:
+                exists = conn.execute(
+                    "SELECT 1 FROM run_status WHERE kind = ? AND run_id = ?", (kind, run_id)
+                ).fetchone()
+                if not exists:
+                    return None
+                rows = conn.execute(
+                    "SELECT seq, event, data FROM run_event WHERE kind = ? AND run_id = ? AND seq > ? "
+                    "ORDER BY seq LIMIT ?",
+                    (kind, run_id, int(after), int(limit))
+                ).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not read events for {kind} run {run_id}: {e}")
+            return []
+        return [(seq, event, json.loads(data)) for seq, event, data in rows]
+
+    def discard(self, kind, run_id):
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("DELETE FROM run_status WHERE kind = ? AND run_id = ?", (kind, run_id))
+                    conn.execute("DELETE FROM run_event WHERE kind = ? AND run_id = ?", (kind, run_id))
+                finally:
+                    conn.execute("COMMIT")
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not discard status for {kind} run {run_id}: {e}")
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        self._last_eviction = now
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    evicted = conn.execute(
+                        "DELETE FROM run_status WHERE (finished_at IS NOT NULL AND finished_at < ?) OR updated_at < ?",
+                        (now - _finished_ttl(), now - _stale_ttl())
+                    ).rowcount
+                    conn.execute(
+                        "DELETE FROM run_event WHERE NOT EXISTS (SELECT 1 FROM run_status s "
+                        "WHERE s.kind = run_event.kind AND s.run_id = run_event.run_id)"
+                    )
+                finally:
+                    conn.execute("COMMIT")
+                return evicted
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.exception(f"Could not evict expired run statuses: {e}")
+            return 0
+
+
+_BACKENDS = {
+    'sqlite': SQLiteRunStatusStore,
+    'memory': MemoryRunStatusStore,
+}
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_run_status_store() -> BaseRunStatusStore:
+    """
+    Returns the process-wide store chosen by EAGLE_RUN_STATUS_BACKEND: 'sqlite' (default),
+    'memory', or the dotted path of a BaseRunStatusStore subclass. Raises
+    ImproperlyConfigured for the memory store under queue execution, where the runs
+    execute in the job-worker processes and their progress would never be seen.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = getattr(settings, "EAGLE_RUN_STATUS_BACKEND", 'sqlite')
+            store_class = _BACKENDS.get(backend) or import_string(backend)
+            if issubclass(store_class, MemoryRunStatusStore) and run_execution_mode() == 'queue':
+                raise ImproperlyConfigured(
+                    "EAGLE_RUN_STATUS_BACKEND = 'memory' can't be used with EAGLE_RUN_EXECUTION = 'queue': "
+                    "runs execute in the job-worker processes, so their status and events never reach the "
+                    "web process. Use the 'sqlite' backend, or set EAGLE_RUN_EXECUTION = 'thread'."
+                )
+            _store = store_class()
+            logger.info(f"Using {store_class.__name__} for run statuses.")
+        return _store
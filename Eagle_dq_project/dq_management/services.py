@@ -8,13 +8,28 @@ import copy
 import numpy as np
 import subprocess
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
 from django.conf import settings
 from django.db import connections
+from django.utils import timezone
 
 from dq_management.models import Project, TestCase, TestGroup, TestGroupTestCase, TestCaseLog, TestGroupLog, ProjectLogs
 from dq_management.dq_core import build_dynamic_aggregation_query, execute_query_to_dataframe
 from dq_management.test_case_manager import TestCaseProcessor
+from dq_management.query_fusion import plan_fused_aggregation_queries, execute_fused_aggregation_plan
+from dq_management.query_cache import RunQueryCache, activate_query_cache, get_active_query_cache
+from dq_management.log_writer import BufferedLogWriter
+from dq_management.latest_status import refresh_latest_test_case_statuses, refresh_latest_group_status
+from dq_management.metadata_cache import (
+    get_project, get_test_group, get_test_case, invalidate_metadata,
+    MetadataSnapshot, activate_metadata_snapshot, get_active_metadata_snapshot,
+)
+from dq_management.result_journal import record_result, TEST_CASE_LOG, TEST_GROUP_LOG, PROJECT_LOG
+from dq_management.run_status_store import get_run_status_store, GROUP_RUNS, PROJECT_RUNS
+from dq_management.job_queue import enqueue_run, run_execution_mode
+from dq_management.run_admission import admission_policy, admit_thread_run, run_admitted_thread, RunAlreadyActive
 from dq_management.airflow_dag_generator import generate_dag_file
 
 logger = logging.getLogger(__name__)
@@ -183,34 +198,50 @@ def get_test_cases_for_project_from_db(project_id):
         test_cases_list.append(tc_data)
     return test_cases_list
 
-def get_test_case_details_from_db(test_case_id):
+def _normalize_test_case_data(test_case_data):
+    """
+    Adds the form-style aliases and defaults the processor expects to a raw TEST_CASES row dict.
+    """
+    test_case_data['id'] = test_case_data['test_case_id']
+    test_case_data['source_aggregation_type'] = test_case_data.get('source_agg_type')
+    test_case_data['source_aggregation_column'] = test_case_data.get('source_agg_column')
+    test_case_data['destination_aggregation_type'] = test_case_data.get('destination_agg_type')
+    test_case_data['destination_aggregation_column'] = test_case_data.get('destination_agg_column')
+    test_case_data['source_custom_sql'] = test_case_data.get('custom_source_sql', '')
+    test_case_data['destination_custom_sql'] = test_case_data.get('custom_destination_sql', '')
+    test_case_data['source_additional_filters'] = test_case_data.get('additional_source_filters', '')
+    test_case_data['destination_additional_filters'] = test_case_data.get('additional_destination_filters', '')
+    default_date_str = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    test_case_data['source_date_value'] = (test_case_data.get('source_date_value') or '').strip() or default_date_str
+    test_case_data['destination_date_value'] = (test_case_data.get('destination_date_value') or '').strip() or default_date_str
+    test_case_data['destination_workspace_id'] = test_case_data.get('destination_workspace_id', '')
+    test_case_data['destination_dataset_id'] = test_case_data.get('destination_dataset_id', '')
+    test_case_data['destination_dax_query'] = test_case_data.get('destination_dax_query', '')
+    test_case_data['source_workspace_id'] = test_case_data.get('source_workspace_id', '')
+    test_case_data['source_dataset_id'] = test_case_data.get('source_dataset_id', '')
+    test_case_data['source_dax_query'] = test_case_data.get('source_dax_query', '')
+    test_case_data['possible_resolution'] = test_case_data.get('possible_resolution', '')
+    if not test_case_data.get('source_custom_sql'):
+        test_case_data['source_aggregation_type'] = test_case_data.get('source_agg_type') or 'COUNT(*)'
+    if not test_case_data.get('destination_custom_sql'):
+        test_case_data['destination_aggregation_type'] = test_case_data.get('destination_agg_type') or 'COUNT(*)'
+    return test_case_data
+
+def get_test_case_details_from_db(test_case_id, use_cache=False):
+    """
+    Returns the normalized config dict of a test case, or None. Run paths pass
+    use_cache=True to read the row through the run's metadata snapshot, if one is active.
+    """
     try:
-        test_case = TestCase.objects.using('snowflake_dev').get(pk=test_case_id)
+        if use_cache:
+            test_case = get_test_case(test_case_id)
+            if test_case is None:
+                raise TestCase.DoesNotExist
+        else:
+            test_case = TestCase.objects.using('snowflake_dev').get(pk=test_case_id)
         test_case_data = test_case.__dict__.copy()
         test_case_data.pop('_state', None)
-        test_case_data['id'] = test_case_data['test_case_id']
-        test_case_data['source_aggregation_type'] = test_case_data.get('source_agg_type')
-        test_case_data['source_aggregation_column'] = test_case_data.get('source_agg_column')
-        test_case_data['destination_aggregation_type'] = test_case_data.get('destination_agg_type')
-        test_case_data['destination_aggregation_column'] = test_case_data.get('destination_agg_column')
-        test_case_data['source_custom_sql'] = test_case_data.get('custom_source_sql', '')
-        test_case_data['destination_custom_sql'] = test_case_data.get('custom_destination_sql', '')
-        test_case_data['source_additional_filters'] = test_case_data.get('additional_source_filters', '')
-        test_case_data['destination_additional_filters'] = test_case_data.get('additional_destination_filters', '')
-        default_date_str = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-        test_case_data['source_date_value'] = (test_case_data.get('source_date_value') or '').strip() or default_date_str
-        test_case_data['destination_date_value'] = (test_case_data.get('destination_date_value') or '').strip() or default_date_str
-        test_case_data['destination_workspace_id'] = test_case_data.get('destination_workspace_id', '')
-        test_case_data['destination_dataset_id'] = test_case_data.get('destination_dataset_id', '')
-        test_case_data['destination_dax_query'] = test_case_data.get('destination_dax_query', '')
-        test_case_data['source_workspace_id'] = test_case_data.get('source_workspace_id', '')
-        test_case_data['source_dataset_id'] = test_case_data.get('source_dataset_id', '')
-        test_case_data['source_dax_query'] = test_case_data.get('source_dax_query', '')
-        test_case_data['possible_resolution'] = test_case_data.get('possible_resolution', '')
-        if not test_case_data.get('source_custom_sql'):
-            test_case_data['source_aggregation_type'] = test_case_data.get('source_agg_type') or 'COUNT(*)'
-        if not test_case_data.get('destination_custom_sql'):
-            test_case_data['destination_aggregation_type'] = test_case_data.get('destination_agg_type') or 'COUNT(*)'
+        _normalize_test_case_data(test_case_data)
         # Ensure compatibility for Django template rendering
         # REMOVED: String conversion of datetime objects
         return test_case_data
@@ -390,9 +421,14 @@ def get_test_groups_for_project_from_db(project_id):
         test_groups_list.append(tg_data)
     return test_groups_list
 
-def get_test_group_details_from_db(group_id):
+def get_test_group_details_from_db(group_id, use_cache=False):
     try:
-        group = TestGroup.objects.using('snowflake_dev').get(pk=group_id)
+        if use_cache:
+            group = get_test_group(group_id)
+            if group is None:
+                raise TestGroup.DoesNotExist
+        else:
+            group = TestGroup.objects.using('snowflake_dev').get(pk=group_id)
         group_dict = group.__dict__.copy()
         group_dict.pop('_state', None)
         group_dict['id'] = group_dict['test_group_id']
@@ -553,6 +589,33 @@ def get_test_cases_in_group_from_db(group_id):
         logger.error(f"Error in get_test_cases_in_group_from_db: {e}")
     return fetched_test_cases
 
+def get_group_execution_plan(group_id):
+    """
+    Loads every test case of a group with a single query and prepares what the runner
+    needs for each: the normalized test case data and its validated config, in the same
+    shape run_adhoc_test_logic would build them. Ordered by execution order.
+    """
+    junction_records = TestGroupTestCase.objects.using('snowflake_dev').filter(
+        test_group_id=group_id
+    ).select_related('test_case').order_by('execution_order')
+    plan = []
+    for record in junction_records:
+        test_case_data = record.test_case.__dict__.copy()
+        test_case_data.pop('_state', None)
+        _normalize_test_case_data(test_case_data)
+        try:
+            config, validation_errors = _extract_and_validate_form_data(test_case_data)
+        except Exception as e:
+            config, validation_errors = None, [f"Invalid test case definition: {e}"]
+        plan.append({
+            "id": test_case_data['test_case_id'],
+            "execution_order": record.execution_order,
+            "detail": test_case_data,
+            "config": config,
+            "validation_errors": validation_errors,
+        })
+    return plan
+
 def get_test_case_logs_from_db():
     logs_qs = TestCaseLog.objects.using('snowflake_dev').all().order_by('-run_timestamp')
     logs_list = []
@@ -569,8 +632,10 @@ def get_test_case_logs_from_db():
         logs_list.append(log_data)
     return logs_list
 
-def get_test_group_logs_from_db():
+def get_test_group_logs_from_db(limit=None):
     logs_qs = TestGroupLog.objects.using('snowflake_dev').all().order_by('-start_timestamp')
+    if limit is not None:
+        logs_qs = logs_qs[:limit]
     logs_list = []
     for log_entry in logs_qs:
         log_data = log_entry.__dict__.copy()
@@ -591,15 +656,11 @@ def log_test_case_result_orm(run_id, test_case_id, project_id, test_name, test_t
     try:
         project_name = None
         criticality = None
-        if project_id:
-            try:
-                project_obj = Project.objects.using('snowflake_dev').get(project_id=project_id)
-                project_name = project_obj.project_name
-                criticality = project_obj.criticality_level
-            except Project.DoesNotExist:
-                project_name = None
-                criticality = None
-        TestCaseLog.objects.using('snowflake_dev').create(
+        project_obj = get_project(project_id)
+        if project_obj is not None:
+            project_name = project_obj.project_name
+            criticality = project_obj.criticality_level
+        log_fields = dict(
             run_id=run_id, test_case_id=test_case_id, project_id=project_id,
             project_name=project_name, criticality=criticality, test_name=test_name, test_type=test_type,
             run_status=run_status, run_message=run_message, source_value=_to_json_safe(source_value),
@@ -608,35 +669,40 @@ def log_test_case_result_orm(run_id, test_case_id, project_id, test_name, test_t
             threshold_value=str(threshold_value) if threshold_value is not None else None,
             source_query=source_query, destination_query=destination_query,
             source_connection_used=source_connection_used, destination_connection_used=destination_connection_used,
-            parent_run_id=parent_run_id, possible_resolution=possible_resolution, run_timestamp=datetime.now()
+            parent_run_id=parent_run_id, possible_resolution=possible_resolution, run_timestamp=timezone.now()
         )
+        if not record_result(TEST_CASE_LOG, log_fields):
+            TestCaseLog.objects.using('snowflake_dev').create(**log_fields)
+            refresh_latest_test_case_statuses([log_fields])
         logger.info(f"Test case log for {run_id} created successfully.")
     except Exception as e:
         logger.exception(f"Error creating TestCaseLog for run {run_id}: {e}")
 
 def log_test_group_status_orm(run_id, test_group_id, group_name, project_id, project_name, status, message, results_details, start_time, end_time=None):
     try:
-        criticality = None
-        if project_id:
-            try:
-                project_obj = Project.objects.using('snowflake_dev').get(project_id=project_id)
-                criticality = project_obj.criticality_level
-            except Project.DoesNotExist:
-                criticality = None
-        TestGroupLog.objects.using('snowflake_dev').update_or_create(
-            run_id=run_id,
-            defaults={
-                'test_group_id': test_group_id, 'group_name': group_name,
-                'project_id': project_id, 'project_name': project_name, 'criticality': criticality,
-                'status': status, 'message': message, 'results_details': _to_json_safe(results_details),
-                'start_timestamp': start_time, 'end_timestamp': end_time
-            }
-        )
+        project_obj = get_project(project_id)
+        criticality = project_obj.criticality_level if project_obj is not None else None
+        defaults = {
+            'test_group_id': test_group_id, 'group_name': group_name,
+            'project_id': project_id, 'project_name': project_name, 'criticality': criticality,
+            'status': status, 'message': message, 'results_details': _to_json_safe(results_details),
+            'start_timestamp': start_time, 'end_timestamp': end_time
+        }
+        if not record_result(TEST_GROUP_LOG, {'run_id': run_id, **defaults}):
+            TestGroupLog.objects.using('snowflake_dev').update_or_create(run_id=run_id, defaults=defaults)
+            refresh_latest_group_status({'run_id': run_id, **defaults})
         logger.info(f"Test group log for {run_id} updated successfully.")
     except Exception as e:
         logger.exception(f"Error creating/updating TestGroupLog for run {run_id}: {e}")
 
-def run_adhoc_test_logic(test_case_id, parent_run_id=None):
+def run_adhoc_test_logic(test_case_id, parent_run_id=None, prefetched_sides=None, log_writer=None, preloaded=None):
+    """
+    Runs one test case and records its TestCaseLog row and TestCase status. The log row
+    goes to the local result journal, whose drainer inserts rows in batches; group and
+    project runs pass a BufferedLogWriter so status updates (and log rows, if the journal
+    is unavailable) are batched, and an entry of get_group_execution_plan() as
+    `preloaded`, so the definition is not re-read.
+    """
     run_id = str(uuid.uuid4())
     result = {
         "run_id": run_id, "test_case_id": test_case_id, "status": "ERROR",
@@ -647,7 +713,10 @@ def run_adhoc_test_logic(test_case_id, parent_run_id=None):
         "source_connection_used": None, "destination_connection_used": None,
     }
     try:
-        test_case_data = get_test_case_details_from_db(test_case_id)
+        if preloaded is not None:
+            test_case_data = preloaded['detail']
+        else:
+            test_case_data = get_test_case_details_from_db(test_case_id, use_cache=True)
         if not test_case_data:
             result["message"] = "Test case not found."
             result["status_code"] = 404
@@ -657,23 +726,22 @@ def run_adhoc_test_logic(test_case_id, parent_run_id=None):
         result["test_type"] = test_case_data.get("test_type")
         project_name = None
         criticality = None
-        if result["project_id"]:
-            try:
-                project_obj = Project.objects.using('snowflake_dev').get(project_id=result["project_id"])
-                project_name = project_obj.project_name
-                criticality = getattr(project_obj, 'criticality_level', None)
-            except Project.DoesNotExist:
-                project_name = None
-                criticality = None
+        project_obj = get_project(result["project_id"])
+        if project_obj is not None:
+            project_name = project_obj.project_name
+            criticality = getattr(project_obj, 'criticality_level', None)
         result["project_name"] = project_name
         result["criticality"] = criticality
-        config, validation_errors = _extract_and_validate_form_data(test_case_data)
+        if preloaded is not None:
+            config, validation_errors = preloaded['config'], preloaded['validation_errors']
+        else:
+            config, validation_errors = _extract_and_validate_form_data(test_case_data)
         if validation_errors:
             result["message"] = "Validation error: " + "; ".join(validation_errors)
             result["details"] = validation_errors
             return result
         processor = TestCaseProcessor()
-        processor_result = processor.process_test_request(config, action='run', run_id=run_id)
+        processor_result = processor.process_test_request(config, action='run', run_id=run_id, prefetched_sides=prefetched_sides)
         result.update(processor_result)
         if result.get("status") == "PASS":
             result["status_code"] = 200
@@ -683,16 +751,20 @@ def run_adhoc_test_logic(test_case_id, parent_run_id=None):
             result["status_code"] = 500
 
         # --- Update TestCase status in DB after adhoc run ---
-        try:
-            TestCase.objects.using('snowflake_dev').filter(test_case_id=test_case_id).update(status=result.get("status"))
-        except Exception as update_e:
-            logger.error(f"Failed to update status for test case {test_case_id}: {update_e}")
+        if log_writer is not None:
+            log_writer.set_test_case_status(test_case_id, result.get("status"))
+        else:
+            try:
+                TestCase.objects.using('snowflake_dev').filter(test_case_id=test_case_id).update(status=result.get("status"))
+                invalidate_metadata(TestCase, test_case_id)
+            except Exception as update_e:
+                logger.error(f"Failed to update status for test case {test_case_id}: {update_e}")
 
     except Exception as e:
         logger.exception(f"Error running ad-hoc test for {test_case_id}: {e}")
         result["message"] = f"Exception: {e}"
     try:
-        TestCaseLog.objects.using('snowflake_dev').create(
+        log_fields = dict(
             run_id=result.get('run_id'), test_case_id=result.get('test_case_id'),
             project_id=result.get('project_id'), project_name=result.get('project_name'),
             criticality=result.get('criticality'),
@@ -706,8 +778,16 @@ def run_adhoc_test_logic(test_case_id, parent_run_id=None):
             source_query=result.get('source_query'), destination_query=result.get('destination_query'),
             source_connection_used=result.get('source_connection_used'),
             destination_connection_used=result.get('destination_connection_used'),
-            parent_run_id=parent_run_id, possible_resolution=test_case_data.get('possible_resolution', '')
+            parent_run_id=parent_run_id, possible_resolution=test_case_data.get('possible_resolution', ''),
+            run_timestamp=timezone.now()
         )
+        # The local journal takes the row first; Snowflake writes are the fallback.
+        if not record_result(TEST_CASE_LOG, log_fields):
+            if log_writer is not None:
+                log_writer.add_test_case_log(**log_fields)
+            else:
+                TestCaseLog.objects.using('snowflake_dev').create(**log_fields)
+                refresh_latest_test_case_statuses([log_fields])
     except Exception as log_e:
         logger.exception(f"Error logging ad-hoc test run for {test_case_id}: {log_e}")
         result['log_error'] = str(log_e)
@@ -752,48 +832,249 @@ def get_available_connection_sources():
         sources.append("Power BI")
     return sources
     
-GROUP_RUN_STATUS = {}
+def _get_group_max_workers(group_id, max_workers=None):
+    """
+    Resolves the worker-pool size for a group run. An explicit value wins, then a
+    per-group override from EAGLE_GROUP_MAX_WORKERS_OVERRIDES, then EAGLE_GROUP_MAX_WORKERS.
+    The result is capped at EAGLE_GROUP_MAX_WORKERS_LIMIT, since each worker holds its own
+    Snowflake and Power BI connections. Raises ValueError for a non-integer explicit value.
+    """
+    if max_workers is None:
+        overrides = getattr(settings, "EAGLE_GROUP_MAX_WORKERS_OVERRIDES", {}) or {}
+        max_workers = int(overrides.get(group_id, getattr(settings, "EAGLE_GROUP_MAX_WORKERS", 4)))
+    else:
+        try:
+            max_workers = int(max_workers)
+        except (TypeError, ValueError):
+            raise ValueError(f"max_workers must be an integer, got '{max_workers}'.")
+    limit = max(1, int(getattr(settings, "EAGLE_GROUP_MAX_WORKERS_LIMIT", 16)))
+    if max_workers > limit:
+        logger.warning(f"Group {group_id} asked for {max_workers} workers; capped at EAGLE_GROUP_MAX_WORKERS_LIMIT ({limit}).")
+        max_workers = limit
+    return max(1, max_workers)
 
-def start_group_run_task(group_id):
+def _init_group_run_status():
     run_id = str(uuid.uuid4())
-    GROUP_RUN_STATUS[run_id] = {
+    get_run_status_store().create(GROUP_RUNS, run_id, {
         "status": "PENDING", "total_test_cases": 0, "executed_count": 0,
         "current_test_name": "Preparing to run...", "results": []
-    }
-    thread = threading.Thread(target=_execute_group_in_background, args=(run_id, group_id))
-    thread.daemon = True
-    thread.start()
-    logger.info(f"Started background run for group {group_id} with run ID: {run_id}")
+    })
     return run_id
 
+def _update_group_run_status(run_id, **fields):
+    get_run_status_store().update(GROUP_RUNS, run_id, **fields)
+
+def _publish_run_event(kind, run_id, event, **data):
+    """Appends a progress event for the run's SSE stream (see run_events)."""
+    get_run_status_store().append_event(kind, run_id, event, _to_json_safe(data))
+
+def _failed_items(results, name_key):
+    return [
+        {name_key: res.get(name_key), "status": res.get('status'), "message": res.get('message')}
+        for res in results if res and res.get('status') in ('FAIL', 'ERROR')
+    ]
+
+def _enqueue_run_job(kind, target_id, run_id, options=None, policy=None):
+    """
+    Hands a run to the job queue; a `manage.py run_job_workers` process executes it.
+    Returns the run_id of an in-flight run of the same target to attach to, or None when
+    the run was queued. If the queue can't be written the run is marked as failed right away.
+    """
+    try:
+        existing = enqueue_run(kind, target_id, run_id, options, policy)
+    except RunAlreadyActive:
+        raise
+    except Exception as e:
+        logger.exception(f"Could not enqueue {kind} run {run_id} for {target_id}: {e}")
+        message = f"Could not queue the run: {e}"
+        get_run_status_store().update(kind, run_id, status="ERROR", final_status="ERROR", message=message)
+        _publish_run_event(kind, run_id, "completed", status="ERROR", message=message)
+        return None
+    if existing is None:
+        _publish_run_event(kind, run_id, "queued")
+        logger.info(f"Queued {kind} run {run_id} for {target_id}.")
+    return existing
+
+def _admit_run(kind, target_id, run_id, policy, options, execute, args):
+    """
+    Starts a freshly created run unless another run of the same target is in flight (see
+    run_admission): queued for the job workers, or on a thread running `execute(*args)`.
+    Returns (run_id, attached). When attaching, the new run is discarded and the in-flight
+    run's id is returned instead. Raises RunAlreadyActive under the 'reject' policy.
+    """
+    try:
+        if run_execution_mode() == 'queue':
+            existing = _enqueue_run_job(kind, target_id, run_id, options, policy)
+        else:
+            existing = admit_thread_run(kind, target_id, run_id, policy)
+            if existing is None:
+                thread = threading.Thread(target=run_admitted_thread, args=(kind, target_id, run_id, execute, args))
+                thread.daemon = True
+                thread.start()
+                logger.info(f"Started background run for {kind} {target_id} with run ID: {run_id}")
+    except RunAlreadyActive as e:
+        get_run_status_store().discard(kind, run_id)
+        logger.info(f"Rejected {kind} run for {target_id}; run {e.run_id} is still in progress.")
+        raise
+    if existing is None:
+        return run_id, False
+    get_run_status_store().discard(kind, run_id)
+    logger.info(f"{kind.capitalize()} {target_id} already has run {existing} in progress; attaching to it.")
+    return existing, True
+
+def start_group_run_task(group_id, max_workers=None, policy=None):
+    """
+    Starts a run of the group and returns (run_id, attached); see _admit_run. `policy`
+    overrides EAGLE_RUN_ADMISSION_POLICY for this call. Raises ValueError for an unknown
+    policy or a non-integer `max_workers`.
+    """
+    policy = admission_policy(policy)
+    resolved_workers = _get_group_max_workers(group_id, max_workers)
+    run_id = _init_group_run_status()
+    if run_execution_mode() == 'queue':
+        _update_group_run_status(run_id, current_test_name="Queued; waiting for a worker...")
+    # Only an explicit value is queued; otherwise the worker applies the configuration it runs with.
+    return _admit_run(
+        GROUP_RUNS, group_id, run_id, policy,
+        {"max_workers": resolved_workers if max_workers is not None else None},
+        _execute_group_in_background, (run_id, group_id, resolved_workers)
+    )
+
 def get_group_run_status(run_id):
-    return GROUP_RUN_STATUS.get(run_id, {"status": "NOT_FOUND", "message": "Run ID not found."})
+    status = get_run_status_store().get(GROUP_RUNS, run_id)
+    return status if status is not None else {"status": "NOT_FOUND", "message": "Run ID not found."}
+
+def _prefetch_fused_aggregations(ordered_test_cases):
+    """
+    Plans and runs the fused multi-aggregate queries for a group run, returning the
+    prefetched side values keyed by test case id (see query_fusion).
+    """
+    if not getattr(settings, "EAGLE_GROUP_QUERY_FUSION", True):
+        return {}
+    configs = {item['id']: item['config'] for item in ordered_test_cases if not item['validation_errors']}
+    try:
+        return execute_fused_aggregation_plan(plan_fused_aggregation_queries(configs))
+    except Exception as e:
+        logger.exception(f"Query fusion failed; running every test with its own queries: {e}")
+        return {}
 
-def _execute_group_in_background(run_id, group_id):
+def _run_group_test_cases(run_id, group_id, ordered_test_cases, max_workers, prefetched=None, log_writer=None):
+    """
+    Executes the test cases of a group on a bounded pool of worker threads.
+    Test cases are dequeued by execution_order, so lower orders start first, but
+    with more than one worker they may finish out of order. Results are returned
+    in execution_order regardless of completion order.
+    """
+    total_tests = len(ordered_test_cases)
+    results_by_index = [None] * total_tests
+    prefetched = prefetched or {}
+    query_cache = get_active_query_cache()
+    metadata = get_active_metadata_snapshot()
+    work_queue = queue.PriorityQueue()
+    for index, item in enumerate(ordered_test_cases):
+        work_queue.put((item['execution_order'], index, item))
+
+    def run_one(index, item):
+        tc_id = item['id']
+        tc_name = item['detail'].get('test_name', 'N/A')
+        position = get_run_status_store().increment(
+            GROUP_RUNS, run_id, "executed_count", current_test_name=tc_name
+        )
+        _publish_run_event(
+            GROUP_RUNS, run_id, "test_started",
+            test_case_id=tc_id, test_name=tc_name, position=position, total=total_tests
+        )
+        logger.info(f"     - Executing test {position}/{total_tests}: '{tc_name}' ({tc_id})")
+        try:
+            result = run_adhoc_test_logic(
+                tc_id, parent_run_id=run_id, prefetched_sides=prefetched.get(tc_id),
+                log_writer=log_writer, preloaded=item
+            )
+        except Exception as e:
+            logger.exception(f"     -> Error running test case {tc_id} in group {group_id}: {e}")
+            result = {"status": "ERROR", "message": f"Execution failed: {e}"}
+        results_by_index[index] = result
+        _publish_run_event(
+            GROUP_RUNS, run_id, "test_finished",
+            test_case_id=tc_id, test_name=tc_name, status=result.get('status'), message=result.get('message')
+        )
+        logger.info(f"     -> Test '{tc_name}' status: {result.get('status')}")
+
+    def worker():
+        try:
+            with activate_query_cache(query_cache), activate_metadata_snapshot(metadata):
+                while True:
+                    try:
+                        _, index, item = work_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    run_one(index, item)
+        finally:
+            # Django connections are thread-local; release this worker's before it exits.
+            connections.close_all()
+
+    if max_workers <= 1 or total_tests <= 1:
+        # Sequential mode runs on the calling thread and keeps its connections open.
+        for index, item in enumerate(ordered_test_cases):
+            run_one(index, item)
+    else:
+        workers = [
+            threading.Thread(target=worker, name=f"group-run-{run_id[:8]}-{n}", daemon=True)
+            for n in range(min(max_workers, total_tests))
+        ]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+    return [
+        res if res is not None else {"status": "ERROR", "message": "Test execution failed unexpectedly or was not fully processed."}
+        for res in results_by_index
+    ]
+
+def _new_run_query_cache():
+    return RunQueryCache(max_entries=int(getattr(settings, "EAGLE_RUN_QUERY_CACHE_MAX_ENTRIES", 1000)))
+
+def _execute_group_in_background(run_id, group_id, max_workers=1, query_cache=None, log_writer=None):
+    """
+    Runs a group with a run-scoped query cache and metadata snapshot active and its test
+    case logs buffered. Project runs pass their own cache and writer so identical queries
+    are shared across all of the project's groups; each group reads its metadata afresh.
+    """
+    if query_cache is None:
+        query_cache = _new_run_query_cache()
+    if log_writer is None:
+        log_writer = BufferedLogWriter()
+    with activate_query_cache(query_cache), activate_metadata_snapshot(MetadataSnapshot()):
+        _execute_group_run(run_id, group_id, max_workers, query_cache, log_writer)
+
+def _execute_group_run(run_id, group_id, max_workers, query_cache, log_writer):
     overall_group_status = "PASS"
     failed_tests_count = 0
     all_test_results = []
-    start_time = datetime.now()
+    start_time = timezone.now()
     total_tests = 0
+    project_name = None
+    # The group is loaded before the try: the finally block below needs its name and project.
     try:
-        group_meta = get_test_group_details_from_db(group_id)
-        if not group_meta:
-            GROUP_RUN_STATUS[run_id]["status"] = "ERROR"
-            GROUP_RUN_STATUS[run_id]["current_test_name"] = "Group not found."
-            logger.error(f"Test group {group_id} not found for background run.")
-            return
-        project_name = None
-        if group_meta.get('project_id'):
-            try:
-                project_obj = Project.objects.using('snowflake_dev').get(project_id=group_meta['project_id'])
-                project_name = project_obj.project_name
-            except Project.DoesNotExist:
-                project_name = None
-        test_cases_in_group = get_test_cases_in_group_from_db(group_id)
+        group_meta = get_test_group_details_from_db(group_id, use_cache=True)
+        message = "Group not found."
+    except Exception as e:
+        logger.exception(f"Could not load test group {group_id} for background run: {e}")
+        group_meta, message = None, f"Could not load the group: {e}"
+    if not group_meta:
+        _update_group_run_status(run_id, status="ERROR", final_status="ERROR", current_test_name=message)
+        _publish_run_event(GROUP_RUNS, run_id, "completed", status="ERROR", message=message)
+        logger.error(f"Test group {group_id} background run stopped: {message}")
+        return
+    try:
+        project_obj = get_project(group_meta.get('project_id'))
+        project_name = project_obj.project_name if project_obj is not None else None
+        # One bulk fetch of the group's definitions; tests run without further definition queries.
+        test_cases_in_group = get_group_execution_plan(group_id)
         total_tests = len(test_cases_in_group)
-        GROUP_RUN_STATUS[run_id]["total_test_cases"] = total_tests
-        GROUP_RUN_STATUS[run_id]["status"] = "RUNNING"
-        logger.info(f"Starting background run for group {group_id}. Total tests: {total_tests}")
+        _update_group_run_status(run_id, total_test_cases=total_tests, status="RUNNING")
+        _publish_run_event(GROUP_RUNS, run_id, "started", total_test_cases=total_tests)
+        logger.info(f"Starting background run for group {group_id}. Total tests: {total_tests}, max workers: {max_workers}")
         log_test_group_status_orm(
             run_id=run_id, test_group_id=group_id, group_name=group_meta['name'],
             project_id=group_meta['project_id'], project_name=project_name,
@@ -801,33 +1082,24 @@ def _execute_group_in_background(run_id, group_id):
             results_details={"test_cases_in_group": total_tests},
             start_time=start_time
         )
-        for index, item in enumerate(sorted(test_cases_in_group, key=lambda x: x['execution_order'])):
-            tc_id = item['id']
-            tc_detail = item['detail']
-            tc_name = tc_detail.get('test_name', 'N/A')
-            GROUP_RUN_STATUS[run_id]["executed_count"] = index + 1
-            GROUP_RUN_STATUS[run_id]["current_test_name"] = tc_name
-            logger.info(f"     - Executing test {index + 1}/{total_tests}: '{tc_name}' ({tc_id})")
-            result = {"status": "ERROR", "message": "Test execution failed unexpectedly or was not fully processed."} 
-            try:
-                result = run_adhoc_test_logic(tc_id, parent_run_id=run_id)
-            except Exception as e:
-                logger.exception(f"     -> Error running test case {tc_id} in group {group_id}: {e}")
-                result = {"status": "ERROR", "message": f"Execution failed: {e}"}
-            all_test_results.append(result)
-            logger.info(f"     -> Test '{tc_name}' status: {result.get('status')}")
+        ordered_test_cases = sorted(test_cases_in_group, key=lambda x: x['execution_order'])
+        prefetched = _prefetch_fused_aggregations(ordered_test_cases)
+        all_test_results = _run_group_test_cases(run_id, group_id, ordered_test_cases, max_workers, prefetched, log_writer)
+        for result in all_test_results:
             if result.get('status') == 'FAIL':
                 failed_tests_count += 1
                 if overall_group_status == "PASS":
                     overall_group_status = "FAIL"
             elif result.get('status') == 'ERROR':
                 overall_group_status = "ERROR"
-        GROUP_RUN_STATUS[run_id]["results"] = all_test_results
+        _update_group_run_status(run_id, results=_to_json_safe(all_test_results))
     except Exception as e:
         logger.exception(f"CRITICAL ERROR: Failed to run group {group_id}: {e}")
         overall_group_status = "ERROR"
     finally:
-        end_time = datetime.now()
+        # Every test case log of the group is persisted before the group is marked finished.
+        log_writer.flush()
+        end_time = timezone.now()
         final_message = f"Test group run finished with status: {overall_group_status}."
         detailed_results = {
             "Overall Status": overall_group_status, "Total Tests": total_tests,
@@ -838,7 +1110,9 @@ def _execute_group_in_background(run_id, group_id):
                     "status": res.get('status'), "message": res.get('message')
                 }
                 for res in all_test_results if res.get("status") in ("FAIL", "ERROR")
-            ]
+            ],
+            "Query Cache": query_cache.stats(),
+            "Log Writer": log_writer.stats(),
         }
         log_test_group_status_orm(
             run_id=run_id, test_group_id=group_id, group_name=group_meta['name'],
@@ -854,51 +1128,100 @@ def _execute_group_in_background(run_id, group_id):
                 total_tests=total_tests,
                 failed_tests=failed_tests_count
             )
+            invalidate_metadata(TestGroup, group_id)
             logger.info(f"Updated TestGroup {group_id} with final status and stats.")
         except Exception as e:
             logger.error(f"Failed to update TestGroup {group_id} with stats: {e}")
 
-        GROUP_RUN_STATUS[run_id]["status"] = "COMPLETED"
-        GROUP_RUN_STATUS[run_id]["final_status"] = overall_group_status
-        GROUP_RUN_STATUS[run_id]["failed_tests"] = failed_tests_count
+        _update_group_run_status(
+            run_id, status="COMPLETED", final_status=overall_group_status,
+            failed_tests=failed_tests_count, query_cache=detailed_results["Query Cache"]
+        )
+        _publish_run_event(
+            GROUP_RUNS, run_id, "completed", status=overall_group_status, total_test_cases=total_tests,
+            failed_tests=failed_tests_count, failed=_failed_items(all_test_results, 'test_name')
+        )
         logger.info(f"Background run for group {group_id} finished.")
 
-PROJECT_RUN_STATUS = {}
+# Shared by every project run, so EAGLE_PROJECT_MAX_CONCURRENT_GROUPS caps the
+# number of groups executing at once across the whole process.
+_project_group_executor = None
+_project_group_executor_lock = threading.Lock()
+
+def _get_project_group_executor():
+    global _project_group_executor
+    with _project_group_executor_lock:
+        if _project_group_executor is None:
+            max_groups = max(1, int(getattr(settings, "EAGLE_PROJECT_MAX_CONCURRENT_GROUPS", 4)))
+            _project_group_executor = ThreadPoolExecutor(max_workers=max_groups, thread_name_prefix="project-group")
+        return _project_group_executor
 
-def start_project_run_task(project_id):
+def _run_group_for_project(group_run_id, group_id, query_cache, log_writer, project_run_id=None, group_name=None):
+    """
+    Runs one group of a project run on a scheduler thread and returns its final
+    group run status, so the caller is notified through the future.
+    """
+    if project_run_id:
+        _publish_run_event(
+            PROJECT_RUNS, project_run_id, "group_started",
+            test_group_id=group_id, group_name=group_name, group_run_id=group_run_id
+        )
+    try:
+        _execute_group_in_background(group_run_id, group_id, _get_group_max_workers(group_id), query_cache, log_writer)
+    finally:
+        connections.close_all()
+    return get_group_run_status(group_run_id)
+
+
+def start_project_run_task(project_id, policy=None):
+    """
+    Starts a run of the project and returns (run_id, attached); see _admit_run. `policy`
+    overrides EAGLE_RUN_ADMISSION_POLICY for this call.
+    """
+    policy = admission_policy(policy)
     run_id = str(uuid.uuid4())
-    PROJECT_RUN_STATUS[run_id] = {
+    get_run_status_store().create(PROJECT_RUNS, run_id, {
         "status": "PENDING", "total_test_groups": 0, "executed_count": 0,
         "current_group_name": "Preparing to run...", "results": []
-    }
-    thread = threading.Thread(target=_execute_project_in_background, args=(run_id, project_id))
-    thread.daemon = True
-    thread.start()
-    logger.info(f"Started background run for project {project_id} with run ID: {run_id}")
-    return run_id
+    })
+    if run_execution_mode() == 'queue':
+        _update_project_run_status(run_id, current_group_name="Queued; waiting for a worker...")
+    return _admit_run(PROJECT_RUNS, project_id, run_id, policy, {}, _execute_project_in_background, (run_id, project_id))
 
 def get_project_run_status(run_id):
-    return PROJECT_RUN_STATUS.get(run_id, {"status": "NOT_FOUND", "message": "Run ID not found."})
+    status = get_run_status_store().get(PROJECT_RUNS, run_id)
+    return status if status is not None else {"status": "NOT_FOUND", "message": "Run ID not found."}
+
+def _update_project_run_status(run_id, **fields):
+    get_run_status_store().update(PROJECT_RUNS, run_id, **fields)
 
 def _execute_project_in_background(run_id, project_id):
     overall_project_status = "PASS"
     failed_groups_count = 0
     all_group_results = []
-    start_time = datetime.now()
+    start_time = timezone.now()
     total_groups = 0
+    query_cache = _new_run_query_cache()
+    log_writer = BufferedLogWriter()
+    # The project is loaded before the try: the finally block below needs its name.
     try:
         project_meta = get_project_from_db(project_id)
-        if not project_meta:
-            PROJECT_RUN_STATUS[run_id]["status"] = "ERROR"
-            PROJECT_RUN_STATUS[run_id]["current_group_name"] = "Project not found."
-            logger.error(f"Project {project_id} not found for background run.")
-            return
+        message = "Project not found."
+    except Exception as e:
+        logger.exception(f"Could not load project {project_id} for background run: {e}")
+        project_meta, message = None, f"Could not load the project: {e}"
+    if not project_meta:
+        _update_project_run_status(run_id, status="ERROR", final_status="ERROR", current_group_name=message)
+        _publish_run_event(PROJECT_RUNS, run_id, "completed", status="ERROR", message=message)
+        logger.error(f"Project {project_id} background run stopped: {message}")
+        return
+    try:
         test_groups_in_project = get_test_groups_for_project_from_db(project_id)
         # Sort by execution_order if available, else by name
         test_groups_in_project.sort(key=lambda x: (x.get('execution_order', 999), x['name']))
         total_groups = len(test_groups_in_project)
-        PROJECT_RUN_STATUS[run_id]["total_test_groups"] = total_groups
-        PROJECT_RUN_STATUS[run_id]["status"] = "RUNNING"
+        _update_project_run_status(run_id, total_test_groups=total_groups, status="RUNNING")
+        _publish_run_event(PROJECT_RUNS, run_id, "started", total_test_groups=total_groups)
         logger.info(f"Starting background run for project {project_id}. Total groups: {total_groups}")
         log_project_status_orm(
             run_id=run_id, project_id=project_id, project_name=project_meta['name'],
@@ -906,55 +1229,64 @@ def _execute_project_in_background(run_id, project_id):
             results_details={"test_groups_in_project": total_groups},
             start_time=start_time
         )
+        results_by_index = [None] * total_groups
+        executor = _get_project_group_executor()
+        pending = {}
         for index, group in enumerate(test_groups_in_project):
+            group_run_id = _init_group_run_status()
+            logger.info(f"     - Scheduling group {index + 1}/{total_groups}: '{group['name']}' ({group['id']}) as run {group_run_id}")
+            pending[executor.submit(
+                _run_group_for_project, group_run_id, group['id'], query_cache, log_writer, run_id, group['name']
+            )] = (index, group)
+        for future in as_completed(pending):
+            index, group = pending[future]
             group_id = group['id']
             group_name = group['name']
-            PROJECT_RUN_STATUS[run_id]["executed_count"] = index + 1
-            PROJECT_RUN_STATUS[run_id]["current_group_name"] = group_name
-            logger.info(f"     - Executing group {index + 1}/{total_groups}: '{group_name}' ({group_id})")
-            result = {"status": "ERROR", "message": "Group execution failed unexpectedly."}
             try:
-                # Use the existing group run logic
-                group_run_id = start_group_run_task(group_id)
-                # Wait for group run to complete
-                while True:
-                    status = get_group_run_status(group_run_id)
-                    if status.get("status") == "COMPLETED":
-                        result = {
-                            "status": status.get("final_status", "ERROR"),
-                            "message": f"Group run completed with status {status.get('final_status', 'ERROR')}",
-                            "failed_tests": status.get("failed_tests", 0),
-                            "total_tests": status.get("total_test_cases", 0)
-                        }
-                        break
-                    elif status.get("status") == "ERROR":
-                        result = {"status": "ERROR", "message": "Group run failed."}
-                        break
-                    time.sleep(1)  # Poll every second
+                status = future.result()
+                if status.get("status") == "COMPLETED":
+                    result = {
+                        "status": status.get("final_status", "ERROR"),
+                        "message": f"Group run completed with status {status.get('final_status', 'ERROR')}",
+                        "failed_tests": status.get("failed_tests", 0),
+                        "total_tests": status.get("total_test_cases", 0)
+                    }
+                else:
+                    result = {"status": "ERROR", "message": "Group run failed."}
             except Exception as e:
                 logger.exception(f"     -> Error running test group {group_id} in project {project_id}: {e}")
                 result = {"status": "ERROR", "message": f"Execution failed: {e}"}
-            all_group_results.append({
+            results_by_index[index] = {
                 "test_group_id": group_id,
                 "group_name": group_name,
                 "status": result.get("status"),
                 "message": result.get("message"),
                 "failed_tests": result.get("failed_tests", 0),
                 "total_tests": result.get("total_tests", 0)
-            })
+            }
+            position = get_run_status_store().increment(
+                PROJECT_RUNS, run_id, "executed_count", current_group_name=group_name
+            )
+            _publish_run_event(
+                PROJECT_RUNS, run_id, "group_finished", position=position, total=total_groups,
+                **results_by_index[index]
+            )
             logger.info(f"     -> Group '{group_name}' status: {result.get('status')}")
+        all_group_results = results_by_index
+        for result in all_group_results:
             if result.get('status') == 'FAIL':
                 failed_groups_count += 1
                 if overall_project_status == "PASS":
                     overall_project_status = "FAIL"
             elif result.get('status') == 'ERROR':
                 overall_project_status = "ERROR"
-        PROJECT_RUN_STATUS[run_id]["results"] = all_group_results
+        _update_project_run_status(run_id, results=all_group_results)
     except Exception as e:
         logger.exception(f"CRITICAL ERROR: Failed to run project {project_id}: {e}")
         overall_project_status = "ERROR"
     finally:
-        end_time = datetime.now()
+        log_writer.flush()
+        end_time = timezone.now()
         final_message = f"Project run finished with status: {overall_project_status}."
         detailed_results = {
             "Overall Status": overall_project_status, "Total Groups": total_groups,
@@ -965,7 +1297,9 @@ def _execute_project_in_background(run_id, project_id):
                     "status": res.get('status'), "message": res.get('message')
                 }
                 for res in all_group_results if res.get("status") in ("FAIL", "ERROR")
-            ]
+            ],
+            "Query Cache": query_cache.stats(),
+            "Log Writer": log_writer.stats(),
         }
         log_project_status_orm(
             run_id=run_id, project_id=project_id, project_name=project_meta['name'],
@@ -980,31 +1314,32 @@ def _execute_project_in_background(run_id, project_id):
                 total_groups=total_groups,
                 failed_groups=failed_groups_count
             )
+            invalidate_metadata(Project, project_id)
             logger.info(f"Updated Project {project_id} with final status and stats.")
         except Exception as e:
             logger.error(f"Failed to update Project {project_id} with stats: {e}")
 
-        PROJECT_RUN_STATUS[run_id]["status"] = "COMPLETED"
-        PROJECT_RUN_STATUS[run_id]["final_status"] = overall_project_status
-        PROJECT_RUN_STATUS[run_id]["failed_groups"] = failed_groups_count
+        _update_project_run_status(
+            run_id, status="COMPLETED", final_status=overall_project_status,
+            failed_groups=failed_groups_count, query_cache=detailed_results["Query Cache"]
+        )
+        _publish_run_event(
+            PROJECT_RUNS, run_id, "completed", status=overall_project_status, total_test_groups=total_groups,
+            failed_groups=failed_groups_count, failed=_failed_items(all_group_results, 'group_name')
+        )
         logger.info(f"Background run for project {project_id} finished.")
 
 def log_project_status_orm(run_id, project_id, project_name, status, message, results_details, start_time, end_time=None):
     try:
-        criticality = None
-        try:
-            project_obj = Project.objects.using('snowflake_dev').get(project_id=project_id)
-            criticality = project_obj.criticality_level
-        except Project.DoesNotExist:
-            criticality = None
-        ProjectLogs.objects.using('snowflake_dev').update_or_create(
-            run_id=run_id,
-            defaults={
-                'project_id': project_id, 'project_name': project_name, 'criticality': criticality,
-                'status': status, 'message': message, 'results_details': _to_json_safe(results_details),
-                'start_timestamp': start_time, 'end_timestamp': end_time
-            }
-        )
+        project_obj = get_project(project_id)
+        criticality = project_obj.criticality_level if project_obj is not None else None
+        defaults = {
+            'project_id': project_id, 'project_name': project_name, 'criticality': criticality,
+            'status': status, 'message': message, 'results_details': _to_json_safe(results_details),
+            'start_timestamp': start_time, 'end_timestamp': end_time
+        }
+        if not record_result(PROJECT_LOG, {'run_id': run_id, **defaults}):
+            ProjectLogs.objects.using('snowflake_dev').update_or_create(run_id=run_id, defaults=defaults)
         logger.info(f"Project log for {run_id} updated successfully.")
     except Exception as e:
         logger.exception(f"Error creating/updating ProjectLogs for run {run_id}: {e}")
@@ -5,16 +5,46 @@ from datetime import datetime, timedelta
 import pandas as pd
 import logging
 import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import close_old_connections
 from dq_management.dq_core import (
+    execute_query_first_row,
+    execute_query_rows,
     execute_query_to_dataframe,
+    first_row_value,
     build_dynamic_aggregation_query,
+    build_drift_aggregation_query,
     build_dynamic_dax_query_powerbi
 )
 from dq_management.powerbi_connector import PowerBIConnector
+from dq_management.group_comparison import compare_keyed_results, split_group_by_columns
+from dq_management.query_cache import activate_query_cache, get_active_query_cache
 
 logger = logging.getLogger(__name__)
 
+# Long-lived pool for the side of a comparison that runs off the calling thread.
+# Its threads keep their Django connections between tests, like request threads do.
+_side_query_executor = None
+_side_query_executor_lock = threading.Lock()
+
+def _get_side_query_executor():
+    global _side_query_executor
+    with _side_query_executor_lock:
+        if _side_query_executor is None:
+            max_workers = max(1, int(getattr(settings, "EAGLE_SIDE_QUERY_WORKERS", 8)))
+            _side_query_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="side-query")
+        return _side_query_executor
+
+def _run_side_on_pool(query_cache, func, *args):
+    # Drop connections that are broken or past CONN_MAX_AGE before reusing them.
+    close_old_connections()
+    # Pool threads are shared between runs, so carry the caller's run cache over explicitly.
+    with activate_query_cache(query_cache):
+        return func(*args)
+
 class TestCaseProcessor:
     def __init__(self):
         pass
@@ -96,7 +126,7 @@ class TestCaseProcessor:
             return "Power BI"
         return mapping.get(user_conn_name, user_conn_name)
 
-    def process_test_request(self, config, action, run_id=None):
+    def process_test_request(self, config, action, run_id=None, prefetched_sides=None):
         working_config = copy.deepcopy(config)
         test_type = working_config.get('test_type').lower().replace(' ', '')
         
@@ -109,7 +139,7 @@ class TestCaseProcessor:
         }
         try:
             if test_type == 'aggregationcomparison':
-                result_data.update(self._execute_snowflake_to_powerbi_aggregation_test_logic(working_config))
+                result_data.update(self._execute_snowflake_to_powerbi_aggregation_test_logic(working_config, prefetched_sides))
             elif test_type == 'drifttest' or test_type == 'powerbidrift':
                 result_data.update(self._execute_drift_test_logic(working_config))
             elif test_type == 'availabilitytest' or test_type == 'powerbiavailability':
@@ -121,98 +151,169 @@ class TestCaseProcessor:
             result_data['message'] = f"An unhandled error occurred: {e}"
         return result_data
 
-    # --- Aggregation Test: Snowflake Source, Power BI Destination ---
-    def _execute_snowflake_to_powerbi_aggregation_test_logic(self, config):
-        result = {}
+    # --- Aggregation Test: one side (source or destination) of the comparison ---
+    def build_aggregation_side_query(self, config, prefix, conn_name=None):
+        """
+        Returns the query one side of an aggregation test runs on its own: its custom
+        DAX/SQL if given, else the built aggregation query for its connection. Used by both
+        the scalar and the keyed (group-by) comparison.
+        """
+        if conn_name is None:
+            conn_name = self._map_user_connection(config.get(f'{prefix}_connection_source'))
+        if conn_name == "Power BI":
+            return (config.get(f'{prefix}_dax_query') or '').strip() or build_dynamic_dax_query_powerbi(
+                table=config.get(f'{prefix}_table'), date_column=config.get(f'{prefix}_date_column'),
+                date_value=config.get(f'{prefix}_date_value'), aggregation_type=config.get(f'{prefix}_aggregation_type', 'COUNT'),
+                aggregation_column=config.get(f'{prefix}_aggregation_column'), group_by_column=config.get(f'{prefix}_group_by_column'),
+                additional_filters=config.get(f'{prefix}_additional_filters')
+            )
+        db_config = dict(settings.DATABASES[conn_name])
+        db_config['schema'] = config.get(f'{prefix}_schema') or db_config.get('schema') or 'PUBLIC'
+        return build_dynamic_aggregation_query(
+            db_config, config.get(f'{prefix}_table'), config.get(f'{prefix}_date_column'),
+            config.get(f'{prefix}_date_value'), config.get(f'{prefix}_aggregation_type'),
+            config.get(f'{prefix}_aggregation_column'), config.get(f'{prefix}_group_by_column'),
+            config.get(f'{prefix}_additional_filters'), config.get(f'{prefix}_custom_sql')
+        )
 
-        # --- Source Side ---
-        source_conn_name = self._map_user_connection(config.get('source_connection_source'))
-        if source_conn_name == "Power BI":
-            if config.get('source_dax_query', '').strip():
-                dax_query = config['source_dax_query'].strip()
-            else:
-                dax_query = build_dynamic_dax_query_powerbi(
-                    table=config.get('source_table'), date_column=config.get('source_date_column'),
-                    date_value=config.get('source_date_value'), aggregation_type=config.get('source_aggregation_type', 'COUNT'),
-                    aggregation_column=config.get('source_aggregation_column'), group_by_column=config.get('source_group_by_column'),
-                    additional_filters=config.get('source_additional_filters')
-                )
-            result['source_query'] = dax_query
+    def _execute_aggregation_side(self, config, prefix, prefetched=None):
+        """
+        Builds and runs the query for one side of an aggregation test and returns the
+        '{prefix}_*' result keys, including the side's wall-clock time in milliseconds.
+        A side already answered by a fused group query is returned without querying.
+        """
+        result = {}
+        label = prefix.capitalize()
+        started = time.perf_counter()
+        if prefetched:
+            result[f'{prefix}_query'] = prefetched['query']
+            result[f'{prefix}_value'] = prefetched['value']
+            result[f'{prefix}_connection_used'] = prefetched['connection']
+            result[f'{prefix}_fused'] = True
+            result[f'{prefix}_fused_column'] = prefetched.get('column')
+            result[f'{prefix}_elapsed_ms'] = 0.0
+            return result
+        conn_name = self._map_user_connection(config.get(f'{prefix}_connection_source'))
+        if conn_name == "Power BI":
+            dax_query = self.build_aggregation_side_query(config, prefix, conn_name)
+            result[f'{prefix}_query'] = dax_query
+            result[f'{prefix}_connection_used'] = "Power BI"
             try:
-                df_source = PowerBIConnector()._execute_dax_query(
-                    config.get('source_workspace_id'),  # <-- use correct key
-                    config.get('source_dataset_id'),    # <-- use correct key
+                df = PowerBIConnector()._execute_dax_query(
+                    config.get(f'{prefix}_workspace_id'),
+                    config.get(f'{prefix}_dataset_id'),
                     dax_query
                 )
-                result['source_value'] = df_source.iloc[0, 0] if not df_source.empty and not df_source.columns.empty else 0
-                result['source_connection_used'] = "Power BI"
+                result[f'{prefix}_value'] = df.iloc[0, 0] if not df.empty and not df.columns.empty else 0
             except Exception as e:
-                result['source_value'] = None
-                result['source_connection_used'] = "Power BI"
-                result['source_error'] = str(e)
+                result[f'{prefix}_value'] = None
+                result[f'{prefix}_error'] = str(e)
         else:
-            # Use SQL builder and Snowflake executor for source
-            source_db_config = dict(settings.DATABASES[source_conn_name])
-            source_db_config['schema'] = config.get('source_schema') or source_db_config.get('schema') or 'PUBLIC'
-            source_query_str = build_dynamic_aggregation_query(
-                source_db_config, config.get('source_table'), config.get('source_date_column'),
-                config.get('source_date_value'), config.get('source_aggregation_type'),
-                config.get('source_aggregation_column'), config.get('source_group_by_column'),
-                config.get('source_additional_filters'), config.get('source_custom_sql')
-            )
-            result['source_query'] = source_query_str
-            df_source, source_exec_error = execute_query_to_dataframe(source_conn_name, source_query_str)
-            if source_exec_error:
-                result['source_value'] = None
-                result['source_connection_used'] = source_conn_name
-                result['source_error'] = f"Source query failed: {source_exec_error}"
+            # Use SQL builder and Snowflake executor
+            query_str = self.build_aggregation_side_query(config, prefix, conn_name)
+            result[f'{prefix}_query'] = query_str
+            result[f'{prefix}_connection_used'] = conn_name
+            # Custom SQL may return any number of rows; only the first is compared, so
+            # fetch one and record whether the query produced more.
+            _, rows, truncated, exec_error = execute_query_rows(conn_name, query_str, max_rows=1)
+            if exec_error:
+                result[f'{prefix}_value'] = None
+                result[f'{prefix}_error'] = f"{label} query failed: {exec_error}"
             else:
-                result['source_value'] = df_source.iloc[0, 0] if not df_source.empty and not df_source.columns.empty else 0
-                result['source_connection_used'] = source_conn_name
+                result[f'{prefix}_value'] = first_row_value(rows[0] if rows else None)
+                result[f'{prefix}_truncated'] = truncated
+        result[f'{prefix}_elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
 
-        # --- Destination Side ---
-        destination_conn_name = self._map_user_connection(config.get('destination_connection_source'))
-        if destination_conn_name == "Power BI":
-            dax_query = config.get('destination_dax_query', '').strip()
-            if not dax_query:
-                dax_query = build_dynamic_dax_query_powerbi(
-                    table=config.get('destination_table'), date_column=config.get('destination_date_column'),
-                    date_value=config.get('destination_date_value'), aggregation_type=config.get('destination_aggregation_type', 'COUNT'),
-                    aggregation_column=config.get('destination_aggregation_column'), group_by_column=config.get('destination_group_by_column'),
-                    additional_filters=config.get('destination_additional_filters')
-                )
-            result['destination_query'] = dax_query
+    # --- Aggregation Test: one side of a keyed (group-by) comparison ---
+    def _fetch_aggregation_side_frame(self, config, prefix):
+        """
+        Runs one side of a group-by aggregation test and returns ('{prefix}_*' result keys, DataFrame).
+        SQL sides are capped at EAGLE_MAX_RESULT_ROWS groups and flag '{prefix}_truncated' when cut.
+        """
+        result = {}
+        label = prefix.capitalize()
+        started = time.perf_counter()
+        df = pd.DataFrame()
+        conn_name = self._map_user_connection(config.get(f'{prefix}_connection_source'))
+        if conn_name == "Power BI":
+            dax_query = self.build_aggregation_side_query(config, prefix, conn_name)
+            result[f'{prefix}_query'] = dax_query
+            result[f'{prefix}_connection_used'] = "Power BI"
             try:
-                df_destination = PowerBIConnector()._execute_dax_query(
-                    config.get('destination_workspace_id'),  # <-- use correct key
-                    config.get('destination_dataset_id'),    # <-- use correct key
-                    dax_query
+                df = PowerBIConnector()._execute_dax_query(
+                    config.get(f'{prefix}_workspace_id'), config.get(f'{prefix}_dataset_id'), dax_query
                 )
-                result['destination_value'] = df_destination.iloc[0, 0] if not df_destination.empty and not df_destination.columns.empty else 0
-                result['destination_connection_used'] = "Power BI"
             except Exception as e:
-                result['destination_value'] = None
-                result['destination_connection_used'] = "Power BI"
-                result['destination_error'] = str(e)
+                result[f'{prefix}_error'] = str(e)
         else:
-            # Use SQL builder and Snowflake executor for destination
-            destination_db_config = dict(settings.DATABASES[destination_conn_name])
-            destination_db_config['schema'] = config.get('destination_schema') or destination_db_config.get('schema') or 'PUBLIC'
-            destination_query_str = build_dynamic_aggregation_query(
-                destination_db_config, config.get('destination_table'), config.get('destination_date_column'),
-                config.get('destination_date_value'), config.get('destination_aggregation_type'),
-                config.get('destination_aggregation_column'), config.get('destination_group_by_column'),
-                config.get('destination_additional_filters'), config.get('destination_custom_sql')
-            )
-            result['destination_query'] = destination_query_str
-            df_destination, destination_exec_error = execute_query_to_dataframe(destination_conn_name, destination_query_str)
-            if destination_exec_error:
-                result['destination_value'] = None
-                result['destination_connection_used'] = destination_conn_name
-                result['destination_error'] = f"Destination query failed: {destination_exec_error}"
+            query_str = self.build_aggregation_side_query(config, prefix, conn_name)
+            result[f'{prefix}_query'] = query_str
+            result[f'{prefix}_connection_used'] = conn_name
+            df, exec_error = execute_query_to_dataframe(conn_name, query_str)
+            if exec_error:
+                result[f'{prefix}_error'] = f"{label} query failed: {exec_error}"
             else:
-                result['destination_value'] = df_destination.iloc[0, 0] if not df_destination.empty and not df_destination.columns.empty else 0
-                result['destination_connection_used'] = destination_conn_name
+                result[f'{prefix}_truncated'] = df.attrs.get("truncated", False)
+        result[f'{prefix}_elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result, df
+
+    # --- Aggregation Test: keyed comparison when the sides are grouped ---
+    def _execute_keyed_aggregation_test_logic(self, config):
+        source_keys = split_group_by_columns(config.get('source_group_by_column'))
+        destination_keys = split_group_by_columns(config.get('destination_group_by_column')) or source_keys
+
+        source_future = _get_side_query_executor().submit(
+            _run_side_on_pool, get_active_query_cache(), self._fetch_aggregation_side_frame, config, 'source'
+        )
+        try:
+            result, destination_df = self._fetch_aggregation_side_frame(config, 'destination')
+        finally:
+            source_result, source_df = source_future.result()
+        result.update(source_result)
+
+        threshold, threshold_type = config.get('threshold'), config.get('threshold_type')
+        result.update({"threshold": threshold if threshold is not None else 0, "threshold_type": threshold_type or 'ABSOLUTE'})
+        error_parts = [f"{label} error: {result[f'{prefix}_error']}"
+                       for prefix, label in (('source', 'Source'), ('destination', 'Destination')) if result.get(f'{prefix}_error')]
+        if error_parts:
+            result.update({"status": "ERROR", "test_outcome": "ERROR", "message": " ".join(error_parts)})
+            return result
+        try:
+            status, message, summary = compare_keyed_results(
+                source_df, destination_df, source_keys, destination_keys, threshold, threshold_type
+            )
+        except ValueError as e:
+            result.update({"status": "ERROR", "test_outcome": "ERROR", "message": f"Keyed comparison failed: {e}"})
+            return result
+        for prefix in ('source', 'destination'):
+            if result.get(f'{prefix}_truncated'):
+                message += f" Note: {prefix} result was truncated; only the first groups were compared."
+        result.update({
+            "status": status, "test_outcome": status, "message": message, "group_comparison": summary,
+            "source_value": summary.get('source_total'), "destination_value": summary.get('destination_total'),
+            "difference": summary.get('max_difference'),
+        })
+        return result
+
+    # --- Aggregation Test: Snowflake Source, Power BI Destination ---
+    def _execute_snowflake_to_powerbi_aggregation_test_logic(self, config, prefetched_sides=None):
+        if (config.get('source_group_by_column') or '').strip():
+            return self._execute_keyed_aggregation_test_logic(config)
+        result = {}
+        prefetched_sides = prefetched_sides or {}
+
+        # Both sides usually hit different systems, so the source runs on the side-query
+        # pool while the destination runs here; both are joined before the comparison.
+        source_future = _get_side_query_executor().submit(
+            _run_side_on_pool, get_active_query_cache(), self._execute_aggregation_side,
+            config, 'source', prefetched_sides.get('source')
+        )
+        try:
+            result.update(self._execute_aggregation_side(config, 'destination', prefetched_sides.get('destination')))
+        finally:
+            source_result = source_future.result()
+        result.update(source_result)
 
         # --- Comparison ---
         status, message, outcome, diff, threshold, threshold_type = self._perform_comparison(
@@ -226,6 +327,9 @@ class TestCaseProcessor:
             error_parts.append(f"Destination error: {result['destination_error']}")
         if error_parts:
             message += " " + " ".join(error_parts)
+        for prefix in ('source', 'destination'):
+            if result.get(f'{prefix}_truncated'):
+                message += f" Note: {prefix} query returned more than one row; only the first row was compared."
         result.update({"status": status, "message": message, "difference": diff, "test_outcome": outcome, "threshold": threshold, "threshold_type": threshold_type})
         # If there were query errors, override status to ERROR
         if result.get('source_error') or result.get('destination_error'):
@@ -268,30 +372,65 @@ class TestCaseProcessor:
             conn_name = self._map_user_connection(data_source)
             db_config = dict(settings.DATABASES[conn_name])
             db_config['schema'] = config.get('source_schema') or db_config.get('schema') or 'PUBLIC'
-            sql_query_today = build_dynamic_aggregation_query(db_config, config.get('source_table'), config.get('source_date_column'), today_date_value, config.get('source_aggregation_type'), config.get('source_aggregation_column'))
-            df_today, exec_error_today = execute_query_to_dataframe(conn_name, sql_query_today)
-            if exec_error_today:
-                result['source_value'] = None
-                result['source_error'] = f"Today's query failed: {exec_error_today}"
-            else:
-                result['source_value'] = df_today.iloc[0, 0] if not df_today.empty and not df_today.columns.empty else 0
-            sql_query_yesterday = build_dynamic_aggregation_query(db_config, config.get('source_table'), config.get('source_date_column'), yesterday_date_value, config.get('source_aggregation_type'), config.get('source_aggregation_column'))
-            df_yesterday, exec_error_yesterday = execute_query_to_dataframe(conn_name, sql_query_yesterday)
-            if exec_error_yesterday:
-                result['destination_value'] = None
-                result['destination_error'] = f"Yesterday's query failed: {exec_error_yesterday}"
+            if getattr(settings, "EAGLE_DRIFT_SINGLE_QUERY", True):
+                result.update(self._execute_single_query_drift(conn_name, db_config, config, today_date_value, yesterday_date_value))
             else:
-                result['destination_value'] = df_yesterday.iloc[0, 0] if not df_yesterday.empty and not df_yesterday.columns.empty else 0
-            result['source_query'] = sql_query_today
-            result['destination_query'] = sql_query_yesterday
-            result['source_connection_used'] = conn_name
-            result['destination_connection_used'] = conn_name
+                result.update(self._execute_two_query_drift(conn_name, db_config, config, today_date_value, yesterday_date_value))
         status, message, outcome, diff, threshold, threshold_type = self._perform_comparison(
             result['source_value'], result['destination_value'], config.get('threshold'), config.get('threshold_type')
         )
         result.update({"status": status, "message": message, "difference": diff, "test_outcome": outcome, "threshold": threshold, "threshold_type": threshold_type})
         return result
 
+    def _execute_single_query_drift(self, conn_name, db_config, config, today_date_value, yesterday_date_value):
+        """
+        Drift on a SQL source: one scan over both days returns today's and yesterday's values.
+        """
+        result = {}
+        sql_query = build_drift_aggregation_query(
+            db_config, config.get('source_table'), config.get('source_date_column'),
+            today_date_value, yesterday_date_value,
+            config.get('source_aggregation_type'), config.get('source_aggregation_column')
+        )
+        row, exec_error = execute_query_first_row(conn_name, sql_query)
+        if exec_error:
+            result['source_value'] = None
+            result['destination_value'] = None
+            result['source_error'] = f"Drift query failed: {exec_error}"
+        else:
+            result['source_value'] = first_row_value(row, 0)
+            result['destination_value'] = first_row_value(row, 1)
+        result['source_query'] = sql_query
+        result['destination_query'] = sql_query
+        result['source_connection_used'] = conn_name
+        result['destination_connection_used'] = conn_name
+        return result
+
+    def _execute_two_query_drift(self, conn_name, db_config, config, today_date_value, yesterday_date_value):
+        """
+        Drift on a SQL source with one aggregation query per day (EAGLE_DRIFT_SINGLE_QUERY = False).
+        """
+        result = {}
+        sql_query_today = build_dynamic_aggregation_query(db_config, config.get('source_table'), config.get('source_date_column'), today_date_value, config.get('source_aggregation_type'), config.get('source_aggregation_column'))
+        row_today, exec_error_today = execute_query_first_row(conn_name, sql_query_today)
+        if exec_error_today:
+            result['source_value'] = None
+            result['source_error'] = f"Today's query failed: {exec_error_today}"
+        else:
+            result['source_value'] = first_row_value(row_today)
+        sql_query_yesterday = build_dynamic_aggregation_query(db_config, config.get('source_table'), config.get('source_date_column'), yesterday_date_value, config.get('source_aggregation_type'), config.get('source_aggregation_column'))
+        row_yesterday, exec_error_yesterday = execute_query_first_row(conn_name, sql_query_yesterday)
+        if exec_error_yesterday:
+            result['destination_value'] = None
+            result['destination_error'] = f"Yesterday's query failed: {exec_error_yesterday}"
+        else:
+            result['destination_value'] = first_row_value(row_yesterday)
+        result['source_query'] = sql_query_today
+        result['destination_query'] = sql_query_yesterday
+        result['source_connection_used'] = conn_name
+        result['destination_connection_used'] = conn_name
+        return result
+
     # --- Availability Test (Single-system) ---
     def _execute_availability_test_logic(self, config):
         result = {}
@@ -315,12 +454,12 @@ class TestCaseProcessor:
             db_config = dict(settings.DATABASES[conn_name])
             db_config['schema'] = config.get('source_schema') or db_config.get('schema') or 'PUBLIC'
             sql_query = build_dynamic_aggregation_query(db_config, config.get('source_table'), config.get('source_date_column'), 'CURRENT_DATE()', 'COUNT', config.get('source_aggregation_column'))
-            df_source, exec_error = execute_query_to_dataframe(conn_name, sql_query)
+            row_source, exec_error = execute_query_first_row(conn_name, sql_query)
             if exec_error:
                 result['source_value'] = None
                 result['source_error'] = f"Availability query failed: {exec_error}"
             else:
-                result['source_value'] = df_source.iloc[0, 0] if not df_source.empty and not df_source.columns.empty else 0
+                result['source_value'] = first_row_value(row_source)
             result['source_query'] = sql_query
             result['source_connection_used'] = conn_name
 
@@ -348,12 +487,12 @@ class TestCaseProcessor:
                 db_config_dest = dict(settings.DATABASES[conn_name_dest])
                 db_config_dest['schema'] = config.get('destination_schema') or db_config_dest.get('schema') or 'PUBLIC'
                 sql_query_dest = build_dynamic_aggregation_query(db_config_dest, config.get('destination_table'), config.get('destination_date_column'), 'CURRENT_DATE()', 'COUNT', config.get('destination_aggregation_column'))
-                df_dest, exec_error_dest = execute_query_to_dataframe(conn_name_dest, sql_query_dest)
+                row_dest, exec_error_dest = execute_query_first_row(conn_name_dest, sql_query_dest)
                 if exec_error_dest:
                     result['destination_value'] = None
                     result['destination_error'] = f"Availability query failed: {exec_error_dest}"
                 else:
-                    result['destination_value'] = df_dest.iloc[0, 0] if not df_dest.empty and not df_dest.columns.empty else 0
+                    result['destination_value'] = first_row_value(row_dest)
                 result['destination_query'] = sql_query_dest
                 result['destination_connection_used'] = conn_name_dest
         else:
@@ -1,3 +1,2150 @@
-from django.test import TestCase
+import io
+import json
+import os
+import asyncio
+import time
+import threading
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+import pandas as pd
+from django.db import OperationalError
+from django.db.models.signals import post_save
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from dq_management import (
+    dq_core, job_queue, latest_status, log_writer, metadata_cache, powerbi_connector, result_journal,
+    run_admission, run_events, run_status_store, services, views,
+)
+from dq_management.metadata_cache import (
+    MetadataSnapshot, activate_metadata_snapshot, get_project, get_test_case, invalidate_metadata,
+)
+from dq_management.log_utils import should_log_full_payload, truncate_for_log
+from dq_management.log_writer import BufferedLogWriter
+from dq_management.models import Project, TestCase, TestCaseLog
+from dq_management.dq_core import (
+    build_dax_scalar_expression_powerbi, build_drift_aggregation_query, build_dynamic_dax_query_powerbi,
+    build_fused_dax_query_powerbi,
+)
+from dq_management.group_comparison import compare_keyed_results, NULL_KEY
+from dq_management.run_admission import RunAlreadyActive, admission_policy, decide_admission
+from dq_management.log_queries import (
+    InvalidCursor, encode_cursor, decode_cursor, filters_from_params, get_logs_page_size,
+)
+from dq_management.query_cache import (
+    RunQueryCache, activate_query_cache, get_active_query_cache, normalize_query_text,
+)
+from dq_management.query_fusion import plan_fused_aggregation_queries, execute_fused_aggregation_plan
+from dq_management import test_case_manager
+from dq_management.test_case_manager import TestCaseProcessor
+
+
+def _aggregation_config(aggregation_type='SUM', aggregation_column='AMOUNT', **overrides):
+    config = {
+        'test_type': 'Aggregation Comparison',
+        'source_connection_source': 'DEV', 'source_schema': 'SALES', 'source_table': 'ORDERS',
+        'source_aggregation_type': aggregation_type, 'source_aggregation_column': aggregation_column,
+        'destination_connection_source': 'Power BI', 'destination_table': 'Orders',
+        'destination_aggregation_type': aggregation_type, 'destination_aggregation_column': aggregation_column,
+    }
+    config.update(overrides)
+    return config
+
+
+class QueryFusionPlanTests(SimpleTestCase):
+    def test_sides_on_the_same_table_share_one_query(self):
+        plan = plan_fused_aggregation_queries({
+            'tc1': _aggregation_config('SUM', 'AMOUNT'),
+            'tc2': _aggregation_config('COUNT', 'ORDER_ID'),
+            'tc3': _aggregation_config('SUM', 'AMOUNT'),
+        })
+        self.assertEqual(len(plan), 1)
+        entry = plan[0]
+        self.assertEqual(entry['connection'], 'snowflake_dev')
+        self.assertIn('AGG_0', entry['query'])
+        self.assertIn('AGG_1', entry['query'])
+        self.assertNotIn('AGG_2', entry['query'])
+        # Identical aggregates share a column.
+        self.assertEqual(entry['members'], [('tc1', 'source', 0), ('tc2', 'source', 1), ('tc3', 'source', 0)])
+
+    def test_member_queries_match_the_standalone_side_query(self):
+        configs = {'tc1': _aggregation_config('SUM', 'AMOUNT'), 'tc2': _aggregation_config('MAX', 'AMOUNT')}
+        entry = plan_fused_aggregation_queries(configs)[0]
+        processor = TestCaseProcessor()
+        for test_case_id, config in configs.items():
+            self.assertEqual(
+                entry['member_queries'][(test_case_id, 'source')],
+                processor.build_aggregation_side_query(config, 'source')
+            )
+
+    def test_unfusible_sides_are_left_out(self):
+        plan = plan_fused_aggregation_queries({
+            'single': _aggregation_config(source_table='CUSTOMERS'),
+            'custom': _aggregation_config(source_custom_sql='SELECT 1'),
+            'grouped': _aggregation_config(source_group_by_column='REGION'),
+            'other_filter': _aggregation_config(source_additional_filters="REGION = 'EU'"),
+            'not_aggregation': _aggregation_config(test_type='Row Count'),
+        })
+        self.assertEqual(plan, [])
+
+
+class QueryFusionExecutionTests(SimpleTestCase):
+    def setUp(self):
+        self.plan = plan_fused_aggregation_queries({
+            'tc1': _aggregation_config('SUM', 'AMOUNT'),
+            'tc2': _aggregation_config('COUNT', 'ORDER_ID'),
+        })
+
+    def test_values_fan_out_with_each_sides_own_query(self):
+        with mock.patch('dq_management.query_fusion.execute_query_first_row', return_value=((150, 3), None)):
+            prefetched = execute_fused_aggregation_plan(self.plan)
+        entry = self.plan[0]
+        self.assertEqual(prefetched['tc1']['source']['value'], 150)
+        self.assertEqual(prefetched['tc2']['source']['value'], 3)
+        self.assertEqual(prefetched['tc2']['source']['column'], 'AGG_1')
+        self.assertEqual(prefetched['tc2']['source']['query'], entry['member_queries'][('tc2', 'source')])
+        self.assertNotEqual(prefetched['tc2']['source']['query'], entry['query'])
+
+    def test_failed_fused_query_leaves_sides_to_their_own_queries(self):
+        with mock.patch('dq_management.query_fusion.execute_query_first_row', return_value=(None, 'timeout')):
+            self.assertEqual(execute_fused_aggregation_plan(self.plan), {})
+
+
+class KeyedComparisonTests(SimpleTestCase):
+    def test_matching_groups_pass(self):
+        source = pd.DataFrame({'REGION': ['EU', 'US'], 'TOTAL': [10, 20]})
+        destination = pd.DataFrame({'Sales[Region]': ['EU', 'US'], '[Value]': [10, 20]})
+        status, _, summary = compare_keyed_results(source, destination, ['REGION'], ['Region'])
+        self.assertEqual(status, 'PASS')
+        self.assertEqual(summary['keys_compared'], 2)
+
+    def test_breaches_and_missing_keys_fail(self):
+        source = pd.DataFrame({'REGION': ['EU', 'US', 'APAC'], 'TOTAL': [10, 20, 5]})
+        destination = pd.DataFrame({'REGION': ['EU', 'US', 'LATAM'], 'TOTAL': [10, 25, 7]})
+        status, _, summary = compare_keyed_results(source, destination, ['REGION'], ['REGION'], threshold=1)
+        self.assertEqual(status, 'FAIL')
+        self.assertEqual(summary['keys_over_threshold'], 1)
+        self.assertEqual(summary['worst_offenders'][0]['key'], 'REGION=US')
+        self.assertEqual(summary['missing_in_destination_sample'], ['REGION=APAC'])
+        self.assertEqual(summary['missing_in_source_sample'], ['REGION=LATAM'])
+
+    def test_percentage_threshold(self):
+        source = pd.DataFrame({'REGION': ['EU'], 'TOTAL': [100]})
+        destination = pd.DataFrame({'REGION': ['EU'], 'TOTAL': [104]})
+        status, _, _ = compare_keyed_results(source, destination, ['REGION'], ['REGION'], 5, 'PERCENTAGE')
+        self.assertEqual(status, 'PASS')
+
+    def test_null_keys_match_each_other(self):
+        source = pd.DataFrame({'REGION': ['EU', None], 'TOTAL': [10, 3]})
+        destination = pd.DataFrame({'REGION': ['EU', float('nan')], 'TOTAL': [10, 3]})
+        status, _, summary = compare_keyed_results(source, destination, ['REGION'], ['REGION'])
+        self.assertEqual(status, 'PASS')
+        self.assertEqual(summary['keys_compared'], 2)
+
+    def test_numeric_keys_match_across_types(self):
+        source = pd.DataFrame({'STORE_ID': [1, 2, Decimal('3.00')], 'TOTAL': [1, 2, 3]})
+        destination = pd.DataFrame({'STORE_ID': ['1.0', 2.0, '3'], 'TOTAL': [1, 2, 3]})
+        status, _, summary = compare_keyed_results(source, destination, ['STORE_ID'], ['STORE_ID'])
+        self.assertEqual(status, 'PASS')
+        self.assertEqual(summary['missing_in_source'], 0)
+
+    def test_date_keys_match_midnight_timestamps(self):
+        source = pd.DataFrame({'DAY': [date(2024, 1, 1), date(2024, 1, 2)], 'TOTAL': [1, 2]})
+        destination = pd.DataFrame({'DAY': ['2024-01-01T00:00:00', pd.Timestamp('2024-01-02')], 'TOTAL': [1, 2]})
+        status, _, summary = compare_keyed_results(source, destination, ['DAY'], ['DAY'])
+        self.assertEqual(status, 'PASS')
+        self.assertEqual(summary['keys_compared'], 2)
+
+    def test_mixed_keys_fall_back_to_strings(self):
+        source = pd.DataFrame({'CODE': ['A1', ' 7 '], 'TOTAL': [1, 2]})
+        destination = pd.DataFrame({'CODE': ['A1', '7'], 'TOTAL': [1, 2]})
+        status, _, _ = compare_keyed_results(source, destination, ['CODE'], ['CODE'])
+        self.assertEqual(status, 'PASS')
+
+    def test_null_key_label(self):
+        source = pd.DataFrame({'REGION': [None], 'TOTAL': [1]})
+        destination = pd.DataFrame({'REGION': ['EU'], 'TOTAL': [1]})
+        _, _, summary = compare_keyed_results(source, destination, ['REGION'], ['REGION'])
+        self.assertEqual(summary['missing_in_destination_sample'], [f'REGION={NULL_KEY}'])
+
+    def test_duplicate_keys_fail(self):
+        source = pd.DataFrame({'REGION': ['EU', 'US', 'EU'], 'TOTAL': [10, 20, 99]})
+        destination = pd.DataFrame({'REGION': ['EU', 'US'], 'TOTAL': [10, 20]})
+        status, message, summary = compare_keyed_results(source, destination, ['REGION'], ['REGION'])
+        self.assertEqual(status, 'FAIL')
+        self.assertEqual(summary['duplicate_keys'], {'source': 1, 'destination': 0})
+        self.assertEqual(summary['duplicate_keys_sample'], {'source': ['REGION=EU'], 'destination': []})
+        self.assertEqual(summary['keys_over_threshold'], 0)
+        self.assertIn('duplicate', message)
+
+    def test_keys_equal_after_normalization_count_as_duplicates(self):
+        source = pd.DataFrame({'STORE_ID': [1, 2], 'TOTAL': [1, 2]})
+        destination = pd.DataFrame({'STORE_ID': ['1', '1.0', '2'], 'TOTAL': [1, 1, 2]})
+        status, _, summary = compare_keyed_results(source, destination, ['STORE_ID'], ['STORE_ID'])
+        self.assertEqual(status, 'FAIL')
+        self.assertEqual(summary['duplicate_keys']['destination'], 1)
+
+    def test_missing_group_by_column_raises(self):
+        source = pd.DataFrame({'REGION': ['EU'], 'TOTAL': [1]})
+        destination = pd.DataFrame({'COUNTRY': ['EU'], 'TOTAL': [1]})
+        with self.assertRaises(ValueError):
+            compare_keyed_results(source, destination, ['REGION'], ['REGION'])
+
+
+class TempSQLiteMixin:
+    """Points `setting` at a SQLite file in a fresh temporary directory for each test."""
+    setting = None
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        overrides = override_settings(**{self.setting: os.path.join(self.tmp_dir, 'db.sqlite3')})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+class ResultJournalTests(TempSQLiteMixin, SimpleTestCase):
+    setting = 'EAGLE_RESULT_JOURNAL_PATH'
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(result_journal, 'start_journal_drainer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.written = []
+        self.fail_with = {}
+
+        def write_entries(kind, entries):
+            for fields in entries:
+                error = self.fail_with.get(fields['run_id'])
+                if error is not None:
+                    raise error
+            self.written.extend((kind, fields['run_id'], fields.get('status')) for fields in entries)
+
+        patcher = mock.patch.object(result_journal, '_write_entries', side_effect=write_entries)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_drain_writes_and_removes_rows(self):
+        started = datetime(2024, 1, 1, 12, 30)
+        result_journal.record_result(result_journal.TEST_CASE_LOG, {'run_id': 'c1', 'status': 'PASS', 'at': started})
+        self.assertEqual(result_journal.drain_journal_once(), 1)
+        self.assertEqual(self.written, [(result_journal.TEST_CASE_LOG, 'c1', 'PASS')])
+        self.assertEqual(result_journal.pending_journal_count(), 0)
+
+    def test_datetimes_survive_the_journal(self):
+        started = datetime(2024, 1, 1, 12, 30)
+        result_journal.record_result(result_journal.TEST_CASE_LOG, {'run_id': 'c1', 'at': started})
+        with mock.patch.object(result_journal, '_write_entries') as write_entries:
+            result_journal.drain_journal_once()
+        self.assertEqual(write_entries.call_args[0][1][0]['at'], started)
+
+    def test_outage_raises_without_counting_attempts(self):
+        result_journal.record_result(result_journal.TEST_CASE_LOG, {'run_id': 'c1', 'status': 'PASS'})
+        self.fail_with['c1'] = OperationalError('connection refused')
+        for _ in range(15):
+            with self.assertRaises(OperationalError):
+                result_journal.drain_journal_once()
+        self.assertEqual(result_journal.quarantined_journal_entries(), [])
+        del self.fail_with['c1']
+        self.assertEqual(result_journal.drain_journal_once(), 1)
+
+    @override_settings(EAGLE_RESULT_JOURNAL_MAX_ATTEMPTS=3)
+    def test_bad_rows_are_quarantined_and_can_be_requeued(self):
+        result_journal.record_result(result_journal.TEST_CASE_LOG, {'run_id': 'bad', 'status': 'PASS'})
+        result_journal.record_result(result_journal.TEST_CASE_LOG, {'run_id': 'good', 'status': 'PASS'})
+        self.fail_with['bad'] = ValueError('value too long')
+        self.assertEqual(result_journal.drain_journal_once(), 1)
+        for _ in range(2):
+            result_journal.drain_journal_once()
+        quarantined = result_journal.quarantined_journal_entries()
+        self.assertEqual([entry['run_id'] for entry in quarantined], ['bad'])
+        self.assertEqual(result_journal.drain_journal_once(), 0)
+
+        del self.fail_with['bad']
+        self.assertEqual(result_journal.requeue_failed_journal_entries(), 1)
+        self.assertEqual(result_journal.drain_journal_once(), 1)
+        self.assertEqual(result_journal.pending_journal_count(), 0)
+
+    def test_only_the_newest_status_of_a_run_is_written(self):
+        result_journal.record_result(result_journal.TEST_GROUP_LOG, {'run_id': 'g1', 'status': 'RUNNING'})
+        result_journal.record_result(result_journal.TEST_GROUP_LOG, {'run_id': 'g1', 'status': 'PASS'})
+        self.assertEqual(result_journal.drain_journal_once(), 2)
+        self.assertEqual(self.written, [(result_journal.TEST_GROUP_LOG, 'g1', 'PASS')])
+
+    def test_failed_running_status_is_superseded_by_the_final_one(self):
+        result_journal.record_result(result_journal.TEST_GROUP_LOG, {'run_id': 'g1', 'status': 'RUNNING'})
+        self.fail_with['g1'] = ValueError('bad row')
+        result_journal.drain_journal_once()
+        del self.fail_with['g1']
+        result_journal.record_result(result_journal.TEST_GROUP_LOG, {'run_id': 'g1', 'status': 'FAIL'})
+        result_journal.drain_journal_once()
+        self.assertEqual(self.written, [(result_journal.TEST_GROUP_LOG, 'g1', 'FAIL')])
+        # The RUNNING entry is gone, so it can never be retried over the final status.
+        self.assertEqual(result_journal.pending_journal_count(), 0)
+
+
+class LogCursorTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        timestamp = datetime(2024, 5, 17, 8, 15, 30, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(timestamp, 'run-42')), (timestamp, 'run-42'))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(datetime(2024, 5, 17), 'run/with+odd?chars')
+        self.assertNotRegex(cursor, r'[^A-Za-z0-9_-]')
+
+    def test_malformed_cursor_raises(self):
+        for cursor in ('not-a-cursor', encode_cursor(datetime(2024, 5, 17), 'x')[:-4], ''):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    @override_settings(EAGLE_LOGS_PAGE_SIZE=50, EAGLE_LOGS_MAX_PAGE_SIZE=500)
+    def test_page_size_is_defaulted_and_clamped(self):
+        self.assertEqual(get_logs_page_size(), 50)
+        self.assertEqual(get_logs_page_size('abc'), 50)
+        self.assertEqual(get_logs_page_size('20'), 20)
+        self.assertEqual(get_logs_page_size(0), 1)
+        self.assertEqual(get_logs_page_size(10000), 500)
+
+    def test_filters_keep_known_non_empty_values(self):
+        params = {'project_id': ' p1 ', 'status': '', 'unknown': 'x', 'date_from': '2024-01-01'}
+        self.assertEqual(filters_from_params(params), {'project_id': 'p1', 'date_from': '2024-01-01'})
+
+
+class JobQueueTests(TempSQLiteMixin, SimpleTestCase):
+    setting = 'EAGLE_JOB_QUEUE_PATH'
+
+    def _age(self, run_id, column, seconds):
+        conn = job_queue._connect()
+        try:
+            conn.execute(f"UPDATE run_job SET {column} = {column} - ? WHERE run_id = ?", (seconds, run_id))
+        finally:
+            conn.close()
+
+    def test_jobs_are_claimed_oldest_first(self):
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1', {'verbose': True})
+        job_queue.enqueue_run('GROUP_RUNS', 'g2', 'run-2')
+        job = job_queue.claim_next_job('w1')
+        self.assertEqual((job['run_id'], job['attempts']), ('run-1', 1))
+        self.assertEqual(job['options'], {'verbose': True})
+        self.assertEqual(job_queue.claim_next_job('w2')['run_id'], 'run-2')
+        self.assertIsNone(job_queue.claim_next_job('w3'))
+
+    def test_target_already_running_is_skipped(self):
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1')
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-2')
+        job_queue.enqueue_run('GROUP_RUNS', 'g2', 'run-3')
+        first = job_queue.claim_next_job('w1')
+        self.assertEqual(job_queue.claim_next_job('w2')['run_id'], 'run-3')
+        self.assertIsNone(job_queue.claim_next_job('w2'))
+        job_queue.finish_job(first['id'], 'w1')
+        self.assertEqual(job_queue.claim_next_job('w2')['run_id'], 'run-2')
+
+    def test_finish_job_records_outcome(self):
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1')
+        job_queue.enqueue_run('GROUP_RUNS', 'g2', 'run-2')
+        ok = job_queue.claim_next_job('w1')
+        bad = job_queue.claim_next_job('w1')
+        job_queue.finish_job(ok['id'], 'w1')
+        job_queue.finish_job(bad['id'], 'w1', error='boom')
+        job_queue.finish_job(bad['id'], 'someone-else')
+        self.assertEqual(job_queue.queue_counts(), {job_queue.DONE: 1, job_queue.FAILED: 1})
+
+    @override_settings(EAGLE_JOB_STALE_SECONDS=60, EAGLE_JOB_MAX_ATTEMPTS=2)
+    def test_stale_jobs_are_requeued_then_failed(self):
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1')
+        job_queue.claim_next_job('w1')
+        self.assertEqual(job_queue.recover_stale_jobs(), ([], []))
+
+        self._age('run-1', 'heartbeat_at', 120)
+        requeued, failed = job_queue.recover_stale_jobs()
+        self.assertEqual(([job['run_id'] for job in requeued], failed), (['run-1'], []))
+        self.assertEqual(job_queue.queue_counts(), {job_queue.QUEUED: 1})
+
+        self.assertEqual(job_queue.claim_next_job('w2')['attempts'], 2)
+        self._age('run-1', 'heartbeat_at', 120)
+        requeued, failed = job_queue.recover_stale_jobs()
+        self.assertEqual((requeued, [job['run_id'] for job in failed]), ([], ['run-1']))
+        self.assertEqual(job_queue.queue_counts(), {job_queue.FAILED: 1})
+
+    @override_settings(EAGLE_JOB_RETENTION_SECONDS=3600)
+    def test_prune_only_removes_old_finished_jobs(self):
+        for run_id in ('run-1', 'run-2', 'run-3'):
+            job_queue.enqueue_run('GROUP_RUNS', run_id, run_id)
+        for _ in range(2):
+            job = job_queue.claim_next_job('w1')
+            job_queue.finish_job(job['id'], 'w1')
+        self._age('run-1', 'finished_at', 7200)
+        self.assertEqual(job_queue.prune_finished_jobs(), 1)
+        self.assertEqual(job_queue.queue_counts(), {job_queue.DONE: 1, job_queue.QUEUED: 1})
+
+    def test_attach_policy_returns_in_flight_run(self):
+        self.assertIsNone(job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1', policy='attach'))
+        self.assertEqual(job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-2', policy='attach'), 'run-1')
+        self.assertIsNone(job_queue.enqueue_run('GROUP_RUNS', 'g2', 'run-3', policy='attach'))
+        self.assertEqual(job_queue.queue_counts(), {job_queue.QUEUED: 2})
+
+    def test_queue_policy_admits_one_waiting_run(self):
+        job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-1', policy='queue')
+        self.assertEqual(job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-2', policy='queue'), 'run-1')
+        job_queue.claim_next_job('w1')
+        self.assertIsNone(job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-2', policy='queue'))
+        self.assertEqual(job_queue.enqueue_run('GROUP_RUNS', 'g1', 'run-3', policy='queue'), 'run-2')
+
+    def test_reject_policy_raises(self):
+        job_queue.enqueue_run('PROJECT_RUNS', 'p1', 'run-1', policy='reject')
+        with self.assertRaises(RunAlreadyActive) as raised:
+            job_queue.enqueue_run('PROJECT_RUNS', 'p1', 'run-2', policy='reject')
+        self.assertEqual(raised.exception.run_id, 'run-1')
+
+
+class RunAdmissionTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(run_admission._thread_runs.clear)
+        self.addCleanup(run_admission._target_locks.clear)
+
+    def test_policy_defaults_and_validation(self):
+        self.assertEqual(admission_policy(), 'attach')
+        self.assertEqual(admission_policy(' Queue '), 'queue')
+        with override_settings(EAGLE_RUN_ADMISSION_POLICY='reject'):
+            self.assertEqual(admission_policy(), 'reject')
+        with self.assertRaises(ValueError):
+            admission_policy('drop')
+
+    def test_decide_admission(self):
+        active = [('run-1', True), ('run-2', False)]
+        self.assertIsNone(decide_admission('group', 'g1', 'reject', []))
+        self.assertEqual(decide_admission('group', 'g1', 'attach', active), 'run-1')
+        self.assertEqual(decide_admission('group', 'g1', 'queue', active), 'run-2')
+        self.assertIsNone(decide_admission('group', 'g1', 'queue', active[:1]))
+        with self.assertRaises(RunAlreadyActive) as raised:
+            decide_admission('group', 'g1', 'reject', active)
+        self.assertEqual((raised.exception.target_id, raised.exception.run_id), ('g1', 'run-1'))
+
+    def test_thread_admission_registers_and_attaches(self):
+        self.assertIsNone(run_admission.admit_thread_run('group', 1, 'run-1', 'queue'))
+        self.assertEqual(run_admission.admit_thread_run('group', '1', 'run-2', 'attach'), 'run-1')
+        self.assertIsNone(run_admission.admit_thread_run('group', 1, 'run-2', 'queue'))
+        self.assertEqual(run_admission.admit_thread_run('group', 1, 'run-3', 'queue'), 'run-2')
+
+    def test_admitted_threads_run_one_at_a_time(self):
+        first_started, release_first = threading.Event(), threading.Event()
+        order = []
+
+        def first():
+            order.append('run-1 start')
+            first_started.set()
+            release_first.wait(5)
+            order.append('run-1 end')
+
+        run_admission.admit_thread_run('group', 'g1', 'run-1', 'queue')
+        run_admission.admit_thread_run('group', 'g1', 'run-2', 'queue')
+        threads = [
+            threading.Thread(target=run_admission.run_admitted_thread, args=('group', 'g1', 'run-1', first, ())),
+        ]
+        threads[0].start()
+        first_started.wait(5)
+        threads.append(threading.Thread(
+            target=run_admission.run_admitted_thread,
+            args=('group', 'g1', 'run-2', order.append, ('run-2',))
+        ))
+        threads[1].start()
+        threads[1].join(0.2)
+        self.assertEqual(order, ['run-1 start'])
+        release_first.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['run-1 start', 'run-1 end', 'run-2'])
+        self.assertEqual(run_admission._thread_runs, {})
+
+    def test_failed_run_releases_target(self):
+        def boom():
+            raise RuntimeError('boom')
+
+        run_admission.admit_thread_run('group', 'g1', 'run-1', 'attach')
+        with self.assertRaises(RuntimeError):
+            run_admission.run_admitted_thread('group', 'g1', 'run-1', boom, ())
+        self.assertIsNone(run_admission.admit_thread_run('group', 'g1', 'run-2', 'attach'))
+
+
+@override_settings(
+    EAGLE_GROUP_MAX_WORKERS=4, EAGLE_GROUP_MAX_WORKERS_LIMIT=8,
+    EAGLE_GROUP_MAX_WORKERS_OVERRIDES={'big-group': 6, 'huge-group': 50},
+)
+class GroupMaxWorkersTests(SimpleTestCase):
+    def test_configured_default_and_per_group_override(self):
+        self.assertEqual(services._get_group_max_workers('any-group'), 4)
+        self.assertEqual(services._get_group_max_workers('big-group'), 6)
+
+    def test_explicit_value_wins_within_the_limit(self):
+        self.assertEqual(services._get_group_max_workers('big-group', '2'), 2)
+        self.assertEqual(services._get_group_max_workers('any-group', 0), 1)
+
+    def test_values_are_capped_at_the_limit(self):
+        self.assertEqual(services._get_group_max_workers('any-group', '500'), 8)
+        self.assertEqual(services._get_group_max_workers('huge-group'), 8)
+
+    def test_non_integer_value_is_rejected(self):
+        with self.assertRaises(ValueError):
+            services._get_group_max_workers('any-group', 'lots')
+
+    def test_view_answers_400_for_non_integer_value(self):
+        request = RequestFactory().post('/run', {'max_workers': 'lots'})
+        with mock.patch.object(services, '_init_group_run_status') as init_status:
+            response = views.run_test_group_async(request, 'any-group')
+        self.assertEqual(response.status_code, 400)
+        init_status.assert_not_called()
+
+    @override_settings(EAGLE_RUN_EXECUTION='thread')
+    def test_thread_run_gets_the_capped_value(self):
+        with mock.patch.object(services, '_init_group_run_status', return_value='run-1'), \
+                mock.patch.object(services, '_admit_run', return_value=('run-1', False)) as admit:
+            services.start_group_run_task('any-group', max_workers='500')
+        options, args = admit.call_args[0][4], admit.call_args[0][6]
+        self.assertEqual((options, args), ({'max_workers': 8}, ('run-1', 'any-group', 8)))
+
+
+class GroupWorkerPoolTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = run_status_store.MemoryRunStatusStore()
+        self.store.create(run_status_store.GROUP_RUNS, 'run-1', {"executed_count": 0})
+        patcher = mock.patch.object(services, 'get_run_status_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.started = []
+
+    def _items(self, orders):
+        return [
+            {'id': f'tc{n}', 'execution_order': order, 'detail': {'test_name': f'Test {n}'}}
+            for n, order in enumerate(orders)
+        ]
+
+    def _fake_run(self, test_case_id, **kwargs):
+        with self.lock:
+            self.started.append(test_case_id)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        # Earlier tests take longer, so they finish after later ones.
+        time.sleep(0.05 if test_case_id == 'tc0' else 0.01)
+        with self.lock:
+            self.running -= 1
+        return {'status': 'PASS', 'test_case_id': test_case_id, 'thread': threading.current_thread().name}
+
+    def _run(self, items, max_workers):
+        with mock.patch.object(services, 'run_adhoc_test_logic', side_effect=self._fake_run):
+            return services._run_group_test_cases('run-1', 'g1', items, max_workers)
+
+    def test_pool_is_bounded_and_results_keep_execution_order(self):
+        results = self._run(self._items([1, 2, 3, 4, 5, 6]), max_workers=3)
+        self.assertEqual([res['test_case_id'] for res in results], [f'tc{n}' for n in range(6)])
+        self.assertLessEqual(self.peak, 3)
+        self.assertGreater(self.peak, 1)
+        self.assertEqual(self.started[:3], ['tc0', 'tc1', 'tc2'])
+
+    def test_lower_execution_order_starts_first(self):
+        self._run(self._items([9, 1, 2, 5]), max_workers=2)
+        self.assertEqual(set(self.started[:2]), {'tc1', 'tc2'})
+        self.assertEqual(self.started[-1], 'tc0')
+
+    def test_single_worker_runs_on_the_calling_thread(self):
+        results = self._run(self._items([1, 2]), max_workers=1)
+        self.assertEqual({res['thread'] for res in results}, {threading.current_thread().name})
+        self.assertEqual(self.peak, 1)
+
+    def test_progress_and_events_cover_every_test(self):
+        items = self._items([1, 2, 3, 4])
+        with mock.patch.object(services, 'run_adhoc_test_logic', side_effect=[
+            {'status': 'PASS'}, OperationalError('down'), {'status': 'FAIL'}, {'status': 'PASS'},
+        ]):
+            results = services._run_group_test_cases('run-1', 'g1', items, 1)
+        self.assertEqual([res['status'] for res in results], ['PASS', 'ERROR', 'FAIL', 'PASS'])
+        self.assertEqual(self.store.get(run_status_store.GROUP_RUNS, 'run-1')['executed_count'], 4)
+        events = [event for _, event, _ in self.store.get_events(run_status_store.GROUP_RUNS, 'run-1')]
+        self.assertEqual(events, ['test_started', 'test_finished'] * 4)
+
+
+class RunTimestampTests(SimpleTestCase):
+    def test_logged_results_carry_aware_timestamps(self):
+        with mock.patch.object(services, 'get_project', return_value=None), \
+                mock.patch.object(services, 'record_result', return_value=True) as record:
+            services.log_test_case_result_orm(
+                'run-1', 'tc1', 'p1', 'Orders total', 'Aggregation Comparison', 'PASS', 'ok',
+                1, 1, 0, 'Absolute', 0, 'q1', 'q2', 'DEV', 'Power BI'
+            )
+        self.assertTrue(timezone.is_aware(record.call_args[0][1]['run_timestamp']))
+
+    def test_naive_and_aware_timestamps_compare(self):
+        aware = timezone.now()
+        naive = timezone.make_naive(aware) - timedelta(minutes=5)
+        self.assertTrue(latest_status._is_older(naive, aware))
+        self.assertFalse(latest_status._is_older(aware, naive))
+
+    def test_refresh_keeps_the_newest_of_mixed_rows(self):
+        newer = timezone.now()
+        older = timezone.make_naive(newer) - timedelta(minutes=5)
+        with mock.patch.object(latest_status, 'TestCaseLatestStatus') as model:
+            model.objects.using.return_value.in_bulk.return_value = {}
+            latest_status.refresh_latest_test_case_statuses([
+                {'test_case_id': 'tc1', 'run_id': 'run-2', 'run_timestamp': newer},
+                {'test_case_id': 'tc1', 'run_id': 'run-1', 'run_timestamp': older},
+            ])
+        created = model.call_args.kwargs
+        self.assertEqual((created['run_id'], created['run_timestamp']), ('run-2', newer))
+
+
+class BufferedLogWriterTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        for target, attribute in ((log_writer, 'transaction'), (log_writer, 'refresh_latest_test_case_statuses'),
+                                  (log_writer, 'invalidate_metadata')):
+            patcher = mock.patch.object(target, attribute)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(TestCaseLog, 'objects')
+        self.objects = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bulk_create = self.objects.using.return_value.bulk_create
+
+    def _add(self, writer, run_id):
+        writer.add_test_case_log(run_id=run_id, test_case_id='tc1', run_status='PASS')
+
+    def test_flushes_when_max_rows_are_buffered(self):
+        writer = BufferedLogWriter(max_rows=3, flush_interval=3600)
+        for n in range(2):
+            self._add(writer, f'run-{n}')
+        self.bulk_create.assert_not_called()
+        self._add(writer, 'run-2')
+        self.assertEqual([log.run_id for log in self.bulk_create.call_args[0][0]], ['run-0', 'run-1', 'run-2'])
+        self.assertEqual(writer.stats(), {"rows_written": 3, "flushes": 1, "fallbacks": 0})
+
+    def test_flushes_when_the_interval_has_passed(self):
+        writer = BufferedLogWriter(max_rows=100, flush_interval=60)
+        self._add(writer, 'run-0')
+        self.bulk_create.assert_not_called()
+        writer._last_flush -= 61
+        self._add(writer, 'run-1')
+        self.assertEqual(len(self.bulk_create.call_args[0][0]), 2)
+
+    def test_rows_keep_their_own_run_timestamp(self):
+        writer = BufferedLogWriter(max_rows=100, flush_interval=3600)
+        self._add(writer, 'run-0')
+        stamped = writer._logs[0].run_timestamp
+        writer.flush()
+        self.assertIs(self.bulk_create.call_args[0][0][0].run_timestamp, stamped)
+        self.assertTrue(timezone.is_aware(stamped))
+
+    def test_failed_bulk_insert_falls_back_to_single_rows(self):
+        self.bulk_create.side_effect = OperationalError('bulk insert failed')
+        writer = BufferedLogWriter(max_rows=100, flush_interval=3600)
+        for n in range(3):
+            self._add(writer, f'run-{n}')
+        saved = []
+
+        def save(log_entry, **kwargs):
+            if log_entry.run_id == 'run-1':
+                raise OperationalError('bad row')
+            saved.append(log_entry.run_id)
+
+        with mock.patch.object(TestCaseLog, 'save', autospec=True, side_effect=save):
+            writer.flush()
+        self.assertEqual(saved, ['run-0', 'run-2'])
+        self.assertEqual(writer.stats(), {"rows_written": 2, "flushes": 1, "fallbacks": 1})
+
+    def test_status_updates_are_set_based(self):
+        writer = BufferedLogWriter(max_rows=100, flush_interval=3600)
+        for test_case_id, status in (('tc1', 'PASS'), ('tc2', 'FAIL'), ('tc3', 'PASS'), ('tc2', 'PASS')):
+            writer.set_test_case_status(test_case_id, status)
+        with mock.patch.object(log_writer, 'TestCase') as test_case:
+            writer.flush()
+        test_case.objects.using.return_value.filter.assert_called_once_with(test_case_id__in=['tc1', 'tc2', 'tc3'])
+
+    def test_journal_drain_uses_the_bulk_path_once_per_row(self):
+        with mock.patch.object(result_journal, 'write_test_case_logs') as write_logs, \
+                mock.patch.object(result_journal, 'refresh_latest_test_case_statuses') as refresh:
+            self.objects.using.return_value.filter.return_value.values_list.return_value = ['run-0']
+            result_journal._write_test_case_logs([
+                {'run_id': 'run-0', 'test_case_id': 'tc1'}, {'run_id': 'run-1', 'test_case_id': 'tc1'},
+            ])
+        self.assertEqual([log.run_id for log in write_logs.call_args[0][0]], ['run-1'])
+        self.assertEqual(refresh.call_args[0][0], [{'run_id': 'run-0', 'test_case_id': 'tc1'}])
+
+
+class AggregationSideQueryTests(SimpleTestCase):
+    def _keyed_query(self, config, prefix):
+        with mock.patch.object(test_case_manager, 'execute_query_to_dataframe', return_value=(pd.DataFrame(), None)), \
+                mock.patch.object(test_case_manager, 'PowerBIConnector') as connector:
+            connector.return_value._execute_dax_query.return_value = pd.DataFrame()
+            result, _ = TestCaseProcessor()._fetch_aggregation_side_frame(config, prefix)
+        return result[f'{prefix}_query']
+
+    def test_keyed_sides_run_the_same_query_as_scalar_sides(self):
+        config = _aggregation_config(
+            source_group_by_column='REGION', destination_group_by_column='Orders[Region]',
+            source_additional_filters="STATUS = 'OPEN'",
+        )
+        processor = TestCaseProcessor()
+        for prefix in ('source', 'destination'):
+            self.assertEqual(self._keyed_query(config, prefix), processor.build_aggregation_side_query(config, prefix))
+
+    def test_custom_queries_are_used_as_given(self):
+        config = _aggregation_config(
+            source_custom_sql='SELECT REGION, SUM(AMOUNT) FROM SALES.ORDERS GROUP BY REGION',
+            destination_dax_query=' EVALUATE SUMMARIZECOLUMNS(Orders[Region]) ',
+        )
+        self.assertIn('GROUP BY REGION', self._keyed_query(config, 'source'))
+        self.assertEqual(self._keyed_query(config, 'destination'), 'EVALUATE SUMMARIZECOLUMNS(Orders[Region])')
+
+
+class MetadataCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reads = []
+        self.versions = {}
+
+        def read(model, pk):
+            self.reads.append((model.__name__, pk))
+            version = self.versions.get(pk, 1)
+            return model(pk=pk, project_name=f'{pk} v{version}') if model is Project else model(pk=pk)
+
+        patcher = mock.patch.object(metadata_cache, '_read', side_effect=read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        metadata_cache.clear_metadata_cache()
+        self.addCleanup(metadata_cache.clear_metadata_cache)
+
+    def test_reads_outside_a_run_share_the_ttl_cache(self):
+        self.assertEqual(get_project('p1').project_name, 'p1 v1')
+        get_project('p1')
+        self.assertEqual(self.reads, [('Project', 'p1')])
+
+    @override_settings(EAGLE_METADATA_CACHE_TTL_SECONDS=0)
+    def test_zero_ttl_disables_the_shared_cache(self):
+        get_project('p1')
+        get_project('p1')
+        self.assertEqual(len(self.reads), 2)
+
+    def test_entries_expire_after_the_ttl(self):
+        with override_settings(EAGLE_METADATA_CACHE_TTL_SECONDS=-1):
+            metadata_cache._shared[Project].set('p1', None)
+        get_project('p1')
+        self.assertEqual(self.reads, [('Project', 'p1')])
+
+    def test_test_cases_are_never_cached_outside_a_run(self):
+        get_test_case('tc1')
+        get_test_case('tc1')
+        self.assertEqual(len(self.reads), 2)
+
+    def test_save_signal_and_invalidate_drop_the_shared_entry(self):
+        get_project('p1')
+        self.versions['p1'] = 2
+        post_save.send(sender=Project, instance=Project(pk='p1'), created=False)
+        self.assertEqual(get_project('p1').project_name, 'p1 v2')
+        self.versions['p1'] = 3
+        invalidate_metadata(Project, 'p1')
+        self.assertEqual(get_project('p1').project_name, 'p1 v3')
+        self.assertEqual(len(self.reads), 3)
+
+    def test_a_run_reads_fresh_rows_once(self):
+        get_project('p1')
+        self.versions['p1'] = 2
+        with activate_metadata_snapshot(MetadataSnapshot()):
+            self.assertEqual(get_project('p1').project_name, 'p1 v2')
+            get_project('p1')
+            get_test_case('tc1')
+            get_test_case('tc1')
+        self.assertEqual(self.reads, [('Project', 'p1'), ('Project', 'p1'), ('TestCase', 'tc1')])
+        # The run's read refreshed the shared cache for later log writes.
+        self.assertEqual(get_project('p1').project_name, 'p1 v2')
+        self.assertEqual(len(self.reads), 3)
+
+    def test_snapshot_is_scoped_to_the_thread_and_the_run(self):
+        snapshot = MetadataSnapshot()
+        with activate_metadata_snapshot(snapshot):
+            get_test_case('tc1')
+            other_thread = threading.Thread(target=get_test_case, args=('tc1',))
+            other_thread.start()
+            other_thread.join()
+        with activate_metadata_snapshot(snapshot):
+            get_test_case('tc1')
+        with activate_metadata_snapshot(MetadataSnapshot()):
+            get_test_case('tc1')
+        self.assertIsNone(metadata_cache.get_active_metadata_snapshot())
+        self.assertEqual(self.reads, [('TestCase', 'tc1')] * 3)
+
+    def test_invalidate_during_a_run_rereads_the_row(self):
+        with activate_metadata_snapshot(MetadataSnapshot()):
+            get_project('p1')
+            self.versions['p1'] = 2
+            invalidate_metadata(Project, 'p1')
+            self.assertEqual(get_project('p1').project_name, 'p1 v2')
+            get_test_case('tc1')
+            invalidate_metadata(TestCase, 'tc1')
+            get_test_case('tc1')
+        self.assertEqual(len(self.reads), 4)
+
+
+class RunStatusBackendTests(TempSQLiteMixin, SimpleTestCase):
+    setting = 'EAGLE_RUN_STATUS_PATH'
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(run_status_store, '_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(EAGLE_RUN_STATUS_BACKEND='memory', EAGLE_RUN_EXECUTION='queue')
+    def test_memory_backend_is_refused_under_queue_execution(self):
+        with self.assertRaises(ImproperlyConfigured):
+            run_status_store.get_run_status_store()
+
+    @override_settings(EAGLE_RUN_STATUS_BACKEND='memory', EAGLE_RUN_EXECUTION='thread')
+    def test_memory_backend_works_with_thread_execution(self):
+        self.assertIsInstance(run_status_store.get_run_status_store(), run_status_store.MemoryRunStatusStore)
+
+    @override_settings(EAGLE_RUN_STATUS_BACKEND='sqlite', EAGLE_RUN_EXECUTION='queue')
+    def test_sqlite_backend_works_with_queue_execution(self):
+        self.assertIsInstance(run_status_store.get_run_status_store(), run_status_store.SQLiteRunStatusStore)
+
+
+class RunFinalizationTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.statuses = {}
+        patches = {
+            '_publish_run_event': mock.Mock(side_effect=lambda kind, run_id, event, **data: self.events.append((event, data))),
+            '_update_group_run_status': mock.Mock(side_effect=lambda run_id, **fields: self.statuses.update(fields)),
+            '_update_project_run_status': mock.Mock(side_effect=lambda run_id, **fields: self.statuses.update(fields)),
+            'log_test_group_status_orm': mock.Mock(),
+            'log_project_status_orm': mock.Mock(),
+            'get_project': mock.Mock(return_value=None),
+            'TestGroup': mock.Mock(),
+            'Project': mock.Mock(),
+        }
+        for name, replacement in patches.items():
+            patcher = mock.patch.object(services, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run_group(self):
+        services._execute_group_run('run-1', 'g1', 1, services._new_run_query_cache(), BufferedLogWriter())
+
+    def test_missing_group_completes_once_with_error(self):
+        with mock.patch.object(services, 'get_test_group_details_from_db', return_value=None):
+            self._run_group()
+        self.assertEqual(self.events, [('completed', {'status': 'ERROR', 'message': 'Group not found.'})])
+        self.assertEqual(self.statuses['final_status'], 'ERROR')
+        services.log_test_group_status_orm.assert_not_called()
+
+    def test_group_lookup_error_completes_once_with_error(self):
+        with mock.patch.object(services, 'get_test_group_details_from_db', side_effect=OperationalError('down')):
+            self._run_group()
+        self.assertEqual([event for event, _ in self.events], ['completed'])
+        self.assertIn('down', self.events[0][1]['message'])
+
+    def test_failure_after_loading_still_writes_the_final_status(self):
+        group = {'name': 'Orders', 'project_id': 'p1'}
+        with mock.patch.object(services, 'get_test_group_details_from_db', return_value=group), \
+                mock.patch.object(services, 'get_group_execution_plan', side_effect=OperationalError('down')):
+            self._run_group()
+        final_log = services.log_test_group_status_orm.call_args.kwargs
+        self.assertEqual((final_log['group_name'], final_log['status']), ('Orders', 'ERROR'))
+        self.assertEqual(self.events[-1][0], 'completed')
+        self.assertEqual(self.statuses['final_status'], 'ERROR')
+
+    def test_missing_project_completes_once_with_error(self):
+        with mock.patch.object(services, 'get_project_from_db', return_value=None):
+            services._execute_project_in_background('run-1', 'p1')
+        self.assertEqual(self.events, [('completed', {'status': 'ERROR', 'message': 'Project not found.'})])
+        services.log_project_status_orm.assert_not_called()
+
+    def test_project_lookup_error_completes_once_with_error(self):
+        with mock.patch.object(services, 'get_project_from_db', side_effect=OperationalError('down')):
+            services._execute_project_in_background('run-1', 'p1')
+        self.assertEqual([event for event, _ in self.events], ['completed'])
+        self.assertEqual(self.statuses['final_status'], 'ERROR')
+
+
+class ProjectSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = run_status_store.MemoryRunStatusStore()
+        self.store.create(run_status_store.PROJECT_RUNS, 'run-1', {"executed_count": 0})
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        patches = {
+            'get_run_status_store': mock.Mock(return_value=self.store),
+            '_project_group_executor': executor,
+            'get_project_from_db': mock.Mock(return_value={'name': 'Sales'}),
+            'get_test_groups_for_project_from_db': mock.Mock(return_value=[
+                {'id': 'g3', 'name': 'Third', 'execution_order': 3},
+                {'id': 'g1', 'name': 'First', 'execution_order': 1},
+                {'id': 'g2', 'name': 'Second', 'execution_order': 2},
+            ]),
+            '_execute_group_in_background': mock.Mock(side_effect=self._fake_group_run),
+            '_get_group_max_workers': mock.Mock(return_value=1),
+            'log_project_status_orm': mock.Mock(),
+            'Project': mock.Mock(),
+        }
+        for name, replacement in patches.items():
+            patcher = mock.patch.object(services, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.outcomes = {'g1': 'PASS', 'g2': 'FAIL', 'g3': 'PASS'}
+
+    def _fake_group_run(self, group_run_id, group_id, max_workers, query_cache, log_writer):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        # The first group is the slowest, so groups finish out of order.
+        time.sleep(0.1 if group_id == 'g1' else 0.02)
+        with self.lock:
+            self.running -= 1
+        outcome = self.outcomes[group_id]
+        if outcome == 'RAISE':
+            raise OperationalError('down')
+        self.store.update(run_status_store.GROUP_RUNS, group_run_id, status="COMPLETED", final_status=outcome,
+                          failed_tests=int(outcome == 'FAIL'), total_test_cases=2)
+
+    def _status(self):
+        return self.store.get(run_status_store.PROJECT_RUNS, 'run-1')
+
+    def test_groups_run_concurrently_under_the_cap(self):
+        started = time.perf_counter()
+        services._execute_project_in_background('run-1', 'p1')
+        self.assertEqual(self.peak, 2)
+        # Completion is signalled through futures; there is no per-group polling delay.
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_results_keep_execution_order_and_roll_up(self):
+        services._execute_project_in_background('run-1', 'p1')
+        status = self._status()
+        self.assertEqual([res['test_group_id'] for res in status['results']], ['g1', 'g2', 'g3'])
+        self.assertEqual((status['status'], status['final_status'], status['failed_groups']), ('COMPLETED', 'FAIL', 1))
+        self.assertEqual(status['executed_count'], 3)
+        events = [event for _, event, _ in self.store.get_events(run_status_store.PROJECT_RUNS, 'run-1')]
+        self.assertEqual((events[0], events[-1]), ('started', 'completed'))
+        self.assertEqual(events.count('group_started'), 3)
+        self.assertEqual(events.count('group_finished'), 3)
+
+    def test_a_failing_group_does_not_stop_the_others(self):
+        self.outcomes['g2'] = 'RAISE'
+        services._execute_project_in_background('run-1', 'p1')
+        status = self._status()
+        self.assertEqual([res['status'] for res in status['results']], ['PASS', 'ERROR', 'PASS'])
+        self.assertEqual(status['final_status'], 'ERROR')
+
+
+class ConcurrentSidesTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.seen_caches = []
+        connector = mock.patch.object(test_case_manager, 'PowerBIConnector')
+        self.connector = connector.start()
+        self.addCleanup(connector.stop)
+        self.connector.return_value._execute_dax_query.side_effect = self._destination
+        rows = mock.patch.object(test_case_manager, 'execute_query_rows', side_effect=self._source)
+        rows.start()
+        self.addCleanup(rows.stop)
+
+    def _source(self, conn_name, query, max_rows=None):
+        # Both sides must be in flight at once to pass the barrier.
+        self.barrier.wait()
+        self.seen_caches.append(get_active_query_cache())
+        return ['TOTAL'], [(100,)], False, None
+
+    def _destination(self, workspace_id, dataset_id, query):
+        self.barrier.wait()
+        return pd.DataFrame({'[Value]': [100]})
+
+    def test_both_sides_run_at_once_and_are_timed(self):
+        result = TestCaseProcessor()._execute_snowflake_to_powerbi_aggregation_test_logic(_aggregation_config())
+        self.assertEqual((result['status'], result['source_value'], result['destination_value']), ('PASS', 100, 100))
+        self.assertIsInstance(result['source_elapsed_ms'], float)
+        self.assertIsInstance(result['destination_elapsed_ms'], float)
+
+    def test_source_side_runs_with_the_callers_query_cache(self):
+        cache = RunQueryCache()
+        with activate_query_cache(cache):
+            TestCaseProcessor()._execute_snowflake_to_powerbi_aggregation_test_logic(_aggregation_config())
+        self.assertEqual(self.seen_caches, [cache])
+
+    def test_a_failing_side_marks_the_test_as_error(self):
+        self.barrier = threading.Barrier(1)
+        self.connector.return_value._execute_dax_query.side_effect = RuntimeError('quota exceeded')
+        result = TestCaseProcessor()._execute_snowflake_to_powerbi_aggregation_test_logic(_aggregation_config())
+        self.assertEqual(result['status'], 'ERROR')
+        self.assertIn('quota exceeded', result['message'])
+        self.assertEqual(result['source_value'], 100)
+
+
+def _drift_config(**overrides):
+    config = {
+        'test_type': 'Drift Test', 'source_connection_source': 'DEV', 'source_schema': 'SALES',
+        'source_table': 'ORDERS', 'source_date_column': 'ORDER_DATE',
+        'source_aggregation_type': 'SUM', 'source_aggregation_column': 'AMOUNT',
+        'threshold': 10, 'threshold_type': 'ABSOLUTE',
+    }
+    config.update(overrides)
+    return config
+
+
+class DriftQueryTests(SimpleTestCase):
+    db_config = {'NAME': 'ANALYTICS', 'schema': 'SALES'}
+
+    def test_one_scan_returns_both_days(self):
+        query = build_drift_aggregation_query(self.db_config, 'ORDERS', 'ORDER_DATE', 'CURRENT_DATE()', '2024-05-16', 'SUM', 'AMOUNT')
+        self.assertEqual(query.count('FROM '), 1)
+        self.assertIn("FROM ANALYTICS.SALES.ORDERS WHERE TO_DATE(ORDER_DATE) IN (CURRENT_DATE(), TO_DATE('2024-05-16', 'YYYY-MM-DD'))", query)
+        self.assertIn("SUM(CASE WHEN TO_DATE(ORDER_DATE) = CURRENT_DATE() THEN AMOUNT END) AS CURRENT_VALUE", query)
+        self.assertIn("SUM(CASE WHEN TO_DATE(ORDER_DATE) = TO_DATE('2024-05-16', 'YYYY-MM-DD') THEN AMOUNT END) AS PREVIOUS_VALUE", query)
+
+    def test_count_star_counts_rows_per_day(self):
+        query = build_drift_aggregation_query(self.db_config, 'ORDERS', 'ORDER_DATE', 'CURRENT_DATE()', '2024-05-16', 'COUNT(*)', None)
+        self.assertIn("COUNT(CASE WHEN TO_DATE(ORDER_DATE) = CURRENT_DATE() THEN 1 END) AS CURRENT_VALUE", query)
+
+    def test_filters_are_applied_to_both_days(self):
+        query = build_drift_aggregation_query(
+            self.db_config, 'ORDERS', 'ORDER_DATE', 'CURRENT_DATE()', '2024-05-16', 'MAX', 'AMOUNT', "REGION = 'EU'"
+        )
+        self.assertIn("AND (REGION = 'EU');", query)
+
+    def test_invalid_configs_raise(self):
+        with self.assertRaises(ValueError):
+            build_drift_aggregation_query(self.db_config, 'ORDERS', None, 'CURRENT_DATE()', '2024-05-16', 'SUM', 'AMOUNT')
+        with self.assertRaises(ValueError):
+            build_drift_aggregation_query(self.db_config, 'ORDERS', 'ORDER_DATE', 'CURRENT_DATE()', '2024-05-16', 'SUM', None)
+        with self.assertRaises(ValueError):
+            build_drift_aggregation_query({'NAME': 'ANALYTICS'}, 'ORDERS', 'ORDER_DATE', 'CURRENT_DATE()', '2024-05-16', 'SUM', 'AMOUNT')
+
+
+class DriftTestLogicTests(SimpleTestCase):
+    def _run(self, rows, config=None):
+        with mock.patch.object(test_case_manager, 'execute_query_first_row', side_effect=rows) as execute:
+            result = TestCaseProcessor()._execute_drift_test_logic(config or _drift_config())
+        return result, execute
+
+    def test_single_query_mode_reads_both_values_from_one_row(self):
+        result, execute = self._run([((Decimal('120'), Decimal('115')), None)])
+        self.assertEqual(execute.call_count, 1)
+        self.assertEqual((result['source_value'], result['destination_value']), (Decimal('120'), Decimal('115')))
+        self.assertEqual(result['source_query'], result['destination_query'])
+        self.assertEqual(result['status'], 'PASS')
+
+    def test_drift_over_threshold_fails(self):
+        result, _ = self._run([((150, 100), None)])
+        self.assertEqual(result['status'], 'FAIL')
+
+    def test_query_error_is_reported(self):
+        result, _ = self._run([(None, 'warehouse suspended')])
+        self.assertEqual((result['source_value'], result['destination_value']), (None, None))
+        self.assertIn('warehouse suspended', result['source_error'])
+
+    @override_settings(EAGLE_DRIFT_SINGLE_QUERY=False)
+    def test_two_query_mode_is_kept_behind_the_setting(self):
+        result, execute = self._run([((120,), None), ((115,), None)])
+        self.assertEqual(execute.call_count, 2)
+        self.assertEqual((result['source_value'], result['destination_value']), (120, 115))
+
+
+def _powerbi_config(aggregation_type='SUM', aggregation_column='Amount', **overrides):
+    config = _aggregation_config(
+        source_table='CUSTOMERS', destination_aggregation_type=aggregation_type,
+        destination_aggregation_column=aggregation_column,
+        destination_workspace_id='ws-1', destination_dataset_id='ds-1',
+    )
+    config.update(overrides)
+    return config
+
+
+class DaxFusionTests(SimpleTestCase):
+    def _dax_entries(self, configs):
+        return [entry for entry in plan_fused_aggregation_queries(configs) if entry['connection'] == 'Power BI']
+
+    def test_fused_query_returns_expressions_in_order(self):
+        query = build_fused_dax_query_powerbi(['COUNTROWS(Orders)', 'SUM(Orders[Amount])'])
+        self.assertEqual(query, 'EVALUATE\nROW(\n    "V0", COUNTROWS(Orders),\n    "V1", SUM(Orders[Amount])\n)')
+        with self.assertRaises(ValueError):
+            build_fused_dax_query_powerbi([])
+
+    def test_scalar_expression_matches_the_standalone_query(self):
+        kwargs = dict(table='Orders', date_column='Order Date', date_value='2024-05-16',
+                      aggregation_type='SUM', aggregation_column='Amount', additional_filters="Orders[Region] = \"EU\"")
+        expression = build_dax_scalar_expression_powerbi(**kwargs)
+        self.assertIn(f'VAR __value = {expression}', build_dynamic_dax_query_powerbi(**kwargs))
+        self.assertEqual(
+            expression,
+            "CALCULATE(SUM(Orders[Amount]), FILTER(Orders, Orders['Order Date'] = DATEVALUE(\"2024-05-16\")"
+            " && Orders[Region] = \"EU\"))"
+        )
+
+    def test_sides_on_the_same_dataset_share_one_query(self):
+        entries = self._dax_entries({
+            'tc1': _powerbi_config('SUM', 'Amount'),
+            'tc2': _powerbi_config('COUNT', None),
+            'tc3': _powerbi_config('SUM', 'Amount'),
+        })
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual((entry['workspace_id'], entry['dataset_id'], entry['column_prefix']), ('ws-1', 'ds-1', 'V'))
+        self.assertEqual(entry['members'], [('tc1', 'destination', 0), ('tc2', 'destination', 1), ('tc3', 'destination', 0)])
+        self.assertNotIn('"V2"', entry['query'])
+        processor = TestCaseProcessor()
+        self.assertEqual(
+            entry['member_queries'][('tc2', 'destination')],
+            processor.build_aggregation_side_query(_powerbi_config('COUNT', None), 'destination')
+        )
+
+    def test_unfusible_power_bi_sides_are_left_out(self):
+        self.assertEqual(self._dax_entries({
+            'tc1': _powerbi_config(),
+            'other_dataset': _powerbi_config(destination_dataset_id='ds-2'),
+            'custom': _powerbi_config(destination_dax_query='EVALUATE ROW("Value", 1)'),
+            'grouped': _powerbi_config(destination_group_by_column='Orders[Region]'),
+            'no_dataset': _powerbi_config(destination_dataset_id=''),
+        }), [])
+
+    @override_settings(EAGLE_POWERBI_MAX_FUSED_EXPRESSIONS=2)
+    def test_large_batches_are_split(self):
+        entries = self._dax_entries({
+            f'tc{n}': _powerbi_config(aggregation, 'Amount')
+            for n, aggregation in enumerate(('SUM', 'MIN', 'MAX', 'AVG'))
+        })
+        self.assertEqual([len(entry['members']) for entry in entries], [2, 2])
+        self.assertEqual(entries[1]['members'], [('tc2', 'destination', 0), ('tc3', 'destination', 1)])
+
+    def test_values_map_back_to_their_test_cases(self):
+        plan = self._dax_entries({'tc1': _powerbi_config('SUM', 'Amount'), 'tc2': _powerbi_config('COUNT', None)})
+        with mock.patch('dq_management.query_fusion.PowerBIConnector') as connector:
+            connector.return_value._execute_dax_query.return_value = pd.DataFrame({'[V0]': [250.5], '[V1]': [12]})
+            prefetched = execute_fused_aggregation_plan(plan)
+        connector.return_value._execute_dax_query.assert_called_once_with('ws-1', 'ds-1', plan[0]['query'])
+        self.assertEqual(prefetched['tc1']['destination']['value'], 250.5)
+        self.assertEqual(prefetched['tc2']['destination']['value'], 12)
+        self.assertEqual(prefetched['tc2']['destination']['column'], 'V1')
+        self.assertEqual(prefetched['tc2']['destination']['query'], plan[0]['member_queries'][('tc2', 'destination')])
+
+    def test_failed_fused_dax_query_falls_back(self):
+        plan = self._dax_entries({'tc1': _powerbi_config('SUM', 'Amount'), 'tc2': _powerbi_config('COUNT', None)})
+        with mock.patch('dq_management.query_fusion.PowerBIConnector') as connector:
+            connector.return_value._execute_dax_query.side_effect = RuntimeError('429')
+            self.assertEqual(execute_fused_aggregation_plan(plan), {})
+
+
+POWERBI_CREDENTIALS = {'client_id': 'client', 'tenant_id': 'tenant', 'client_secret': 'secret'}
+
+
+@override_settings(POWERBI_CREDENTIALS=POWERBI_CREDENTIALS, POWERBI_TOKEN_REFRESH_MARGIN_SECONDS=300)
+class PowerBITokenProviderTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(powerbi_connector._token_providers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(powerbi_connector.msal, 'ConfidentialClientApplication')
+        self.msal_app = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.tokens = iter(f'token-{n}' for n in range(100))
+        self.msal_app.acquire_token_for_client.side_effect = (
+            lambda scopes: {'access_token': next(self.tokens), 'expires_in': 3600}
+        )
+        self.provider = powerbi_connector.get_powerbi_token_provider(POWERBI_CREDENTIALS)
+
+    def test_token_is_reused_until_close_to_expiry(self):
+        self.assertEqual(self.provider.get_token(), 'token-0')
+        self.assertEqual(self.provider.get_token(), 'token-0')
+        self.provider._expires_at = time.monotonic() + 200
+        self.assertEqual(self.provider.get_token(), 'token-1')
+        self.assertEqual(self.msal_app.acquire_token_for_client.call_count, 2)
+
+    def test_connectors_share_one_provider_per_credential_set(self):
+        first, second = powerbi_connector.PowerBIConnector(), powerbi_connector.PowerBIConnector()
+        self.assertIs(first.token_provider, self.provider)
+        self.assertIs(second.token_provider, self.provider)
+        self.assertEqual(self.msal_app.acquire_token_for_client.call_count, 1)
+        other = powerbi_connector.get_powerbi_token_provider(dict(POWERBI_CREDENTIALS, client_id='other'))
+        self.assertIsNot(other, self.provider)
+
+    def test_incomplete_credentials_are_rejected(self):
+        with self.assertRaises(ValueError):
+            powerbi_connector.get_powerbi_token_provider(dict(POWERBI_CREDENTIALS, client_secret=''))
+
+    def test_concurrent_refresh_is_single_flight(self):
+        def slow_acquire(scopes):
+            time.sleep(0.05)
+            return {'access_token': next(self.tokens), 'expires_in': 3600}
+
+        self.msal_app.acquire_token_for_client.side_effect = slow_acquire
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(self.provider.get_token())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tokens, ['token-0'] * 8)
+        self.assertEqual(self.msal_app.acquire_token_for_client.call_count, 1)
+
+    def test_failed_acquisition_raises_and_is_retried(self):
+        self.msal_app.acquire_token_for_client.side_effect = [
+            {'error_description': 'invalid client'}, {'access_token': 'token-ok', 'expires_in': 3600},
+        ]
+        with self.assertRaises(ConnectionError):
+            self.provider.get_token()
+        self.assertEqual(self.provider.get_token(), 'token-ok')
+
+    def test_invalidate_forces_a_new_token(self):
+        self.provider.get_token()
+        self.provider.invalidate()
+        self.assertEqual(self.provider.get_token(), 'token-1')
+
+
+def _response(status_code, headers=None):
+    response = mock.Mock(status_code=status_code)
+    response.headers = headers or {}
+    return response
+
+
+@override_settings(POWERBI_BACKOFF_BASE_SECONDS=1.0, POWERBI_BACKOFF_MAX_SECONDS=30.0)
+class PowerBIBackoffTests(SimpleTestCase):
+    def test_retry_after_in_seconds(self):
+        self.assertEqual(powerbi_connector._retry_after_seconds(_response(429, {'Retry-After': '7'})), 7.0)
+
+    def test_retry_after_as_http_date(self):
+        from email.utils import format_datetime
+        retry_at = datetime.now(dt_timezone.utc) + timedelta(seconds=20)
+        delay = powerbi_connector._retry_after_seconds(_response(429, {'Retry-After': format_datetime(retry_at, usegmt=True)}))
+        self.assertTrue(15 <= delay <= 20, delay)
+
+    def test_unparseable_or_missing_retry_after_is_ignored(self):
+        self.assertIsNone(powerbi_connector._retry_after_seconds(_response(429, {'Retry-After': 'soon'})))
+        self.assertIsNone(powerbi_connector._retry_after_seconds(_response(429)))
+        self.assertIsNone(powerbi_connector._retry_after_seconds(None))
+
+    def test_retry_after_is_capped(self):
+        self.assertEqual(powerbi_connector._backoff_seconds(0, _response(429, {'Retry-After': '600'})), 30.0)
+
+    def test_jittered_backoff_stays_within_the_exponential_bound(self):
+        with mock.patch.object(powerbi_connector.random, 'uniform', side_effect=lambda low, high: high) as uniform:
+            self.assertEqual(powerbi_connector._backoff_seconds(2), 4.0)
+            self.assertEqual(powerbi_connector._backoff_seconds(10), 30.0)
+        self.assertEqual(uniform.call_args_list[0], mock.call(0, 4.0))
+
+    def test_shared_session_is_reused(self):
+        self.addCleanup(setattr, powerbi_connector, '_session', powerbi_connector._session)
+        powerbi_connector._session = None
+        self.assertIs(powerbi_connector.get_powerbi_session(), powerbi_connector.get_powerbi_session())
+
+
+@override_settings(
+    POWERBI_CREDENTIALS=POWERBI_CREDENTIALS, POWERBI_MAX_RETRIES=2, POWERBI_MAX_CONCURRENT_QUERIES_PER_DATASET=4,
+)
+class PowerBIRetryTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token_provider = mock.Mock()
+        self.token_provider.get_token.return_value = 'token'
+        patcher = mock.patch.object(powerbi_connector, 'get_powerbi_token_provider', return_value=self.token_provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = mock.Mock()
+        patcher = mock.patch.object(powerbi_connector, 'get_powerbi_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(powerbi_connector.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(powerbi_connector._dataset_semaphores, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connector = powerbi_connector.PowerBIConnector()
+
+    def _post(self):
+        return self.connector._post_with_retries('https://api.example/executeQueries', 'dataset', {'queries': []})
+
+    def test_throttled_request_waits_for_retry_after(self):
+        self.session.post.side_effect = [_response(429, {'Retry-After': '3'}), _response(200)]
+        self.assertEqual(self._post().status_code, 200)
+        self.sleep.assert_called_once_with(3.0)
+
+    def test_gives_up_after_max_retries_and_returns_last_response(self):
+        self.session.post.side_effect = [_response(503), _response(503), _response(503), _response(200)]
+        self.assertEqual(self._post().status_code, 503)
+        self.assertEqual(self.session.post.call_count, 3)
+
+    def test_client_errors_are_not_retried(self):
+        self.session.post.return_value = _response(400)
+        self.assertEqual(self._post().status_code, 400)
+        self.assertEqual(self.session.post.call_count, 1)
+
+    def test_unauthorized_refreshes_token_once(self):
+        self.session.post.side_effect = [_response(401), _response(401), _response(200)]
+        self.assertEqual(self._post().status_code, 401)
+        self.token_provider.invalidate.assert_called_once_with()
+        self.assertEqual(self.session.post.call_count, 2)
+        self.sleep.assert_not_called()
+
+    def test_connection_errors_are_retried_then_raised(self):
+        error = powerbi_connector.requests.exceptions.ConnectionError('reset')
+        self.session.post.side_effect = [error, _response(200)]
+        self.assertEqual(self._post().status_code, 200)
+        self.session.post.side_effect = [error, error, error]
+        with self.assertRaises(powerbi_connector.requests.exceptions.ConnectionError):
+            self._post()
+
+    def test_dataset_semaphore_is_shared_per_dataset(self):
+        first = powerbi_connector._get_dataset_semaphore('a')
+        self.assertIs(powerbi_connector._get_dataset_semaphore('a'), first)
+        self.assertIsNot(powerbi_connector._get_dataset_semaphore('b'), first)
+        for _ in range(4):
+            self.assertTrue(first.acquire(blocking=False))
+        self.assertFalse(first.acquire(blocking=False))
+
+
+class LogUtilsTests(SimpleTestCase):
+    def test_short_text_is_unchanged(self):
+        self.assertEqual(truncate_for_log('SELECT 1'), 'SELECT 1')
+        self.assertEqual(truncate_for_log(None), '')
+
+    @override_settings(EAGLE_LOG_BODY_MAX_CHARS=10)
+    def test_long_text_is_cut_with_original_length(self):
+        self.assertEqual(truncate_for_log('x' * 25), 'xxxxxxxxxx... [truncated, 25 chars]')
+        self.assertEqual(truncate_for_log('x' * 25, max_chars=3), 'xxx... [truncated, 25 chars]')
+
+    @override_settings(EAGLE_LOG_PAYLOAD_SAMPLE_RATE=1.0)
+    def test_full_payload_requires_debug(self):
+        logger = mock.Mock()
+        logger.isEnabledFor.return_value = False
+        self.assertFalse(should_log_full_payload(logger))
+        logger.isEnabledFor.return_value = True
+        self.assertTrue(should_log_full_payload(logger))
+
+    @override_settings(EAGLE_LOG_PAYLOAD_SAMPLE_RATE=0.0)
+    def test_full_payload_is_off_by_default(self):
+        logger = mock.Mock()
+        logger.isEnabledFor.return_value = True
+        self.assertFalse(should_log_full_payload(logger))
+
+
+@override_settings(POWERBI_CREDENTIALS=POWERBI_CREDENTIALS, EAGLE_LOG_BODY_MAX_CHARS=20, EAGLE_LOG_PAYLOAD_SAMPLE_RATE=0.0)
+class PowerBIQueryLoggingTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(powerbi_connector, 'get_powerbi_token_provider')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connector = powerbi_connector.PowerBIConnector()
+
+    def _respond(self, rows, status_code=200):
+        response = _response(status_code)
+        body = {'results': [{'tables': [{'rows': rows}]}]}
+        response.json.return_value = body
+        response.text = str(body)
+        response.content = response.text.encode()
+        return response
+
+    def test_info_line_reports_size_without_body(self):
+        response = self._respond([{'[Total]': 'secret-value'}])
+        with mock.patch.object(self.connector, '_post_with_retries', return_value=response):
+            with self.assertLogs(powerbi_connector.logger, 'INFO') as logs:
+                df = self.connector._execute_dax_query_uncached('ws', 'ds', 'EVALUATE ROW("Total", 1)')
+        self.assertEqual(len(df), 1)
+        info = [line for line in logs.output if line.startswith('INFO')]
+        self.assertEqual(len(info), 1)
+        self.assertIn('rows=1', info[0])
+        self.assertIn(f'bytes={len(response.content)}', info[0])
+        self.assertNotIn('secret-value', '\n'.join(logs.output))
+
+    def test_debug_query_is_truncated_when_not_sampled(self):
+        response = self._respond([{'[Total]': 1}])
+        dax = 'EVALUATE ' + 'X' * 100
+        with mock.patch.object(self.connector, '_post_with_retries', return_value=response):
+            with self.assertLogs(powerbi_connector.logger, 'DEBUG') as logs:
+                self.connector._execute_dax_query_uncached('ws', 'ds', dax)
+        debug = '\n'.join(line for line in logs.output if line.startswith('DEBUG'))
+        self.assertIn('[truncated, 109 chars]', debug)
+        self.assertNotIn(dax, debug)
+
+    def test_error_body_is_truncated(self):
+        response = _response(500)
+        response.text = 'E' * 200
+        error = powerbi_connector.requests.exceptions.HTTPError('500 Server Error', response=response)
+        response.raise_for_status.side_effect = error
+        response.content = b''
+        with mock.patch.object(self.connector, '_post_with_retries', return_value=response):
+            with self.assertLogs(powerbi_connector.logger, 'ERROR'), self.assertRaises(RuntimeError) as ctx:
+                self.connector._execute_dax_query_uncached('ws', 'ds', 'EVALUATE T')
+        self.assertIn('[truncated, 200 chars]', str(ctx.exception))
+        self.assertNotIn('E' * 21, str(ctx.exception))
+
+
+class RunQueryCacheTests(SimpleTestCase):
+    def test_repeated_key_is_served_from_cache(self):
+        cache = RunQueryCache()
+        execute = mock.Mock(return_value='rows')
+        self.assertEqual(cache.get_or_execute('k', execute), 'rows')
+        self.assertEqual(cache.get_or_execute('k', execute), 'rows')
+        execute.assert_called_once_with()
+        self.assertEqual(cache.stats(), {'hits': 1, 'coalesced': 0, 'misses': 1})
+
+    def test_concurrent_callers_share_one_execution(self):
+        cache = RunQueryCache()
+        release = threading.Event()
+        calls = []
+
+        def execute():
+            calls.append(1)
+            release.wait(5)
+            return 'rows'
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(cache.get_or_execute, 'k', execute) for _ in range(4)]
+            deadline = time.monotonic() + 5
+            while cache.stats()['coalesced'] < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results, ['rows'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['coalesced'], 3)
+
+    def test_failures_are_raised_but_not_cached(self):
+        cache = RunQueryCache()
+        execute = mock.Mock(side_effect=[RuntimeError('boom'), 'rows'])
+        with self.assertRaises(RuntimeError):
+            cache.get_or_execute('k', execute)
+        self.assertEqual(cache.get_or_execute('k', execute), 'rows')
+        self.assertEqual(execute.call_count, 2)
+
+    def test_uncacheable_results_are_returned_but_not_kept(self):
+        cache = RunQueryCache()
+        execute = mock.Mock(return_value=(None, 'SQL execution error'))
+        for _ in range(2):
+            cache.get_or_execute('k', execute, is_cacheable=lambda outcome: outcome[1] is None)
+        self.assertEqual(execute.call_count, 2)
+
+    def test_max_entries_bounds_the_cache(self):
+        cache = RunQueryCache(max_entries=1)
+        cache.get_or_execute('a', lambda: 1)
+        cache.get_or_execute('b', lambda: 2)
+        execute = mock.Mock(return_value=2)
+        cache.get_or_execute('b', execute)
+        execute.assert_called_once_with()
+        self.assertEqual(cache.get_or_execute('a', mock.Mock()), 1)
+
+    def test_normalize_query_text(self):
+        self.assertEqual(normalize_query_text('SELECT  1\n FROM t ;'), 'SELECT 1 FROM t')
+        self.assertNotEqual(normalize_query_text("WHERE x = 'A'"), normalize_query_text("WHERE x = 'a'"))
+
+    def test_activation_is_scoped_and_nested(self):
+        outer, inner = RunQueryCache(), RunQueryCache()
+        self.assertIsNone(get_active_query_cache())
+        with activate_query_cache(outer):
+            with activate_query_cache(inner):
+                self.assertIs(get_active_query_cache(), inner)
+            self.assertIs(get_active_query_cache(), outer)
+        self.assertIsNone(get_active_query_cache())
+
+    def test_sql_queries_share_results_only_inside_a_run(self):
+        outcome = (['N'], [(1,)], False, None)
+        with mock.patch.object(dq_core, '_execute_query_rows', return_value=outcome) as execute:
+            dq_core.execute_query_rows('snowflake_dev', 'SELECT 1')
+            dq_core.execute_query_rows('snowflake_dev', 'SELECT 1')
+            self.assertEqual(execute.call_count, 2)
+            with activate_query_cache(RunQueryCache()):
+                dq_core.execute_query_rows('snowflake_dev', 'SELECT 1')
+                dq_core.execute_query_rows('snowflake_dev', 'SELECT   1;')
+                dq_core.execute_query_rows('other', 'SELECT 1')
+            self.assertEqual(execute.call_count, 4)
+
+    def test_failed_sql_outcomes_are_not_cached(self):
+        failed = ([], [], False, 'SQL execution error: timeout')
+        with mock.patch.object(dq_core, '_execute_query_rows', return_value=failed) as execute:
+            with activate_query_cache(RunQueryCache()):
+                dq_core.execute_query_rows('snowflake_dev', 'SELECT 1')
+                dq_core.execute_query_rows('snowflake_dev', 'SELECT 1')
+        self.assertEqual(execute.call_count, 2)
+
+
+class _FakeCursor:
+    def __init__(self, rows, columns=('VALUE',)):
+        self.rows = list(rows)
+        self.description = [(name,) for name in columns]
+        self.fetched = 0
+        self.executed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed = (query, params)
+
+    def fetchone(self):
+        if self.fetched >= len(self.rows):
+            return None
+        self.fetched += 1
+        return self.rows[self.fetched - 1]
+
+    def fetchmany(self, size):
+        batch = self.rows[self.fetched:self.fetched + size]
+        self.fetched += len(batch)
+        return batch
+
+
+def _patch_connection(test, cursor):
+    connection = mock.Mock()
+    connection.cursor.return_value = cursor
+    patcher = mock.patch.object(dq_core, 'connections', {'snowflake_dev': connection})
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+class ScalarFastPathTests(SimpleTestCase):
+    def test_only_the_first_row_is_fetched(self):
+        cursor = _FakeCursor([(Decimal('12.5'), 'a'), (1, 'b')])
+        _patch_connection(self, cursor)
+        row, error = dq_core.execute_query_first_row('snowflake_dev', 'SELECT SUM(x), y FROM t', ('p',))
+        self.assertIsNone(error)
+        self.assertEqual(row, (12.5, 'a'))
+        self.assertIsInstance(row[0], float)
+        self.assertEqual(cursor.fetched, 1)
+        self.assertEqual(cursor.executed, ('SELECT SUM(x), y FROM t', ('p',)))
+
+    def test_empty_result_returns_none(self):
+        _patch_connection(self, _FakeCursor([]))
+        self.assertEqual(dq_core.execute_query_first_row('snowflake_dev', 'SELECT 1'), (None, None))
+
+    def test_non_select_is_rejected_without_touching_the_database(self):
+        cursor = _FakeCursor([(1,)])
+        _patch_connection(self, cursor)
+        row, error = dq_core.execute_query_first_row('snowflake_dev', 'DELETE FROM t')
+        self.assertIsNone(row)
+        self.assertIn('Only SELECT', error)
+        self.assertIsNone(cursor.executed)
+
+    def test_database_errors_are_returned(self):
+        cursor = _FakeCursor([])
+        cursor.execute = mock.Mock(side_effect=RuntimeError('warehouse suspended'))
+        _patch_connection(self, cursor)
+        with self.assertLogs(dq_core.logger, 'ERROR'):
+            row, error = dq_core.execute_query_first_row('snowflake_dev', 'SELECT 1')
+        self.assertIsNone(row)
+        self.assertEqual(error, 'SQL execution error: warehouse suspended')
+
+    def test_first_row_value_defaults_to_zero(self):
+        self.assertEqual(dq_core.first_row_value(None), 0)
+        self.assertEqual(dq_core.first_row_value((5,), 1), 0)
+        self.assertEqual(dq_core.first_row_value((5, 7), 1), 7)
+        self.assertIsNone(dq_core.first_row_value((None,)))
+
+    def test_availability_uses_the_scalar_path(self):
+        config = _drift_config(source_aggregation_column='ID')
+        with mock.patch.object(test_case_manager, 'execute_query_first_row', return_value=((42,), None)) as first_row:
+            result = TestCaseProcessor()._execute_availability_test_logic(config)
+        self.assertEqual(result['source_value'], 42)
+        self.assertIn('COUNT(ID)', first_row.call_args.args[1])
+
+
+@override_settings(EAGLE_FETCH_BATCH_SIZE=2)
+class BoundedFetchTests(SimpleTestCase):
+    def test_fetch_stops_at_max_rows_and_flags_truncation(self):
+        cursor = _FakeCursor([(n,) for n in range(10)])
+        _patch_connection(self, cursor)
+        with self.assertLogs(dq_core.logger, 'WARNING') as logs:
+            columns, rows, truncated, error = dq_core.execute_query_rows('snowflake_dev', 'SELECT n FROM t', max_rows=5)
+        self.assertEqual((columns, rows, truncated, error), (['VALUE'], [(0,), (1,), (2,), (3,), (4,)], True, None))
+        # Five rows plus a single probe row; the rest stays on the server.
+        self.assertEqual(cursor.fetched, 6)
+        self.assertIn('truncated', logs.output[0])
+
+    def test_exact_fit_is_not_truncated(self):
+        _patch_connection(self, _FakeCursor([(n,) for n in range(5)]))
+        _, rows, truncated, _ = dq_core.execute_query_rows('snowflake_dev', 'SELECT n FROM t', max_rows=5)
+        self.assertEqual((len(rows), truncated), (5, False))
+
+    @override_settings(EAGLE_MAX_RESULT_ROWS=3)
+    def test_default_cap_comes_from_settings(self):
+        _patch_connection(self, _FakeCursor([(n,) for n in range(10)]))
+        with self.assertLogs(dq_core.logger, 'WARNING'):
+            df, error = dq_core.execute_query_to_dataframe('snowflake_dev', 'SELECT n FROM t')
+        self.assertIsNone(error)
+        self.assertEqual(list(df['VALUE']), [0, 1, 2])
+        self.assertTrue(df.attrs['truncated'])
+
+    def test_decimals_become_floats(self):
+        _patch_connection(self, _FakeCursor([(Decimal('1.5'),)]))
+        df, _ = dq_core.execute_query_to_dataframe('snowflake_dev', 'SELECT n FROM t')
+        self.assertEqual(df['VALUE'].tolist(), [1.5])
+        self.assertFalse(df.attrs['truncated'])
+
+    def test_errors_return_an_empty_frame(self):
+        df, error = dq_core.execute_query_to_dataframe('snowflake_dev', 'UPDATE t SET n = 1')
+        self.assertTrue(df.empty)
+        self.assertIn('Only SELECT', error)
+
+
+class TruncationFlagTests(SimpleTestCase):
+    def _run_scalar(self, truncated):
+        connector = mock.patch.object(test_case_manager, 'PowerBIConnector')
+        connector.start().return_value._execute_dax_query.return_value = pd.DataFrame({'[Value]': [100]})
+        self.addCleanup(connector.stop)
+        outcome = (['TOTAL'], [(100,)], truncated, None)
+        with mock.patch.object(test_case_manager, 'execute_query_rows', return_value=outcome) as rows:
+            result = TestCaseProcessor()._execute_snowflake_to_powerbi_aggregation_test_logic(_aggregation_config())
+        self.assertEqual(rows.call_args.kwargs, {'max_rows': 1})
+        return result
+
+    def test_scalar_side_notes_extra_rows(self):
+        result = self._run_scalar(True)
+        self.assertEqual(result['status'], 'PASS')
+        self.assertTrue(result['source_truncated'])
+        self.assertIn('more than one row', result['message'])
+
+    def test_scalar_side_without_extra_rows_has_no_note(self):
+        result = self._run_scalar(False)
+        self.assertFalse(result['source_truncated'])
+        self.assertNotIn('more than one row', result['message'])
+
+    def test_keyed_side_notes_truncated_groups(self):
+        frame = pd.DataFrame({'REGION': ['EU'], 'TOTAL': [10]})
+        frame.attrs['truncated'] = True
+        config = _aggregation_config(
+            destination_connection_source='DEV', destination_schema='SALES', destination_table='ORDERS',
+            source_group_by_column='REGION',
+        )
+        with mock.patch.object(test_case_manager, 'execute_query_to_dataframe', side_effect=lambda *a: (frame.copy(), None)):
+            result = TestCaseProcessor()._execute_snowflake_to_powerbi_aggregation_test_logic(config)
+        self.assertTrue(result['source_truncated'])
+        self.assertIn('source result was truncated', result['message'])
+
+
+def _test_case_row(test_case_id, **overrides):
+    fields = dict(
+        test_case_id=test_case_id, project_id='p1', test_name=f'Test {test_case_id}', test_type='Aggregation Comparison',
+        source_connection_source='DEV', destination_connection_source='Power BI', source_table='ORDERS',
+        destination_table='Orders', source_date_column='ORDER_DATE', destination_date_column='Date',
+        source_agg_type='SUM', source_agg_column='AMOUNT', destination_agg_type='SUM',
+        destination_agg_column='Amount', destination_workspace_id='ws', destination_dataset_id='ds',
+        threshold=Decimal('0'), threshold_type='ABSOLUTE',
+    )
+    fields.update(overrides)
+    return TestCase(**fields)
+
+
+class GroupExecutionPlanTests(SimpleTestCase):
+    def _plan(self, records):
+        with mock.patch.object(services.TestGroupTestCase, 'objects') as objects:
+            query = objects.using.return_value.filter.return_value.select_related.return_value.order_by
+            query.return_value = records
+            plan = services.get_group_execution_plan('g1')
+        objects.using.assert_called_once_with('snowflake_dev')
+        objects.using.return_value.filter.assert_called_once_with(test_group_id='g1')
+        objects.using.return_value.filter.return_value.select_related.assert_called_once_with('test_case')
+        query.assert_called_once_with('execution_order')
+        return plan
+
+    def test_plan_is_built_from_one_joined_query(self):
+        records = [
+            mock.Mock(test_case=_test_case_row('tc1'), execution_order=1),
+            mock.Mock(test_case=_test_case_row('tc2', source_agg_type='COUNT', source_agg_column='ID'), execution_order=2),
+        ]
+        plan = self._plan(records)
+        self.assertEqual([entry['id'] for entry in plan], ['tc1', 'tc2'])
+        self.assertEqual([entry['execution_order'] for entry in plan], [1, 2])
+        first = plan[0]
+        self.assertEqual(first['validation_errors'], [])
+        self.assertEqual(first['config']['source_aggregation_type'], 'SUM')
+        self.assertEqual(first['config']['destination_dataset_id'], 'ds')
+        self.assertEqual(first['detail']['test_case_id'], 'tc1')
+        self.assertNotIn('_state', first['detail'])
+        self.assertEqual(plan[1]['config']['source_aggregation_column'], 'ID')
+
+    def test_invalid_definition_is_reported_not_raised(self):
+        with mock.patch.object(services, '_extract_and_validate_form_data', side_effect=ValueError('bad threshold')):
+            plan = self._plan([mock.Mock(test_case=_test_case_row('tc1'), execution_order=1)])
+        self.assertIsNone(plan[0]['config'])
+        self.assertEqual(plan[0]['validation_errors'], ['Invalid test case definition: bad threshold'])
+
+    def test_preloaded_entry_skips_the_definition_lookup(self):
+        entry = {
+            'detail': {'test_case_id': 'tc1', 'project_id': 'p1', 'test_name': 'Test tc1', 'test_type': 'Aggregation Comparison'},
+            'config': {'test_type': 'Aggregation Comparison'}, 'validation_errors': [],
+        }
+        writer = mock.Mock()
+        with mock.patch.object(services, 'get_test_case_details_from_db') as details, \
+                mock.patch.object(services, '_extract_and_validate_form_data') as validate, \
+                mock.patch.object(services, 'get_project', return_value=None), \
+                mock.patch.object(services, 'record_result', return_value=True), \
+                mock.patch.object(services, 'TestCaseProcessor') as processor:
+            processor.return_value.process_test_request.return_value = {'status': 'PASS', 'message': 'ok'}
+            result = services.run_adhoc_test_logic('tc1', log_writer=writer, preloaded=entry)
+        details.assert_not_called()
+        validate.assert_not_called()
+        self.assertIs(processor.return_value.process_test_request.call_args.args[0], entry['config'])
+        self.assertEqual(result['status'], 'PASS')
+        writer.set_test_case_status.assert_called_once_with('tc1', 'PASS')
+
+    def test_preloaded_validation_errors_stop_the_run(self):
+        entry = {'detail': {'test_case_id': 'tc1'}, 'config': None, 'validation_errors': ['Invalid test case definition: x']}
+        with mock.patch.object(services, 'get_project', return_value=None), \
+                mock.patch.object(services, 'record_result', return_value=True), \
+                mock.patch.object(services, 'TestCaseProcessor') as processor:
+            result = services.run_adhoc_test_logic('tc1', log_writer=mock.Mock(), preloaded=entry)
+        processor.assert_not_called()
+        self.assertEqual(result['status'], 'ERROR')
+        self.assertIn('Invalid test case definition: x', result['message'])
+
+
+class LatestStatusTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(latest_status._unavailable_until, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+
+    def _log(self, test_case_id, run_id, minutes_ago, status='PASS'):
+        return {
+            'test_case_id': test_case_id, 'run_id': run_id, 'run_status': status,
+            'run_timestamp': self.now - timedelta(minutes=minutes_ago),
+        }
+
+    def _refresh(self, rows, existing=None):
+        with mock.patch.object(latest_status, 'TestCaseLatestStatus') as model:
+            manager = model.objects.using.return_value
+            manager.in_bulk.return_value = existing or {}
+            latest_status.refresh_latest_test_case_statuses(rows)
+        return model, manager
+
+    def test_newest_row_per_test_case_is_inserted_once(self):
+        model, manager = self._refresh([
+            self._log('tc1', 'r1', 5, 'FAIL'), self._log('tc1', 'r2', 1, 'PASS'), self._log('tc1', 'r0', 10, 'ERROR'),
+        ])
+        manager.in_bulk.assert_called_once_with(['tc1'])
+        model.assert_called_once()
+        self.assertEqual((model.call_args.kwargs['run_id'], model.call_args.kwargs['run_status']), ('r2', 'PASS'))
+        manager.bulk_create.assert_called_once()
+        manager.bulk_update.assert_not_called()
+
+    def test_newer_run_updates_the_stored_row(self):
+        current = mock.Mock(run_id='r1', run_timestamp=self.now - timedelta(minutes=5))
+        _, manager = self._refresh([self._log('tc1', 'r2', 1, 'FAIL')], existing={'tc1': current})
+        self.assertEqual((current.run_id, current.run_status), ('r2', 'FAIL'))
+        self.assertEqual(manager.bulk_update.call_args.args[0], [current])
+        self.assertIn('updated_at', manager.bulk_update.call_args.args[1])
+
+    def test_older_run_does_not_overwrite_a_newer_one(self):
+        current = mock.Mock(run_id='r2', run_timestamp=self.now)
+        _, manager = self._refresh([self._log('tc1', 'r1', 5, 'FAIL')], existing={'tc1': current})
+        manager.bulk_update.assert_not_called()
+        manager.bulk_create.assert_not_called()
+        self.assertEqual(current.run_id, 'r2')
+
+    def test_refresh_failure_is_swallowed_and_marks_the_table_unavailable(self):
+        with mock.patch.object(latest_status.TestCaseLatestStatus.objects, 'using', side_effect=OperationalError('missing')):
+            with self.assertLogs(latest_status.logger, 'WARNING'):
+                latest_status.refresh_latest_test_case_statuses([self._log('tc1', 'r1', 0)])
+        self.assertFalse(latest_status._table_available(latest_status.TestCaseLatestStatus))
+
+    def test_group_status_ignores_an_older_run_finishing_late(self):
+        with mock.patch.object(latest_status, 'TestGroupLatestStatus') as model:
+            manager = model.objects.using.return_value
+            manager.filter.return_value.first.return_value = mock.Mock(run_id='new', start_timestamp=self.now)
+            latest_status.refresh_latest_group_status({
+                'test_group_id': 'g1', 'run_id': 'old', 'start_timestamp': self.now - timedelta(minutes=5),
+            })
+            manager.update_or_create.assert_not_called()
+            latest_status.refresh_latest_group_status({'test_group_id': 'g1', 'run_id': 'newer', 'start_timestamp': self.now})
+            self.assertEqual(manager.update_or_create.call_args.kwargs['defaults']['run_id'], 'newer')
+
+    def test_reads_use_the_latest_status_table(self):
+        row = latest_status.TestCaseLatestStatus(test_case_id='tc1', run_status='PASS')
+        with mock.patch.object(latest_status, 'TestCaseLatestStatus') as model, \
+                mock.patch.object(latest_status, 'TestCaseLog') as logs:
+            model.objects.using.return_value.filter.return_value = [row]
+            statuses = latest_status.get_latest_test_case_statuses(['tc1', None])
+        model.objects.using.return_value.filter.assert_called_once_with(test_case_id__in=['tc1'])
+        logs.objects.using.assert_not_called()
+        self.assertEqual(statuses['tc1']['run_status'], 'PASS')
+        self.assertNotIn('_state', statuses['tc1'])
+
+    def test_reads_fall_back_to_the_logs_and_skip_the_table_while_unavailable(self):
+        log_rows = [
+            {'test_case_id': 'tc1', 'run_status': 'FAIL'}, {'test_case_id': 'tc1', 'run_status': 'PASS'},
+        ]
+        with mock.patch.object(latest_status, 'TestCaseLatestStatus') as model, \
+                mock.patch.object(latest_status, 'TestCaseLog') as logs, self.assertLogs(latest_status.logger, 'WARNING'):
+            model._meta.db_table = 'TEST_CASE_LATEST_STATUS'
+            model.objects.using.side_effect = OperationalError('missing')
+            logs.objects.using.return_value.filter.return_value.order_by.return_value.values.return_value = log_rows
+            self.assertEqual(latest_status.get_latest_test_case_statuses(['tc1'])['tc1']['run_status'], 'FAIL')
+            latest_status.get_latest_test_case_statuses(['tc1'])
+        self.assertEqual(model.objects.using.call_count, 1)
+        self.assertEqual(logs.objects.using.call_count, 2)
+
+    def test_empty_id_list_skips_the_database(self):
+        with mock.patch.object(latest_status, 'TestCaseLatestStatus') as model:
+            self.assertEqual(latest_status.get_latest_test_case_statuses([None, '']), {})
+        model.objects.using.assert_not_called()
+
+
+@override_settings(EAGLE_DASHBOARD_SUMMARY_CACHE_SECONDS=10)
+class DashboardSummaryTests(SimpleTestCase):
+    counts = [
+        {'criticality': 'Critical', 'status': 'FAIL', 'count': 2},
+        {'criticality': 'High', 'status': 'ERROR', 'count': 1},
+        {'criticality': None, 'status': 'PASS', 'count': 4},
+        {'criticality': 'Unknown', 'status': 'PASS', 'count': 1},
+        {'criticality': 'Medium', 'status': 'RUNNING', 'count': 3},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(views._DASHBOARD_SUMMARY_CACHE, {'expires_at': 0.0, 'payload': None, 'etag': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(views, 'count_latest_group_statuses', return_value=list(self.counts))
+        self.count = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def test_summary_is_built_from_aggregated_counts(self):
+        response = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertTrue(response['ETag'])
+        payload = json.loads(response.content)
+        self.assertEqual(payload['failed'], {'Critical': 2, 'High': 1, 'Medium': 0, 'Low': 0})
+        self.assertEqual(payload['passed'], {'Critical': 0, 'High': 0, 'Medium': 0, 'Low': 5})
+        self.assertEqual(payload['totals'], {'failed': 3, 'passed': 5})
+
+    def test_summary_is_cached_between_polls(self):
+        for _ in range(3):
+            views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/'))
+        self.count.assert_called_once_with()
+
+    def test_unchanged_summary_answers_304(self):
+        etag = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/'))['ETag']
+        response = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_changed_summary_gets_a_new_etag(self):
+        etag = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/'))['ETag']
+        views._DASHBOARD_SUMMARY_CACHE['expires_at'] = 0.0
+        self.count.return_value = [{'criticality': 'Low', 'status': 'FAIL', 'count': 1}]
+        response = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_database_errors_return_empty_counts(self):
+        self.count.side_effect = OperationalError('down')
+        with self.assertLogs(views.logger, 'ERROR'):
+            response = views.dashboard_summary_api(self.factory.get('/api/dashboard-summary/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['totals'], {'failed': 0, 'passed': 0})
+
+
+class LatestGroupStatusCountTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(latest_status._unavailable_until, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counts_come_from_one_group_by(self):
+        counts = [{'criticality': 'High', 'status': 'PASS', 'count': 3}]
+        with mock.patch.object(latest_status, 'TestGroupLatestStatus') as model:
+            values = model.objects.using.return_value.values
+            values.return_value.annotate.return_value.order_by.return_value = counts
+            self.assertEqual(latest_status.count_latest_group_statuses(), counts)
+        values.assert_called_once_with('criticality', 'status')
+
+    def test_fallback_counts_the_latest_log_per_group(self):
+        rows = [
+            {'criticality': 'High', 'status': 'PASS'}, {'criticality': 'High', 'status': 'PASS'},
+            {'criticality': 'Low', 'status': 'FAIL'},
+        ]
+        with mock.patch.object(latest_status, 'TestGroupLatestStatus') as model, \
+                mock.patch.object(latest_status, 'TestGroupLog') as logs, self.assertLogs(latest_status.logger, 'WARNING'):
+            model._meta.db_table = 'TEST_GROUP_LATEST_STATUS'
+            model.objects.using.side_effect = OperationalError('missing')
+            ranked = logs.objects.using.return_value.exclude.return_value.annotate.return_value
+            ranked.filter.return_value.values.return_value = rows
+            counts = latest_status.count_latest_group_statuses()
+        ranked.filter.assert_called_once_with(rank=1)
+        self.assertCountEqual(counts, [
+            {'criticality': 'High', 'status': 'PASS', 'count': 2}, {'criticality': 'Low', 'status': 'FAIL', 'count': 1},
+        ])
+
+
+class RunStatusStoreContract:
+    """Behaviour shared by every run status backend; subclasses provide make_store()."""
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(EAGLE_RUN_STATUS_TTL_SECONDS=60, EAGLE_RUN_STATUS_STALE_SECONDS=600)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(run_status_store.time, 'time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = self.make_store()
+
+    def test_status_round_trip(self):
+        self.store.create('group', 'r1', {'status': 'RUNNING', 'completed': 0})
+        self.store.update('group', 'r1', message='halfway')
+        self.assertEqual(self.store.increment('group', 'r1', 'completed', 2, last='tc2'), 2)
+        self.assertEqual(
+            self.store.get('group', 'r1'), {'status': 'RUNNING', 'completed': 2, 'message': 'halfway', 'last': 'tc2'}
+        )
+        self.assertIsNone(self.store.get('project', 'r1'))
+
+    def test_unknown_runs_are_ignored(self):
+        self.store.update('group', 'missing', status='COMPLETED')
+        self.assertEqual(self.store.increment('group', 'missing', 'completed'), 0)
+        self.assertEqual(self.store.append_event('group', 'missing', 'test_finished'), 0)
+        self.assertIsNone(self.store.get_events('group', 'missing'))
+
+    def test_events_are_sequenced_and_paged(self):
+        self.store.create('group', 'r1', {'status': 'RUNNING'})
+        seqs = [self.store.append_event('group', 'r1', 'test_finished', {'n': n}) for n in range(3)]
+        self.assertEqual(seqs, sorted(seqs))
+        events = self.store.get_events('group', 'r1')
+        self.assertEqual([data['n'] for _, _, data in events], [0, 1, 2])
+        self.assertEqual([seq for seq, _, _ in self.store.get_events('group', 'r1', after=seqs[0])], seqs[1:])
+        self.assertEqual(len(self.store.get_events('group', 'r1', limit=1)), 1)
+
+    def test_finished_runs_are_evicted_after_the_ttl(self):
+        self.store.create('group', 'done', {'status': 'RUNNING'})
+        self.store.create('group', 'running', {'status': 'RUNNING'})
+        self.store.append_event('group', 'done', 'test_finished')
+        self.store.update('group', 'done', status='COMPLETED')
+        self.now += 30
+        self.assertEqual(self.store.evict_expired(), 0)
+        self.now += 31
+        self.store.update('group', 'running', completed=1)
+        self.assertEqual(self.store.evict_expired(), 1)
+        self.assertIsNone(self.store.get('group', 'done'))
+        self.assertIsNone(self.store.get_events('group', 'done'))
+        self.assertIsNotNone(self.store.get('group', 'running'))
+
+    def test_runs_that_stop_updating_are_evicted_as_stale(self):
+        self.store.create('group', 'stuck', {'status': 'RUNNING'})
+        self.now += 601
+        self.assertEqual(self.store.evict_expired(), 1)
+        self.assertIsNone(self.store.get('group', 'stuck'))
+
+    def test_discard_removes_status_and_events(self):
+        self.store.create('group', 'r1', {'status': 'QUEUED'})
+        self.store.append_event('group', 'r1', 'queued')
+        self.store.discard('group', 'r1')
+        self.assertIsNone(self.store.get('group', 'r1'))
+        self.assertIsNone(self.store.get_events('group', 'r1'))
+
+
+class MemoryRunStatusStoreTests(RunStatusStoreContract, SimpleTestCase):
+    def make_store(self):
+        return run_status_store.MemoryRunStatusStore()
+
+    @override_settings(EAGLE_RUN_STATUS_MAX_ENTRIES=2)
+    def test_least_recently_updated_runs_are_dropped_over_the_cap(self):
+        for run_id in ('r1', 'r2', 'r3'):
+            self.store.create('group', run_id, {'status': 'RUNNING'})
+        self.store.update('group', 'r1', completed=1)
+        self.assertEqual(self.store.evict_expired(), 1)
+        self.assertIsNone(self.store.get('group', 'r2'))
+        self.assertIsNotNone(self.store.get('group', 'r1'))
+
+    def test_returned_status_is_a_copy(self):
+        self.store.create('group', 'r1', {'status': 'RUNNING', 'results': []})
+        self.store.get('group', 'r1')['results'].append('x')
+        self.assertEqual(self.store.get('group', 'r1')['results'], [])
+
+
+class SQLiteRunStatusStoreTests(RunStatusStoreContract, TempSQLiteMixin, SimpleTestCase):
+    setting = 'EAGLE_RUN_STATUS_PATH'
+
+    def make_store(self):
+        return run_status_store.SQLiteRunStatusStore()
+
+    def test_status_is_shared_between_store_instances(self):
+        self.store.create('project', 'r1', {'status': 'RUNNING'})
+        self.store.update('project', 'r1', status='COMPLETED')
+        self.assertEqual(self.make_store().get('project', 'r1'), {'status': 'COMPLETED'})
+
+    def test_concurrent_increments_are_not_lost(self):
+        self.store.create('group', 'r1', {'status': 'RUNNING', 'completed': 0})
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: self.store.increment('group', 'r1', 'completed'), range(20)))
+        self.assertEqual(self.store.get('group', 'r1')['completed'], 20)
+
+
+def _collect_stream(stream):
+    async def collect():
+        return [chunk async for chunk in stream]
+    return asyncio.run(collect())
+
+
+@override_settings(EAGLE_RUN_EVENTS_POLL_SECONDS=0.01, EAGLE_RUN_EVENTS_MAX_STREAM_SECONDS=5)
+class RunEventStreamTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = run_status_store.MemoryRunStatusStore()
+        patcher = mock.patch.object(run_events, 'get_run_status_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store.create('group', 'r1', {'status': 'RUNNING'})
+
+    def test_events_are_replayed_until_completed(self):
+        self.store.append_event('group', 'r1', 'started', {'total_test_cases': 2})
+        self.store.append_event('group', 'r1', 'completed', {'status': 'COMPLETED'})
+        self.store.append_event('group', 'r1', 'late', {})
+        chunks = _collect_stream(run_events.stream_run_events('group', 'r1'))
+        self.assertEqual(chunks[0], 'retry: 3000\n\n')
+        self.assertEqual(chunks[1:], [
+            'id: 1\nevent: started\ndata: {"total_test_cases": 2}\n\n',
+            'id: 2\nevent: completed\ndata: {"status": "COMPLETED"}\n\n',
+        ])
+
+    def test_reconnect_resumes_after_the_last_event_id(self):
+        for event in ('started', 'test_finished', 'completed'):
+            self.store.append_event('group', 'r1', event)
+        chunks = _collect_stream(run_events.stream_run_events('group', 'r1', after=2))
+        self.assertEqual(chunks[1:], ['id: 3\nevent: completed\ndata: {}\n\n'])
+
+    def test_events_published_while_streaming_are_followed(self):
+        def publish():
+            time.sleep(0.05)
+            self.store.append_event('group', 'r1', 'test_finished', {'test_case_id': 'tc1'})
+            self.store.append_event('group', 'r1', 'completed', {'status': 'COMPLETED'})
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        chunks = _collect_stream(run_events.stream_run_events('group', 'r1'))
+        publisher.join()
+        self.assertEqual([chunk.split('\n')[1] for chunk in chunks[1:]], ['event: test_finished', 'event: completed'])
+
+    def test_unknown_run_gets_not_found(self):
+        chunks = _collect_stream(run_events.stream_run_events('group', 'missing'))
+        self.assertTrue(chunks[-1].startswith('event: not_found\n'))
+
+    @override_settings(EAGLE_RUN_EVENTS_MAX_STREAM_SECONDS=0.05)
+    def test_idle_stream_sends_heartbeats_and_closes_at_the_limit(self):
+        with mock.patch.object(run_events, '_HEARTBEAT_SECONDS', 0):
+            chunks = _collect_stream(run_events.stream_run_events('group', 'r1'))
+        self.assertIn(': keep-alive\n\n', chunks)
+        self.assertFalse(any('event:' in chunk for chunk in chunks))
+
+    def test_parse_last_event_id(self):
+        self.assertEqual(run_events.parse_last_event_id('7'), 7)
+        self.assertEqual(run_events.parse_last_event_id('-3'), 0)
+        self.assertEqual(run_events.parse_last_event_id('abc'), 0)
+        self.assertEqual(run_events.parse_last_event_id(None), 0)
+
+
+class RunEventViewTests(SimpleTestCase):
+    def _asgi_request(self, path, headers=()):
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': list(headers)}
+        return ASGIRequest(scope, io.BytesIO())
+
+    def test_wsgi_requests_are_told_to_poll(self):
+        response = asyncio.run(views.run_events(RequestFactory().get('/'), 'group', 'r1'))
+        self.assertEqual(response.status_code, 501)
+
+    def test_unknown_kind_is_404(self):
+        response = asyncio.run(views.run_events(self._asgi_request('/'), 'job', 'r1'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_asgi_stream_resumes_from_the_last_event_id_header(self):
+        request = self._asgi_request('/api/runs/group/r1/events/', [(b'last-event-id', b'4')])
+        with mock.patch.object(views, 'stream_run_events', return_value=iter(())) as stream:
+            response = asyncio.run(views.run_events(request, 'group', 'r1'))
+        stream.assert_called_once_with('group', 'r1', 4)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+
+class RunDeltaTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = run_status_store.MemoryRunStatusStore()
+        patcher = mock.patch.object(run_events, 'get_run_status_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store.create('group', 'r1', {'status': 'RUNNING', 'completed': 1, 'results': [{'id': 'tc1'}]})
+        for n in range(3):
+            self.store.append_event('group', 'r1', 'test_finished', {'n': n})
+        self.factory = RequestFactory()
+
+    def test_delta_carries_counters_and_only_new_events(self):
+        delta = run_events.get_run_delta('group', 'r1', since=1)
+        self.assertEqual(delta['status'], {'status': 'RUNNING', 'completed': 1})
+        self.assertEqual([event['seq'] for event in delta['events']], [2, 3])
+        self.assertEqual((delta['cursor'], delta['has_more'], delta['done']), (3, False, False))
+
+    def test_cursor_is_kept_when_nothing_changed(self):
+        delta = run_events.get_run_delta('group', 'r1', since=3)
+        self.assertEqual((delta['events'], delta['cursor']), ([], 3))
+
+    def test_limit_sets_has_more(self):
+        delta = run_events.get_run_delta('group', 'r1', since=0, limit=2)
+        self.assertEqual((delta['cursor'], delta['has_more']), (2, True))
+        delta = run_events.get_run_delta('group', 'r1', since=delta['cursor'], limit=2)
+        self.assertEqual((delta['cursor'], delta['has_more']), (3, False))
+
+    def test_completed_event_marks_the_delta_done(self):
+        self.store.append_event('group', 'r1', 'completed', {'status': 'COMPLETED'})
+        self.assertTrue(run_events.get_run_delta('group', 'r1', since=3)['done'])
+
+    def test_unknown_run_returns_none(self):
+        self.assertIsNone(run_events.get_run_delta('project', 'r1'))
+
+    def test_delta_view(self):
+        response = views.run_status_delta(self.factory.get('/', {'since': '2'}), 'group', 'r1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['cursor'], 3)
+        self.assertEqual(views.run_status_delta(self.factory.get('/'), 'group', 'missing').status_code, 404)
+        self.assertEqual(views.run_status_delta(self.factory.get('/'), 'job', 'r1').status_code, 404)
+
+    def test_parse_batch_runs(self):
+        self.assertEqual(
+            run_events.parse_batch_runs('group:r1:4, project:p1,,'), [('group', 'r1', 4), ('project', 'p1', 0)]
+        )
+        for value in ('job:r1', 'group', 'group::1', 'group:r1:2:3'):
+            with self.assertRaises(ValueError):
+                run_events.parse_batch_runs(value)
+
+    def test_batch_view_answers_each_run_in_request_order(self):
+        response = views.run_status_batch(self.factory.get('/', {'runs': 'project:missing:5,group:r1:2'}))
+        self.assertEqual(response.status_code, 200)
+        runs = json.loads(response.content)['runs']
+        self.assertEqual([run['run_id'] for run in runs], ['missing', 'r1'])
+        self.assertEqual(runs[0]['status']['status'], 'NOT_FOUND')
+        self.assertEqual((runs[0]['cursor'], runs[0]['done']), (5, True))
+        self.assertEqual([event['seq'] for event in runs[1]['events']], [3])
+
+    @override_settings(EAGLE_RUN_STATUS_BATCH_MAX_RUNS=1)
+    def test_batch_view_rejects_bad_or_oversized_requests(self):
+        self.assertEqual(views.run_status_batch(self.factory.get('/', {'runs': 'job:r1'})).status_code, 400)
+        response = views.run_status_batch(self.factory.get('/', {'runs': 'group:r1,group:r2'}))
+        self.assertEqual(response.status_code, 400)
@@ -61,11 +61,15 @@ urlpatterns = [
     # API endpoints for asynchronous project runs
     path('projects/<str:project_id>/run_async/', views.run_project_async, name='run_project_async'),
     path('projects/run_status/<str:run_id>/', views.get_project_run_status, name='get_project_run_status'),
+    path('api/runs/status/', views.run_status_batch, name='run_status_batch'),
+    path('api/runs/<str:kind>/<str:run_id>/events/', views.run_events, name='run_events'),
+    path('api/runs/<str:kind>/<str:run_id>/status/', views.run_status_delta, name='run_status_delta'),
     
     # Log pages
     path('test_case_logs/', views.test_case_logs, name='test_case_logs'),
     path('test_group_logs/', views.test_group_logs, name='test_group_logs'),
     path('logs/', views.logs, name='logs'),
+    path('api/logs/<str:kind>/', views.logs_api, name='logs_api'),
 
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -1,6 +1,10 @@
 import os
 import uuid
+import time
+import hashlib
+import threading
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
 import json
 import numpy as np
 import logging
@@ -8,9 +12,12 @@ from graphviz import Digraph
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.conf import settings
+from django.utils import timezone
 from django.core.paginator import Paginator
+from django.views.decorators.http import condition
 
 from .forms import ProjectForm
 
@@ -34,9 +41,7 @@ from .services import (
     get_group_run_status,
     delete_test_group_from_db,
     delete_project_from_db,
-    get_test_case_logs_from_db,
     get_test_group_logs_from_db,
-    get_project_logs_from_db,
     schedule_test_group_logic,
     get_available_connection_sources,
     _to_json_safe,  # Import the helper function
@@ -45,6 +50,10 @@ from .services import (
 )
 from .chart_utils import make_criticality_bar_chart
 from .models import TestGroupLog
+from .run_admission import RunAlreadyActive
+from .run_events import RUN_KINDS, stream_run_events, parse_last_event_id, get_run_delta, parse_batch_runs
+from .log_queries import LOG_KINDS, get_logs_page, filters_from_params
+from .latest_status import get_latest_group_statuses, get_latest_test_case_statuses, count_latest_group_statuses
 from dq_management.test_case_manager import TestCaseProcessor # Still needed for direct instantiation
 
 logger = logging.getLogger(__name__)
@@ -556,9 +565,17 @@ def create_test_group(request, project_id):
 def run_test_group_async(request, group_id):
     if request.method == 'POST':
         logger.info(f"Received request to start async run for group: {group_id}")
-        # Call the ORM-based start_group_run_task
-        run_id = start_group_run_task(group_id)
-        return JsonResponse({"run_id": run_id}, status=200)
+        # Optional per-run override of the group worker-pool size
+        max_workers = request.POST.get('max_workers') or None
+        # Optional override of what happens if the group is already running: attach, queue or reject
+        policy = request.POST.get('on_conflict') or None
+        try:
+            run_id, attached = start_group_run_task(group_id, max_workers=max_workers, policy=policy)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except RunAlreadyActive as e:
+            return JsonResponse({"error": str(e), "run_id": e.run_id}, status=409)
+        return JsonResponse({"run_id": run_id, "attached": attached}, status=200)
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 def get_run_status(request, run_id):
@@ -690,25 +707,61 @@ def delete_test_group(request, group_id):
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 def test_case_logs(request):
-    logs = get_test_case_logs_from_db()
+    logs, _ = get_logs_page('case', filters_from_params(request.GET))
     return render(request, 'dq_management/test_case_logs.html', {'logs': logs})
 
 def test_group_logs(request):
-    logs = get_test_group_logs_from_db()
+    logs, _ = get_logs_page('group', filters_from_params(request.GET))
     return render(request, 'dq_management/test_group_logs.html', {'logs': logs})
 
 def logs(request):
-    test_case_logs = get_test_case_logs_from_db()
-    test_group_logs = get_test_group_logs_from_db()
-    project_logs = get_project_logs_from_db()  # <-- ADDED THIS
+    """
+    Renders the first page of each log tab, filtered by the query string. Further pages
+    are loaded by the page through logs_api using the next cursors.
+    """
+    filters = filters_from_params(request.GET)
+    pages = {}
+    for kind in LOG_KINDS:
+        try:
+            pages[kind] = get_logs_page(kind, filters)
+        except ValueError as e:
+            messages.error(request, str(e))
+            pages[kind] = ([], None)
 
     context = {
-        'test_case_logs': test_case_logs,
-        'test_group_logs': test_group_logs,
-        'project_logs': project_logs,  # <-- ADDED THIS
+        'test_case_logs': pages['case'][0],
+        'test_group_logs': pages['group'][0],
+        'project_logs': pages['project'][0],
+        'next_cursors': {kind: page[1] for kind, page in pages.items()},
+        'filters': filters,
+        'filter_query': urlencode(filters),
         }
     return render(request, 'dq_management/logs.html', context)
 
+def logs_api(request, kind):
+    """
+    Returns one page of log rows as JSON: {"results": [...], "next_cursor": "..."|null}.
+    Accepts the same filters as the logs page plus `cursor` and `limit`.
+    """
+    if kind not in LOG_KINDS:
+        return JsonResponse({"error": f"Unknown log kind '{kind}'."}, status=404)
+    try:
+        rows, next_cursor = get_logs_page(
+            kind, filters_from_params(request.GET),
+            cursor=request.GET.get('cursor') or None, limit=request.GET.get('limit')
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.exception(f"logs_api error for {kind} logs: {e}")
+        return JsonResponse({"error": "Failed to load logs."}, status=500)
+    for row in rows:
+        for key, value in row.items():
+            # Match the server-rendered rows, which show timestamps in the server's time zone.
+            if isinstance(value, datetime) and timezone.is_aware(value):
+                row[key] = timezone.localtime(value)
+    return JsonResponse({"results": _to_json_safe(rows), "next_cursor": next_cursor})
+
 def dashboard(request):
     """
     Render dashboard shell. Charts now fetch data dynamically from an API endpoint.
@@ -717,10 +770,11 @@ def dashboard(request):
 
     projects = get_all_projects_from_db()[:50]  # Limit to 50 projects for performance
 
-    # Fetch all logs at once to avoid N queries
-    all_logs = list(TestGroupLog.objects.using('snowflake_dev').values('project_id', 'test_group_id', 'status', 'start_timestamp'))
+    # One latest-status row per group, fetched at once to avoid N queries
+    project_ids = [project.get('project_id') or project.get('id') for project in projects]
+    latest_rows = get_latest_group_statuses(project_ids=project_ids).values()
     logs_by_project = defaultdict(list)
-    for log in all_logs:
+    for log in latest_rows:
         logs_by_project[log['project_id']].append(log)
 
     # Compute per-project status summary based on latest TestGroupLog per group
@@ -772,7 +826,7 @@ def dashboard(request):
         all_projects_summarized.append(summary)
 
     # Recent logs for table
-    test_group_logs = get_test_group_logs_from_db()[:50]
+    test_group_logs = get_test_group_logs_from_db(limit=50)
 
     context = {
         'all_projects_summarized': all_projects_summarized,
@@ -781,43 +835,67 @@ def dashboard(request):
     return render(request, 'dq_management/dashboard.html', context)
 
 
-def dashboard_summary_api(request):
-    """Return real-time summary for charts based on latest TestGroupLog per group."""
+_DASHBOARD_SUMMARY_CACHE = {"expires_at": 0.0, "payload": None, "etag": None}
+_DASHBOARD_SUMMARY_LOCK = threading.Lock()
+
+
+def _compute_dashboard_summary():
     priorities = ['Critical', 'High', 'Medium', 'Low']
     data = {'failed': {p: 0 for p in priorities}, 'passed': {p: 0 for p in priorities}}
+    for row in count_latest_group_statuses():
+        status = (row.get('status') or '').upper()
+        crit = row.get('criticality') or 'Low'
+        if crit not in data['failed']:
+            crit = 'Low'
+        if status in ('FAIL', 'ERROR'):
+            data['failed'][crit] += row['count']
+        elif status == 'PASS':
+            data['passed'][crit] += row['count']
+        # Unknown or RUNNING -> do not count
+    totals = {
+        'failed': sum(data['failed'].values()),
+        'passed': sum(data['passed'].values()),
+    }
+    return {'failed': data['failed'], 'passed': data['passed'], 'totals': totals}
 
-    # Get latest log per test_group_id
+
+def _get_dashboard_summary():
+    """
+    Returns (payload, etag) for the dashboard charts, recomputed at most once every
+    EAGLE_DASHBOARD_SUMMARY_CACHE_SECONDS (default 10) per process.
+    """
+    with _DASHBOARD_SUMMARY_LOCK:
+        if _DASHBOARD_SUMMARY_CACHE["payload"] is not None and _DASHBOARD_SUMMARY_CACHE["expires_at"] > time.monotonic():
+            return _DASHBOARD_SUMMARY_CACHE["payload"], _DASHBOARD_SUMMARY_CACHE["etag"]
+        payload = _compute_dashboard_summary()
+        etag = hashlib.md5(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        ttl = float(getattr(settings, "EAGLE_DASHBOARD_SUMMARY_CACHE_SECONDS", 10))
+        _DASHBOARD_SUMMARY_CACHE.update({"expires_at": time.monotonic() + ttl, "payload": payload, "etag": etag})
+        return payload, etag
+
+
+def _dashboard_summary_etag(request):
     try:
-        # Use ORM to fetch and then reduce to latest per group in Python to avoid DB-specific SQL
-        logs = list(TestGroupLog.objects.using('snowflake_dev').all().values('test_group_id', 'status', 'criticality', 'start_timestamp'))
-        latest_by_group = {}
-        for row in logs:
-            gid = row['test_group_id']
-            ts = row['start_timestamp']
-            if gid is None:
-                # Skip malformed rows
-                continue
-            if gid not in latest_by_group or (ts and latest_by_group[gid]['start_timestamp'] and ts > latest_by_group[gid]['start_timestamp']) or (latest_by_group[gid]['start_timestamp'] is None and ts is not None):
-                latest_by_group[gid] = row
+        return _get_dashboard_summary()[1]
+    except Exception:
+        # Let the view produce its error response.
+        return None
 
-        for row in latest_by_group.values():
-            status = (row.get('status') or '').upper()
-            crit = row.get('criticality') or 'Low'
-            if crit not in data['failed']:
-                crit = 'Low'
-            if status in ('FAIL', 'ERROR'):
-                data['failed'][crit] += 1
-            elif status == 'PASS':
-                data['passed'][crit] += 1
-            else:
-                # Unknown or RUNNING -> do not count
-                pass
 
-        totals = {
-            'failed': sum(data['failed'].values()),
-            'passed': sum(data['passed'].values()),
-        }
-        return JsonResponse({'failed': data['failed'], 'passed': data['passed'], 'totals': totals})
+@condition(etag_func=_dashboard_summary_etag)
+def dashboard_summary_api(request):
+    """
+    Return real-time summary for charts based on the latest run of each group.
+    Counts come from the database, are cached briefly, and unchanged data answers
+    If-None-Match with 304 Not Modified.
+    """
+    priorities = ['Critical', 'High', 'Medium', 'Low']
+    try:
+        payload, _ = _get_dashboard_summary()
+        response = JsonResponse(payload)
+        # Browsers revalidate on every poll; an unchanged summary costs a 304.
+        response['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.exception('dashboard_summary_api error: %s', e)
         return JsonResponse({'failed': {p:0 for p in priorities}, 'passed': {p:0 for p in priorities}, 'totals': {'failed':0,'passed':0}}, status=200)
@@ -952,10 +1030,6 @@ def flow_view(request, project_id):
     # Get test cases for the project
     test_cases = get_test_cases_for_project_from_db(project_id)
 
-    # Get recent logs for status information
-    test_group_logs = get_test_group_logs_from_db()
-    test_case_logs = get_test_case_logs_from_db()
-
     # Create a mapping of test group to its test cases with execution order
     group_to_cases = {}
     for group in test_groups:
@@ -966,16 +1040,17 @@ def flow_view(request, project_id):
         group_to_cases[group_id] = cases_in_group
 
     # Get latest status for each test group and test case
-    group_statuses = {}
-    case_statuses = {}
-
-    for log in test_group_logs:
-        if log.get('test_group_id') not in group_statuses:
-            group_statuses[log.get('test_group_id')] = log.get('status', 'UNKNOWN')
-
-    for log in test_case_logs:
-        if log.get('test_case_id') not in case_statuses:
-            case_statuses[log.get('test_case_id')] = log.get('run_status', 'UNKNOWN')
+    group_statuses = {
+        gid: row.get('status') or 'UNKNOWN'
+        for gid, row in get_latest_group_statuses(project_ids=[project_id]).items()
+    }
+    case_ids = {case.get('test_case_id') for case in test_cases}
+    for cases in group_to_cases.values():
+        case_ids.update(case.get('test_case_id') for case in cases)
+    case_statuses = {
+        tc_id: row.get('run_status') or 'UNKNOWN'
+        for tc_id, row in get_latest_test_case_statuses(case_ids).items()
+    }
 
     # Generate Graphviz diagram
     dot = Digraph(comment='Test Flow Diagram', format='svg')
@@ -1075,28 +1150,10 @@ def test_group_flow_data_api(request, group_id):
     test_cases = get_test_cases_in_group_from_db(group_id)
     test_cases.sort(key=lambda x: x.get('execution_order', 999))
 
-    # Get latest TestGroupLog for the group
-    test_group_logs = get_test_group_logs_from_db()
-    group_status = 'NORUN'
-    for log in test_group_logs:
-        if log.get('test_group_id') == group_id:
-            group_status = log.get('status', 'NORUN')
-            break
-
-    # Build dict of latest TestCaseLog by test_case_id
-    test_case_logs = get_test_case_logs_from_db()
-    latest_case_logs = {}
-    for log in test_case_logs:
-        tc_id = log.get('test_case_id')
-        if tc_id:
-            if tc_id not in latest_case_logs:
-                latest_case_logs[tc_id] = log
-            else:
-                # Compare timestamps to get latest
-                current_ts = latest_case_logs[tc_id].get('run_timestamp')
-                new_ts = log.get('run_timestamp')
-                if new_ts and (not current_ts or new_ts > current_ts):
-                    latest_case_logs[tc_id] = log
+    # Get latest status for the group and its test cases
+    latest_group = get_latest_group_statuses(group_ids=[group_id]).get(group_id)
+    group_status = (latest_group.get('status') if latest_group else None) or 'NORUN'
+    latest_case_logs = get_latest_test_case_statuses([case.get('id') for case in test_cases])
 
     # Build response data
     group_info = {
@@ -1156,31 +1213,23 @@ def test_group_flow(request, group_id):
     test_cases = get_test_cases_in_group_from_db(group_id)
     test_cases.sort(key=lambda x: x.get('execution_order', 999))
 
-    # Get recent logs for status information
-    test_group_logs = get_test_group_logs_from_db()
-    test_case_logs = get_test_case_logs_from_db()
-
     # Get latest status for the test group
-    group_status = 'UNKNOWN'
-    for log in test_group_logs:
-        if log.get('test_group_id') == group_id:
-            group_status = log.get('status', 'UNKNOWN')
-            break
+    latest_group = get_latest_group_statuses(group_ids=[group_id]).get(group_id)
+    group_status = (latest_group.get('status') if latest_group else None) or 'UNKNOWN'
 
     # Get latest status for each test case
     case_statuses = {}
     case_details = {}
-    for log in test_case_logs:
-        tc_id = log.get('test_case_id')
-        if tc_id and tc_id not in case_statuses:
-            case_statuses[tc_id] = log.get('run_status', 'UNKNOWN')
-            case_details[tc_id] = {
-                'message': log.get('message', ''),
-                'possible_resolution': log.get('possible_resolution', ''),
-                'run_message': log.get('run_message', ''),
-                'source_query': log.get('source_query', ''),
-                'destination_query': log.get('destination_query', ''),
-            }
+    latest_case_logs = get_latest_test_case_statuses([case.get('test_case_id') for case in test_cases])
+    for tc_id, log in latest_case_logs.items():
+        case_statuses[tc_id] = log.get('run_status', 'UNKNOWN')
+        case_details[tc_id] = {
+            'message': log.get('message', ''),
+            'possible_resolution': log.get('possible_resolution', ''),
+            'run_message': log.get('run_message', ''),
+            'source_query': log.get('source_query', ''),
+            'destination_query': log.get('destination_query', ''),
+        }
 
     # Generate Graphviz diagram for single group
     dot = Digraph(comment='Test Group Flow Diagram', format='svg')
@@ -1246,9 +1295,15 @@ def test_group_flow(request, group_id):
 def run_project_async(request, project_id):
     if request.method == 'POST':
         logger.info(f"Received request to start async run for project: {project_id}")
-        # Call the ORM-based start_project_run_task
-        run_id = start_project_run_task(project_id)
-        return JsonResponse({"run_id": run_id}, status=200)
+        # Optional override of what happens if the project is already running: attach, queue or reject
+        policy = request.POST.get('on_conflict') or None
+        try:
+            run_id, attached = start_project_run_task(project_id, policy=policy)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except RunAlreadyActive as e:
+            return JsonResponse({"error": str(e), "run_id": e.run_id}, status=409)
+        return JsonResponse({"run_id": run_id, "attached": attached}, status=200)
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 
@@ -1257,3 +1312,58 @@ def get_project_run_status(request, run_id):
     serializable_status_data = convert_numpy_types(status_data)
     return JsonResponse(serializable_status_data)
 
+
+async def run_events(request, kind, run_id):
+    """
+    Server-Sent Events stream of a group or project run's progress (test/group started
+    and finished, then 'completed' with the final status). Needs ASGI; under WSGI it
+    answers 501 and the pages fall back to polling the run status endpoints.
+    """
+    if kind not in RUN_KINDS:
+        return JsonResponse({"error": f"Unknown run kind '{kind}'."}, status=404)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Run event streams require the ASGI server."}, status=501)
+    after = parse_last_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    response = StreamingHttpResponse(stream_run_events(kind, run_id, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def run_status_delta(request, kind, run_id):
+    """
+    Returns the run's status counters plus only the events after the `since` cursor, so
+    polling doesn't resend every finished test's result.
+    """
+    if kind not in RUN_KINDS:
+        return JsonResponse({"error": f"Unknown run kind '{kind}'."}, status=404)
+    delta = get_run_delta(kind, run_id, since=parse_last_event_id(request.GET.get('since')))
+    if delta is None:
+        return JsonResponse({"run_id": run_id, "status": {"status": "NOT_FOUND", "message": "Run ID not found."}}, status=404)
+    return JsonResponse(delta)
+
+
+def run_status_batch(request):
+    """
+    Deltas for several runs in one request: ?runs=group:<run_id>:<since>,project:<run_id>:<since>.
+    Returns {"runs": [delta, ...]} in request order; unknown runs report status NOT_FOUND.
+    """
+    try:
+        runs = parse_batch_runs(request.GET.get('runs'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    max_runs = int(getattr(settings, "EAGLE_RUN_STATUS_BATCH_MAX_RUNS", 50))
+    if len(runs) > max_runs:
+        return JsonResponse({"error": f"At most {max_runs} runs can be requested at once."}, status=400)
+    deltas = []
+    for kind, run_id, since in runs:
+        delta = get_run_delta(kind, run_id, since=since)
+        if delta is None:
+            delta = {
+                "run_id": run_id, "kind": kind, "status": {"status": "NOT_FOUND", "message": "Run ID not found."},
+                "events": [], "cursor": since, "has_more": False, "done": True,
+            }
+        deltas.append(delta)
+    return JsonResponse({"runs": deltas})
+